@@ -19,6 +19,7 @@ urlpatterns = [
     re_path(r'^$', index),
     re_path(r'^ows', include("eoxserver.services.urls")),
     re_path(r'^opensearch/', include('eoxserver.services.opensearch.urls')),
+    re_path(r'^tiles/', include('eoxserver.services.ows.wmts.urls')),
 
     # enable the client
     re_path(r'^client/', include('eoxserver.webclient.urls')),
@@ -43,6 +43,14 @@ if os.environ.get('READTHEDOCS', None) != 'True':
     except ImportError:
         from gdal import *
 
+    try:
+        from osgeo.gdal import (
+            SetThreadLocalConfigOption, GetThreadLocalConfigOption
+        )
+    except ImportError:
+        # older bindings only support process-wide options
+        SetThreadLocalConfigOption = GetThreadLocalConfigOption = None
+
     try:
         from collections import OrderedDict as SortedDict
     except ImportError:
@@ -153,12 +161,37 @@ def get_extent(ds):
     return (min(x_a, x_b), min(y_a, y_b), max(x_a, x_b), max(y_a, y_b))
 
 
-def set_env(env, fail_on_override=False, return_old=False):
+def _get_env_option(key, thread_local):
+    if thread_local and GetThreadLocalConfigOption is not None:
+        return GetThreadLocalConfigOption(str(key))
+    return os.environ.get(key)
+
+
+def _set_env_option(key, value, thread_local):
+    if thread_local and SetThreadLocalConfigOption is not None:
+        SetThreadLocalConfigOption(
+            str(key), str(value) if value is not None else None
+        )
+    elif value is not None:
+        os.environ[key] = value
+    else:
+        os.environ.pop(key, None)
+
+
+def set_env(env, fail_on_override=False, return_old=False,
+            thread_local=False):
+    """ Set the given configuration options for GDAL. By default, the options
+        are set process-wide in the environment. With ``thread_local`` they
+        are only set for the current thread, when supported by the GDAL
+        bindings. Such options are not visible to threads started by GDAL
+        itself (e.g: for multi-threaded warping). With ``return_old`` the
+        previous values are returned, which can be restored with
+        :func:`reset_env`.
+    """
     old_values = {} if return_old else None
     for key, value in env.items():
         if fail_on_override or return_old:
-            # old_value = GetConfigOption(str(key))
-            old_value = os.environ.get(key)
+            old_value = _get_env_option(key, thread_local)
             if fail_on_override and old_value != value:
                 raise Exception(
                     'Would override previous value of %s: %s with %s'
@@ -167,19 +200,29 @@ def set_env(env, fail_on_override=False, return_old=False):
             elif old_value != value:
                 old_values[key] = old_value
 
-        # SetConfigOption(str(key), str(value))
         if value is not None:
-            os.environ[key] = value
+            _set_env_option(key, value, thread_local)
 
     return old_values
 
 
+def reset_env(old_env, thread_local=False):
+    """ Restore the configuration options returned by :func:`set_env`.
+        Options that were previously unset are unset again.
+    """
+    for key, value in old_env.items():
+        _set_env_option(key, value, thread_local)
+
+
 @contextlib.contextmanager
-def config_env(env, fail_on_override=False, reset_old=True):
-    old_env = set_env(env, fail_on_override, reset_old)
-    yield
-    if reset_old:
-        set_env(old_env, False, False)
+def config_env(env, fail_on_override=False, reset_old=True,
+               thread_local=False):
+    old_env = set_env(env, fail_on_override, reset_old, thread_local)
+    try:
+        yield
+    finally:
+        if reset_old:
+            reset_env(old_env, thread_local)
 
 
 def open_with_env(path, env, shared=True):
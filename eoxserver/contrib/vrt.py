@@ -520,3 +520,26 @@ def with_extent(filename, extent, save=None):
         resy,
     ])
     return out_ds
+
+
+def build_mosaic(filenames, env, save, nodata=None):
+    """ Creates a mosaic VRT of the given files using ``gdal.BuildVRT``,
+        where files later in the list are drawn on top of earlier ones. The
+        highest resolution of all files is used. Files that cannot be added
+        to the mosaic (e.g: because of a differing band count) are skipped by
+        GDAL, so the filenames of all files included in the mosaic are
+        returned alongside the dataset.
+    """
+    options = {'resolution': 'highest'}
+    if nodata is not None:
+        options['srcNodata'] = nodata
+        options['VRTNodata'] = nodata
+
+    with gdal.config_env(env):
+        out_ds = gdal.BuildVRT(save, filenames, **options)
+
+    included = [
+        filename for filename in (out_ds.GetFileList() or [])
+        if filename != save
+    ]
+    return out_ds, included
@@ -0,0 +1,97 @@
+#-------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+#-------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#-------------------------------------------------------------------------------
+
+""" This module provides helpers for in-process caching.
+"""
+
+from collections import OrderedDict
+from threading import RLock
+
+
+class LRUCache(object):
+    """ A thread-safe, size bounded mapping evicting the least recently used
+        entries.
+
+        :param max_size: the maximum number of entries held by the cache
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, factory=None):
+        """ Get the cached value for the given key. When the key is not yet
+            cached and a ``factory`` is passed, it is called to create the
+            value, which is then stored in the cache.
+
+            :param key: the key to look up
+            :param factory: a callable to create the missing value
+            :returns: the cached value or ``None``
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+                self._entries[key] = value
+                return value
+            except KeyError:
+                pass
+
+        if factory is None:
+            return None
+
+        value = factory()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """ Store the value for the key and evict the least recently used
+            entries if the cache is full.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """ Remove the key from the cache and return its value.
+        """
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        """ Remove all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
@@ -291,3 +291,53 @@ FIXTURE_DIRS = (
 # Set this variable if the path to the instance cannot be resolved
 # automatically, e.g. in case of redirects
 #FORCE_SCRIPT_NAME="/path/to/instance/"
+
+# Cache rendered WMS GetMap responses, either on disk or in one of the
+# configured Django CACHES ('eoxserver.render.map.cache.DjangoMapCache' with
+# the options 'alias' and 'timeout').
+#EOXS_MAP_CACHE = {
+#    'BACKEND': 'eoxserver.render.map.cache.DiskMapCache',
+#    'OPTIONS': {
+#        'path': join(PROJECT_DIR, 'cache', 'maps'),
+#        'max_size': 512 * 1024 * 1024,
+#    }
+#}
+
+# Cache WMS capabilities documents and the layer descriptions they are built
+# from in one of the configured Django CACHES, preferably a persistent one
+# shared by all processes.
+#EOXS_CAPABILITIES_CACHE = {
+#    'alias': 'default',
+#    'timeout': None,
+#}
+
+# Identical concurrent WMS/WMTS/WCS requests share a single rendering. By
+# default only the threads of a process are coordinated, set 'alias' to one of
+# the configured Django CACHES shared by all workers (e.g. memcached or Redis)
+# to coordinate worker processes as well. Set to None to disable.
+#EOXS_SINGLE_FLIGHT = {
+#    'alias': 'default',
+#    'timeout': 60,
+#    'result_timeout': 10,
+#}
+
+# Render WCS 2.0 GetCoverage requests on rectified coverages and mosaics
+# directly with GDAL instead of MapServer by listing the GDAL renderer first.
+# See tools/benchmark_wcs_renderers.py to compare both on your data.
+#EOXS_COVERAGE_RENDERERS = [
+#    'eoxserver.services.gdal.wcs.rectified_coverage_renderer.GDALRectifiedCoverageRenderer',
+#    'eoxserver.services.mapserver.wcs.coverage_renderer.RectifiedCoverageMapServerRenderer',
+#    'eoxserver.services.gdal.wcs.referenceable_dataset_renderer.GDALReferenceableDatasetRenderer',
+#]
+
+# WCS GetCoverage requests with an estimated output of at least 'heavy_bytes'
+# are limited to 'max_concurrent' at once. Others wait up to 'timeout' seconds
+# and are then rejected. Set 'alias' to one of the configured Django CACHES
+# shared by all workers to apply the limit across worker processes. Set to
+# None to disable.
+#EOXS_WCS_ADMISSION = {
+#    'heavy_bytes': 64 * 1024 * 1024,
+#    'max_concurrent': 2,
+#    'timeout': 30,
+#    'alias': 'default',
+#}
@@ -26,14 +26,15 @@
 # ------------------------------------------------------------------------------
 
 from uuid import uuid4
+from threading import Lock
 import ast
 import _ast
-import operator
 import logging
 
 import numpy as np
 from django.utils.six import string_types
 
+from eoxserver.core.util.cachetools import LRUCache
 from eoxserver.render.browse.util import warp_fields
 from eoxserver.contrib import vrt, gdal, osr
 
@@ -69,17 +70,19 @@ class FilenameGenerator(object):
         self._template = template
         self._filenames = []
         self._default_extension = default_extension
+        self._lock = Lock()
 
     def generate(self, extension=None):
         """ Generate and store a new filename using the specified template. An
             optional ``extension`` can be passed, when used in the template.
         """
-        filename = self._template.format(
-            index=len(self._filenames),
-            uuid=uuid4().hex,
-            extension=extension or self._default_extension,
-        )
-        self._filenames.append(filename)
+        with self._lock:
+            filename = self._template.format(
+                index=len(self._filenames),
+                uuid=uuid4().hex,
+                extension=extension or self._default_extension,
+            )
+            self._filenames.append(filename)
         return filename
 
     @property
@@ -229,7 +232,7 @@ def generate_browse(band_expressions, fields_and_coverages,
 
     if not is_simple:
         return _generate_browse_complex(
-            parsed_expressions, fields_and_coverages,
+            band_expressions, fields_and_coverages,
             width, height, bbox, crs, generator
         ), generator, True
 
@@ -247,7 +250,7 @@ def generate_browse(band_expressions, fields_and_coverages,
 
     else:
         return _generate_browse_complex(
-            parsed_expressions, fields_and_coverages,
+            band_expressions, fields_and_coverages,
             width, height, bbox, crs, generator
         ), generator, True
 
@@ -308,31 +311,24 @@ def generate_browse(band_expressions, fields_and_coverages,
     #     )
 
 
-def _generate_browse_complex(parsed_exprs, fields_and_coverages,
+def _generate_browse_complex(band_expressions, fields_and_coverages,
                              width, height, bbox, crs, generator):
     o_x = bbox[0]
     o_y = bbox[3]
     res_x = (bbox[2] - bbox[0]) / width
     res_y = -(bbox[3] - bbox[1]) / height
-    tiff_driver = gdal.GetDriverByName('GTiff')
 
-    field_names = set()
-    for parsed_expression in parsed_exprs:
-        field_names |= set(extract_fields(parsed_expression))
+    plan = get_expression_plan(band_expressions)
 
-    fields_and_datasets = {}
-    for field_name in field_names:
-        coverages = fields_and_coverages[field_name]
-        field_data = warp_fields(
-            coverages, field_name, bbox, crs, width, height
-        )
-        fields_and_datasets[field_name] = field_data
+    fields_and_datasets = warp_fields(
+        fields_and_coverages, plan.field_names, bbox, crs, width, height
+    )
 
     out_filename = generator.generate('tif')
     tiff_driver = gdal.GetDriverByName('GTiff')
     out_ds = tiff_driver.Create(
         out_filename,
-        width, height, len(parsed_exprs),
+        width, height, len(band_expressions),
         gdal.GDT_Float32,
         options=[
             "TILED=YES",
@@ -342,26 +338,23 @@ def _generate_browse_complex(parsed_exprs, fields_and_coverages,
     out_ds.SetGeoTransform([o_x, res_x, 0, o_y, 0, res_y])
     out_ds.SetProjection(osr.SpatialReference(crs).wkt)
 
-    for band_index, parsed_expr in enumerate(parsed_exprs, start=1):
-        with np.errstate(divide='ignore', invalid='ignore'):
-            out_data = _evaluate_expression(
-                parsed_expr, fields_and_datasets, generator
-            )
-
-        if isinstance(out_data, (int, float)):
-            out_data = np.full((height, width), out_data)
+    def write_block(band_index, y_offset, data):
+        out_ds.GetRasterBand(band_index + 1).WriteArray(data, 0, y_offset)
 
-        out_band = out_ds.GetRasterBand(band_index)
-        out_band.WriteArray(out_data)
+    plan.evaluate(fields_and_datasets, width, height, write_block)
 
     return BrowseCreationInfo(out_filename, None)
 
 
 operator_map = {
-    _ast.Add: operator.add,
-    _ast.Sub: operator.sub,
-    _ast.Div: operator.truediv,
-    _ast.Mult: operator.mul,
+    _ast.Add: np.add,
+    _ast.Sub: np.subtract,
+    _ast.Div: np.true_divide,
+    _ast.Mult: np.multiply,
+}
+
+unary_operator_map = {
+    _ast.USub: np.negative,
 }
 
 function_map = {
@@ -394,49 +387,209 @@ function_map = {
 }
 
 
-def _evaluate_expression(expr, fields_and_datasets, generator):
-    if isinstance(expr, _ast.Name):
-        return fields_and_datasets[expr.id]
+OPERAND_FIELD = 0
+OPERAND_CONSTANT = 1
+OPERAND_STEP = 2
 
-    elif isinstance(expr, _ast.BinOp):
-        left_data = _evaluate_expression(
-            expr.left, fields_and_datasets, generator
-        )
 
-        right_data = _evaluate_expression(
-            expr.right, fields_and_datasets, generator
-        )
+class ExpressionPlan(object):
+    """ A compiled evaluation plan for a list of band expressions.
 
-        op = operator_map[type(expr.op)]
-        return op(left_data, right_data)
+        All subexpressions are deduplicated across the band expressions and
+        each unique operation becomes a step of the plan. Steps are evaluated
+        in blocks of rows, using a pool of block sized buffers which are
+        reused (in place where possible) as soon as the result of a step is
+        no longer required.
 
-    elif isinstance(expr, _ast.Call):
-        if not isinstance(expr.func, _ast.Name):
-            raise BrowseGenerationError('Invalid function call')
+        :param steps: a list of ``(function, operands)`` tuples
+        :param outputs: the operand for each output band
+        :param field_names: the names of all fields referenced by the plan
+    """
 
-        func = function_map.get(expr.func.id)
-        if not func:
+    def __init__(self, steps, outputs, field_names):
+        self.steps = steps
+        self.outputs = outputs
+        self.field_names = field_names
+
+        # determine the index of the last step using the result of each step.
+        # Results of output steps are kept until the whole block is written.
+        self._last_use = {}
+        for index, (_, operands) in enumerate(steps):
+            for kind, value in operands:
+                if kind == OPERAND_STEP:
+                    self._last_use[value] = index
+        for kind, value in outputs:
+            if kind == OPERAND_STEP:
+                self._last_use[value] = len(steps)
+
+    def evaluate(self, fields_and_data, width, height, write_block,
+                 block_rows=256, dtype=np.float32):
+        """ Evaluate the plan in blocks of rows.
+
+            :param fields_and_data: a dictionary mapping the field names to
+                                    arrays of size ``(height, width)``
+            :param write_block: a callable receiving the output band index,
+                                the row offset and the evaluated block
+            :param block_rows: the number of rows to evaluate at once
+            :param dtype: the data type all operations are performed in
+        """
+        free_buffers = []
+
+        def take_buffer(rows):
+            if free_buffers:
+                buf = free_buffers.pop()
+            else:
+                buf = np.empty((block_rows, width), dtype=dtype)
+            return buf[:rows]
+
+        def release_buffer(buf):
+            base = buf.base if buf.base is not None else buf
+            free_buffers.append(base)
+
+        for y_offset in range(0, height, block_rows):
+            rows = min(block_rows, height - y_offset)
+            results = {}
+
+            def resolve(operand):
+                kind, value = operand
+                if kind == OPERAND_FIELD:
+                    return fields_and_data[value][y_offset:y_offset + rows]
+                elif kind == OPERAND_CONSTANT:
+                    return value
+                return results[value]
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for index, (func, operands) in enumerate(self.steps):
+                    args = [resolve(operand) for operand in operands]
+
+                    # release the buffers of results that are not required
+                    # after this step. For ufuncs the buffer can be directly
+                    # reused for the output of this step.
+                    released = set(
+                        value for kind, value in operands
+                        if kind == OPERAND_STEP and
+                        self._last_use[value] == index
+                    )
+                    if isinstance(func, np.ufunc):
+                        for value in released:
+                            release_buffer(results.pop(value))
+                        out = take_buffer(rows)
+                        func(*args, out=out, dtype=dtype)
+                    else:
+                        out = take_buffer(rows)
+                        out[...] = func(*args)
+                        for value in released:
+                            release_buffer(results.pop(value))
+
+                    results[index] = out
+
+            for band_index, operand in enumerate(self.outputs):
+                data = resolve(operand)
+                if operand[0] == OPERAND_CONSTANT:
+                    data = np.full((rows, width), data, dtype=dtype)
+                write_block(band_index, y_offset, data)
+
+            for buf in results.values():
+                release_buffer(buf)
+
+
+def compile_expressions(band_expressions):
+    """ Compile the given band expressions to an :class:`ExpressionPlan`.
+
+        :param band_expressions: the band expressions (strings or already
+                                 parsed expressions)
+        :rtype: :class:`ExpressionPlan`
+    """
+    steps = []
+    field_names = []
+    operands_by_key = {}
+
+    def add_step(func, operands):
+        if all(kind == OPERAND_CONSTANT for kind, _ in operands):
+            # fold constant expressions
+            return (OPERAND_CONSTANT, func(*[value for _, value in operands]))
+
+        steps.append((func, operands))
+        return (OPERAND_STEP, len(steps) - 1)
+
+    def visit(expr):
+        key = ast.dump(expr)
+        if key in operands_by_key:
+            return operands_by_key[key]
+
+        if isinstance(expr, _ast.Name):
+            if expr.id not in field_names:
+                field_names.append(expr.id)
+            operand = (OPERAND_FIELD, expr.id)
+
+        elif isinstance(expr, _ast.BinOp):
+            func = operator_map.get(type(expr.op))
+            if not func:
+                raise BrowseGenerationError(
+                    'Unsupported operator %s' % type(expr.op).__name__
+                )
+            operand = add_step(func, (visit(expr.left), visit(expr.right)))
+
+        elif isinstance(expr, _ast.UnaryOp):
+            func = unary_operator_map.get(type(expr.op))
+            if not func:
+                raise BrowseGenerationError(
+                    'Unsupported operator %s' % type(expr.op).__name__
+                )
+            operand = add_step(func, (visit(expr.operand),))
+
+        elif isinstance(expr, _ast.Call):
+            if not isinstance(expr.func, _ast.Name):
+                raise BrowseGenerationError('Invalid function call')
+
+            func = function_map.get(expr.func.id)
+            if not func:
+                raise BrowseGenerationError(
+                    'Invalid function %s, available functions are %s'
+                    % (expr.func.id, ', '.join(function_map.keys()))
+                )
+
+            if not len(expr.args) == 1:
+                raise BrowseGenerationError(
+                    'Invalid number of arguments for function call'
+                )
+
+            operand = add_step(func, tuple(visit(arg) for arg in expr.args))
+
+        elif hasattr(_ast, 'Num') and isinstance(expr, _ast.Num):
+            operand = (OPERAND_CONSTANT, expr.n)
+
+        elif hasattr(_ast, 'Constant') and isinstance(expr, _ast.Constant):
+            operand = (OPERAND_CONSTANT, expr.value)
+
+        else:
             raise BrowseGenerationError(
-                'Invalid function %s, available functions are '
-                % (expr.func.id, ', '.join(function_map.keys()))
+                'Unsupported expression %s' % type(expr).__name__
             )
 
-        if not len(expr.args) == 1:
-            raise BrowseGenerationError(
-                'Invalid number of arguments for function call'
-            )
+        operands_by_key[key] = operand
+        return operand
+
+    outputs = [
+        visit(
+            parse_expression(band_expression)
+            if isinstance(band_expression, string_types)
+            else band_expression
+        )
+        for band_expression in band_expressions
+    ]
+
+    return ExpressionPlan(steps, outputs, field_names)
 
-        args_data = [
-            _evaluate_expression(
-                arg, fields_and_datasets, generator
-            ) for arg in expr.args
-        ]
-        res = func(*args_data)
-        logger.info("%s, %s, %s" % (expr.func.id, np.min(res), np.max(res)))
-        return res
 
-    elif hasattr(_ast, 'Num') and isinstance(expr, _ast.Num):
-        return expr.n
+EXPRESSION_PLAN_CACHE = LRUCache(128)
 
-    elif hasattr(_ast, 'Constant') and isinstance(expr, _ast.Constant):
-        return expr.value
+
+def get_expression_plan(band_expressions):
+    """ Get the (cached) compiled :class:`ExpressionPlan` for the given band
+        expressions.
+    """
+    key = tuple(band_expressions)
+    return EXPRESSION_PLAN_CACHE.get(
+        key, lambda: compile_expressions(band_expressions)
+    )
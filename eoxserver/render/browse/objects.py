@@ -25,10 +25,15 @@
 # THE SOFTWARE.
 # ------------------------------------------------------------------------------
 
+import hashlib
+
 from django.contrib.gis.geos import Polygon
 from django.contrib.gis.gdal import SpatialReference, CoordTransform, DataSource
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from eoxserver.contrib import gdal
+from eoxserver.core.util.cachetools import LRUCache
 from eoxserver.backends.access import get_vsi_path, get_vsi_env, gdal_open
 from eoxserver.render.coverage.objects import Coverage
 
@@ -103,9 +108,13 @@ class Browse(object):
             browse_model.max_x, browse_model.max_y
         )
 
-        ds = gdal_open(browse_model)
-        mode = _get_ds_mode(ds)
-        ds = None
+        mode = browse_model.mode
+        if not mode:
+            # fall back to reading the mode from the file for browses whose
+            # raster properties were not stored upon registration
+            ds = gdal_open(browse_model)
+            mode = get_ds_mode(ds)
+            ds = None
 
         if browse_model.browse_type:
             name = '%s__%s' % (
@@ -126,7 +135,7 @@ class Browse(object):
         ds = gdal.Open(filename)
         size = (ds.RasterXSize, ds.RasterYSize)
         extent = gdal.get_extent(ds)
-        mode = _get_ds_mode(ds)
+        mode = get_ds_mode(ds)
 
         return cls(
             filename, env, filename, size, extent,
@@ -176,7 +185,7 @@ class GeneratedBrowse(Browse):
         elif field_count == 3:
             return BROWSE_MODE_RGB
         elif field_count == 4:
-            return BROWSE_MODE_RGB
+            return BROWSE_MODE_RGBA
 
     @property
     def band_expressions(self):
@@ -223,11 +232,32 @@ class GeneratedBrowse(Browse):
         )
 
 
+# process wide cache of the parsed and prepared mask geometries, keyed by the
+# mask primary key, file and a digest of the stored geometry. The cached
+# geometries are shared and must thus not be modified.
+MASK_GEOMETRY_CACHE = LRUCache(256)
+
+
+def load_mask_geometry(filename):
+    """ Read the union of all geometries of the first layer of the given
+        vector file.
+    """
+    ds = DataSource(filename)
+    layer = ds[0]
+    geometries = layer.get_geoms()
+
+    first = geometries[0]
+    for other in geometries[1:]:
+        first = first.union(other)
+    return first.geos
+
+
 class Mask(object):
-    def __init__(self, filename=None, geometry=None, validity=False):
+    def __init__(self, filename=None, geometry=None, validity=False, pk=None):
         self._filename = filename
         self._geometry = geometry
         self._validity = validity
+        self._pk = pk
 
     @property
     def filename(self):
@@ -238,14 +268,64 @@ class Mask(object):
         return self._geometry
 
     def load_geometry(self):
-        ds = DataSource(self.filename)
-        layer = ds[0]
-        geometries = layer.get_geoms()
+        return load_mask_geometry(self.filename)
+
+    def _get_cached_geometries(self):
+        if self._geometry is None and not self._filename:
+            return None, None
+
+        def load():
+            geometry = self._geometry
+            if geometry is None:
+                geometry = self.load_geometry()
+            return geometry, geometry.prepared
+
+        if self._pk is None:
+            return load()
+
+        # the digest detects changed geometries, also when they were changed
+        # by another process
+        digest = None
+        if self._geometry is not None:
+            digest = hashlib.sha1(bytes(self._geometry.wkb)).hexdigest()
 
-        first = geometries[0]
-        for other in geometries[1:]:
-            first = first.union(other)
-        return first.geos
+        return MASK_GEOMETRY_CACHE.get(
+            (self._pk, self._filename, digest), load
+        )
+
+    def get_geometry(self):
+        """ Get the geometry of the mask, either as stored or loaded from
+            the mask file. Loaded geometries are cached per mask.
+        """
+        return self._get_cached_geometries()[0]
+
+    def get_prepared_geometry(self):
+        """ Get the mask geometry as a GEOS prepared geometry, cached per
+            mask.
+        """
+        return self._get_cached_geometries()[1]
+
+    def apply(self, footprint):
+        """ Clip the footprint to the mask, when it is a validity mask, or
+            cut the mask out of the footprint otherwise. The prepared mask
+            geometry is used to skip the overlay operation when the footprint
+            lies completely in or out of the mask. Returns ``None`` when
+            nothing of the footprint remains.
+        """
+        prepared = self.get_prepared_geometry()
+        if footprint is None or prepared is None:
+            return footprint
+
+        if prepared.disjoint(footprint):
+            return None if self.validity else footprint
+        elif prepared.covers(footprint):
+            return footprint if self.validity else None
+
+        if self.validity:
+            result = footprint.intersection(self.get_geometry())
+        else:
+            result = footprint.difference(self.get_geometry())
+        return None if result.empty else result
 
     @property
     def validity(self):
@@ -267,7 +347,10 @@ class Mask(object):
         if mask_type:
             validity = mask_type.validity
 
-        return cls(filename, geometry, validity)
+        return cls(
+            filename, geometry, validity,
+            pk=mask_model.pk if mask_model else None
+        )
 
 
 class MaskedBrowse(object):
@@ -292,15 +375,27 @@ class MaskedBrowse(object):
         )
 
 
-def _get_ds_mode(ds):
-    first = ds.GetRasterBand(1)
-
+def get_ds_mode(ds):
+    """ Get the browse mode of the given GDAL dataset. Three band datasets
+        are treated as RGB, even without the color interpretation set. Other
+        band layouts (e.g: gray with alpha) fall back to grayscale, in which
+        case only the first band is rendered.
+    """
     count = ds.RasterCount
-    if count == 1 or count > 4 and not first.GetColorTable():
-        mode = BROWSE_MODE_GRAYSCALE
-    elif (count == 1 and first.GetColorTable()) or count == 4:
-        mode = BROWSE_MODE_RGBA
-    elif count == 3 and first.GetColorInterpretation() == gdal.GCI_RedBand:
-        mode = BROWSE_MODE_RGB
-
-    return mode
+    if count == 4:
+        return BROWSE_MODE_RGBA
+    elif count == 3:
+        return BROWSE_MODE_RGB
+    return BROWSE_MODE_GRAYSCALE
+
+
+#
+# cache invalidation
+#
+
+@receiver(post_save, sender='coverages.Mask')
+@receiver(post_delete, sender='coverages.Mask')
+def _invalidate_mask_geometries(sender, **kwargs):
+    # masks are rarely changed, so simply invalidate all cached geometries,
+    # which also covers primary keys being reused after a deletion
+    MASK_GEOMETRY_CACHE.clear()
@@ -1,23 +1,96 @@
+import logging
+from collections import OrderedDict
 from uuid import uuid4
 
+from django.contrib.gis.geos import Polygon
+
 from eoxserver.contrib import gdal, osr
 from eoxserver.resources.coverages import crss
 
 
+logger = logging.getLogger(__name__)
+
+
 def create_mem_ds(width, height, data_type):
     driver = gdal.GetDriverByName('MEM')
     return driver.Create('', width, height, 1, data_type)
 
 
-def warp_fields(coverages, field_name, bbox, crs, width, height):
+def warp_fields(fields_and_coverages, field_names, bbox, crs, width, height):
+    """ Warp the data of the given fields to the requested bbox, CRS and size.
+
+        Coverages whose footprint does not intersect the bbox are skipped
+        before their datasets are opened. Fields located in the same files
+        are warped together through a single band-selecting VRT and the
+        warping reads from the overview level best matching the output
+        resolution.
+
+        :param fields_and_coverages: a dictionary mapping the field names to
+                                     all coverages with that field
+        :param field_names: the names of the fields to warp
+        :returns: a dictionary mapping the field names to the warped arrays
+        :rtype: dict
+    """
+    epsg = crss.parseEPSGCode(crs, [crss.fromShortCode])
+    bbox_polygon = _get_bbox_footprint(bbox, epsg)
+
+    fields_and_data = {}
+    for group_field_names, group_sources, data_type in _group_fields(
+            fields_and_coverages, field_names, bbox_polygon):
+        out_ds = _create_out_ds(
+            len(group_field_names), data_type, bbox, epsg, width, height
+        )
+
+        # iterate over the locations, each providing all fields of the group
+        for location_sources in zip(*group_sources):
+            location = location_sources[0][0]
+            band_indices = [band_index for _, band_index in location_sources]
+            _warp_location(
+                out_ds, location, band_indices, bbox, epsg, width
+            )
+
+        for i, field_name in enumerate(group_field_names, start=1):
+            fields_and_data[field_name] = (
+                out_ds.GetRasterBand(i).ReadAsArray()
+            )
+
+    return fields_and_data
+
+
+def _group_fields(fields_and_coverages, field_names, bbox_polygon):
+    """ Group the fields that are read from the same locations and are of
+        the same data type, so that they can be warped together. Coverages
+        whose footprint does not intersect the bbox polygon are skipped.
+        Returns a list of tuples of the field names, the (location, band
+        index) sources of each field and the data type.
+    """
+    groups = OrderedDict()
+    for field_name in field_names:
+        coverages = fields_and_coverages[field_name]
+        data_type = coverages[0].range_type.get_field(field_name).data_type
+
+        sources = []
+        for coverage in coverages:
+            if not _intersects(coverage, bbox_polygon):
+                continue
+            location = coverage.get_location_for_field(field_name)
+            sources.append((
+                location, coverage.get_band_index_for_field(field_name)
+            ))
+
+        key = (
+            tuple(location.path for location, _ in sources), data_type
+        )
+        group = groups.setdefault(key, ([], [], data_type))
+        group[0].append(field_name)
+        group[1].append(sources)
+
+    return list(groups.values())
+
+
+def _create_out_ds(band_count, data_type, bbox, epsg, width, height):
     driver = gdal.GetDriverByName('MEM')
-    out_ds = driver.Create(
-        '',
-        width,
-        height,
-        1,
-        coverages[0].range_type.get_field(field_name).data_type
-    )
+    out_ds = driver.Create('', width, height, band_count, data_type)
 
     out_ds.SetGeoTransform([
         bbox[0],
@@ -27,31 +100,112 @@ def warp_fields(coverages, field_name, bbox, crs, width, height):
         0,
         -(bbox[3] - bbox[1]) / height,
     ])
-    epsg = crss.parseEPSGCode(crs, [crss.fromShortCode])
     sr = osr.SpatialReference()
     sr.ImportFromEPSG(epsg)
 
     out_ds.SetProjection(sr.ExportToWkt())
+    return out_ds
 
-    for coverage in coverages:
-        location = coverage.get_location_for_field(field_name)
-        band_index = coverage.get_band_index_for_field(field_name)
 
-        orig_ds = gdal.open_with_env(location.path, location.env)
+def _warp_location(out_ds, location, band_indices, bbox, epsg, width):
+    """ Warp the selected bands of the given location into the output
+        dataset.
+    """
+    # the storage configuration is required while reading the data as well.
+    # Browses are generated in concurrent threads, so the options must not
+    # be set process-wide.
+    with gdal.config_env(location.env, thread_local=True):
+        orig_ds = gdal.Open(location.path)
 
         vrt_filename = None
-        if orig_ds.RasterCount > 1:
+        if band_indices != list(range(1, orig_ds.RasterCount + 1)):
             vrt_filename = '/vsimem/' + uuid4().hex
-            gdal.BuildVRT(vrt_filename, orig_ds, bandList=[band_index])
+            gdal.BuildVRT(vrt_filename, orig_ds, bandList=band_indices)
             ds = gdal.Open(vrt_filename)
         else:
             ds = orig_ds
 
-        gdal.Warp(out_ds, ds)
-        ds = None
+        # without a determined level, GDAL chooses the overview itself
+        options = []
+        overview_level = get_overview_level(ds, bbox, epsg, width)
+        if overview_level is not None:
+            options = ['-ovr', str(overview_level)]
+
+        gdal.Warp(out_ds, ds, options=options)
+        ds = orig_ds = None
+
+    if vrt_filename:
+        gdal.Unlink(vrt_filename)
+
+
+def get_overview_level(ds, bbox, epsg, width):
+    """ Get the index of the coarsest overview of the dataset which still has
+        at least the resolution of the output or ``None`` if no such overview
+        could be determined.
+    """
+    band = ds.GetRasterBand(1)
+    overview_count = band.GetOverviewCount()
+    if not overview_count:
+        return None
+
+    try:
+        factor = _get_target_resolution(ds, bbox, epsg, width) / abs(
+            ds.GetGeoTransform()[1]
+        )
+    except Exception:
+        logger.debug('Failed to determine the target resolution')
+        return None
+
+    level = None
+    for i in range(overview_count):
+        overview = band.GetOverview(i)
+        overview_factor = ds.RasterXSize / float(overview.XSize)
+        if overview_factor <= factor * 1.01:
+            level = i
+        else:
+            break
+    return level
+
+
+def _get_target_resolution(ds, bbox, epsg, width):
+    """ Approximate the resolution of the output in the units of the CRS of
+        the dataset.
+    """
+    target_res = (bbox[2] - bbox[0]) / float(width)
+    src_sr = osr.SpatialReference(ds.GetProjection())
+    dst_sr = osr.SpatialReference()
+    dst_sr.ImportFromEPSG(epsg)
+    if src_sr.IsSame(dst_sr):
+        return target_res
+
+    if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+        src_sr.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        dst_sr.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    transform = osr.CoordinateTransformation(dst_sr.sr, src_sr.sr)
+    center_y = (bbox[1] + bbox[3]) / 2.0
+    x_a, y_a = transform.TransformPoint(bbox[0], center_y)[:2]
+    x_b, y_b = transform.TransformPoint(bbox[2], center_y)[:2]
+    return abs(x_b - x_a) / float(width)
+
+
+def _get_bbox_footprint(bbox, epsg):
+    """ Get the bbox as a polygon in EPSG:4326 to compare it with coverage
+        footprints. Returns ``None`` if the bbox cannot be transformed.
+    """
+    polygon = Polygon.from_bbox(bbox)
+    polygon.srid = epsg
+    if epsg != 4326:
+        try:
+            polygon.transform(4326)
+        except Exception:
+            logger.debug('Failed to transform the bbox to EPSG:4326')
+            return None
+    return polygon
 
-        if vrt_filename:
-            gdal.Unlink(vrt_filename)
 
-    band = out_ds.GetRasterBand(1)
-    return band.ReadAsArray()
+def _intersects(coverage, bbox_polygon):
+    footprint = coverage.footprint
+    if bbox_polygon is None or footprint is None:
+        return True
+    return footprint.intersects(bbox_polygon)
@@ -32,7 +32,10 @@ except ImportError:
 
 from copy import deepcopy
 
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.utils.six import string_types
+from eoxserver.core.util.cachetools import LRUCache
 from eoxserver.core.util.timetools import parse_iso8601, parse_duration
 from eoxserver.contrib import gdal, osr
 from eoxserver.contrib.osr import SpatialReference
@@ -41,6 +44,11 @@ from eoxserver.backends.access import get_vsi_path, get_vsi_env
 GRID_TYPE_ELEVATION = 1
 GRID_TYPE_TEMPORAL = 2
 
+# process wide caches for the render objects of the coverage types and grids.
+# The cached objects are shared and must thus not be modified.
+RANGE_TYPE_CACHE = LRUCache(256)
+GRID_CACHE = LRUCache(256)
+
 
 def is_referenceable(grid_model):
     return grid_model.axis_1_offset is None
@@ -167,6 +175,16 @@ class RangeType(list):
 
     @classmethod
     def from_coverage_type(cls, coverage_type):
+        """ Get the (cached) range type for the given coverage type model.
+        """
+        if coverage_type.pk is None:
+            return cls._from_coverage_type(coverage_type)
+        return RANGE_TYPE_CACHE.get(
+            coverage_type.pk, lambda: cls._from_coverage_type(coverage_type)
+        )
+
+    @classmethod
+    def _from_coverage_type(cls, coverage_type):
         def get_data_type(field_type):
             numbits = (
                 field_type.numbits if field_type.numbits is not None else 16
@@ -330,6 +348,16 @@ class Grid(list):
 
     @classmethod
     def from_model(cls, grid_model):
+        """ Get the (cached) grid for the given grid model.
+        """
+        if grid_model.pk is None:
+            return cls._from_model(grid_model)
+        return GRID_CACHE.get(
+            grid_model.pk, lambda: cls._from_model(grid_model)
+        )
+
+    @classmethod
+    def _from_model(cls, grid_model):
         is_ref = is_referenceable(grid_model)
         names = grid_model.axis_names
         types = grid_model.axis_types
@@ -644,17 +672,21 @@ class Coverage(object):
             for item in model.metadata_items.all()
         ]
 
-        if model.coverage_type:
-            range_type = RangeType.from_coverage_type(
-                model.coverage_type
-            )
+        if model.coverage_type_id:
+            range_type = RANGE_TYPE_CACHE.get(model.coverage_type_id)
+            if range_type is None:
+                range_type = RangeType.from_coverage_type(
+                    model.coverage_type
+                )
         else:
             range_type = RangeType.from_gdal_dataset(
                 gdal.OpenShared(arraydata_locations[0].path),
                 model.identifier
             )
 
-        grid = Grid.from_model(model.grid)
+        grid = GRID_CACHE.get(model.grid_id)
+        if grid is None:
+            grid = Grid.from_model(model.grid)
 
         origin = Origin.from_description(grid.types, model.origin)
 
@@ -765,15 +797,18 @@ class Mosaic(object):
                 mosaic_model.footprint
             )
 
-        range_type = RangeType.from_coverage_type(
-            mosaic_model.coverage_type
-        )
+        range_type = RANGE_TYPE_CACHE.get(mosaic_model.coverage_type_id)
+        if range_type is None:
+            range_type = RangeType.from_coverage_type(
+                mosaic_model.coverage_type
+            )
 
-        grid_model = mosaic_model.grid
         grid = None
         origin = None
-        if grid_model:
-            grid = Grid.from_model(grid_model)
+        if mosaic_model.grid_id:
+            grid = GRID_CACHE.get(mosaic_model.grid_id)
+            if grid is None:
+                grid = Grid.from_model(mosaic_model.grid)
             origin = Origin.from_description(grid.types, mosaic_model.origin)
 
         coverages = [
@@ -826,3 +861,32 @@ def from_model(eo_object_model):
         return Coverage.from_model(eo_object_model)
     elif isinstance(eo_object_model, models.Mosaic):
         return Mosaic.from_model(eo_object_model)
+
+
+#
+# cache invalidation
+#
+
+@receiver(post_save, sender='coverages.CoverageType')
+@receiver(post_delete, sender='coverages.CoverageType')
+def _invalidate_coverage_type(sender, instance, **kwargs):
+    RANGE_TYPE_CACHE.pop(instance.pk)
+
+
+@receiver(post_save, sender='coverages.FieldType')
+@receiver(post_delete, sender='coverages.FieldType')
+@receiver(post_save, sender='coverages.AllowedValueRange')
+@receiver(post_delete, sender='coverages.AllowedValueRange')
+@receiver(post_save, sender='coverages.NilValue')
+@receiver(post_delete, sender='coverages.NilValue')
+@receiver(m2m_changed, sender='coverages.NilValue_field_types')
+def _invalidate_range_types(sender, **kwargs):
+    # changes to the fields of a coverage type are rare, so simply invalidate
+    # all range types instead of resolving the affected coverage type
+    RANGE_TYPE_CACHE.clear()
+
+
+@receiver(post_save, sender='coverages.Grid')
+@receiver(post_delete, sender='coverages.Grid')
+def _invalidate_grid(sender, instance, **kwargs):
+    GRID_CACHE.pop(instance.pk)
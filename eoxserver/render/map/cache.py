@@ -0,0 +1,339 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Caching of rendered maps.
+
+    Cache entries are stored under a key computed from the normalized map
+    request and the current generation of every layer referenced by it.
+    Invalidating a layer (e.g: when products are inserted into or removed from
+    a collection) assigns a new generation to it, making all previous entries
+    of that layer unreachable, until they are evicted.
+
+    The cache is configured via the ``EOXS_MAP_CACHE`` setting::
+
+        EOXS_MAP_CACHE = {
+            'BACKEND': 'eoxserver.render.map.cache.DiskMapCache',
+            'OPTIONS': {
+                'path': '/var/cache/eoxserver/maps',
+                'max_size': 1024 * 1024 * 1024,
+            }
+        }
+"""
+
+import os
+import json
+import errno
+import hashlib
+import tempfile
+from uuid import uuid4
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.six.moves import cPickle as pickle
+
+from eoxserver.render.map.config import DEFAULT_EOXS_MAP_CACHE
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class BaseMapCache(object):
+    """ Base class for map caches. Sub-classes have to implement the storage
+        of entries and layer generations.
+    """
+
+    def get_key(self, request_params, layer_names):
+        """ Compute the key for the normalized ``request_params`` referencing
+            the layers with the given names.
+        """
+        generations = [
+            (name, self.get_generation(name))
+            for name in sorted(set(layer_names))
+        ]
+        serialized = json.dumps(
+            [request_params, generations], sort_keys=True, default=str
+        )
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Get the cached value for the key or ``None``.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """ Store the value under the given key.
+        """
+        raise NotImplementedError
+
+    def get_generation(self, layer_name):
+        """ Get the current generation token of the layer.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, layer_name):
+        """ Invalidate all entries referencing the given layer.
+        """
+        raise NotImplementedError
+
+
+class DiskMapCache(BaseMapCache):
+    """ Map cache storing its entries as files in a directory. When the total
+        size of the entries exceeds ``max_size`` bytes, the least recently
+        used entries are evicted.
+    """
+
+    def __init__(self, path, max_size=512 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self._size = None
+        self._lock = Lock()
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.path, 'entries', key[:2], key)
+
+    def _get_generation_path(self, layer_name):
+        return os.path.join(
+            self.path, 'generations',
+            hashlib.sha1(layer_name.encode('utf-8')).hexdigest()
+        )
+
+    def get(self, key):
+        path = self._get_entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            # mark the entry as recently used
+            os.utime(path, None)
+            return value
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        path = self._get_entry_path(key)
+        try:
+            # an overwritten entry no longer adds to the size of the cache
+            try:
+                replaced_size = os.path.getsize(path)
+            except OSError:
+                replaced_size = 0
+            _write_atomic(path, pickle.dumps(value, 2))
+            self._add_size(os.path.getsize(path) - replaced_size)
+        except (IOError, OSError) as e:
+            logger.warning('Failed to store cached map %r: %s' % (path, e))
+
+    def get_generation(self, layer_name):
+        try:
+            with open(self._get_generation_path(layer_name)) as f:
+                return f.read().strip()
+        except (IOError, OSError):
+            return '0'
+
+    def invalidate(self, layer_name):
+        _write_atomic(
+            self._get_generation_path(layer_name),
+            uuid4().hex.encode('ascii')
+        )
+
+    def _iter_entries(self):
+        entries_path = os.path.join(self.path, 'entries')
+        for dirpath, _, filenames in os.walk(entries_path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _add_size(self, size):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._iter_entries())
+            else:
+                self._size += size
+
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """ Remove the least recently used entries until the cache is filled
+            to 90% of its maximum size. The size is re-calculated, as other
+            processes may share the same directory.
+        """
+        entries = sorted(self._iter_entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        target_size = self.max_size * 0.9
+        for path, entry_size, _ in entries:
+            if size <= target_size:
+                break
+            try:
+                os.remove(path)
+                size -= entry_size
+            except OSError:
+                pass
+        self._size = size
+
+
+class DjangoMapCache(BaseMapCache):
+    """ Map cache using one of the configured Django caches. The eviction of
+        entries is left to the cache backend.
+    """
+
+    def __init__(self, alias='default', timeout=None, key_prefix='eoxs_map'):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get('%s:%s' % (self.key_prefix, key))
+
+    def set(self, key, value):
+        self.cache.set('%s:%s' % (self.key_prefix, key), value, self.timeout)
+
+    def _get_generation_key(self, layer_name):
+        return '%s_generation:%s' % (
+            self.key_prefix,
+            hashlib.sha1(layer_name.encode('utf-8')).hexdigest()
+        )
+
+    def get_generation(self, layer_name):
+        return self.cache.get(self._get_generation_key(layer_name), '0')
+
+    def invalidate(self, layer_name):
+        # generations must never expire, otherwise stale entries would
+        # become reachable again
+        self.cache.set(
+            self._get_generation_key(layer_name), uuid4().hex, None
+        )
+
+
+MAP_CACHE = None
+MAP_CACHE_CONFIGURED = False
+
+
+def get_map_cache():
+    """ Get the configured map cache or ``None`` if map caching is disabled.
+    """
+    global MAP_CACHE, MAP_CACHE_CONFIGURED
+    if not MAP_CACHE_CONFIGURED:
+        cache_config = getattr(
+            settings, 'EOXS_MAP_CACHE', DEFAULT_EOXS_MAP_CACHE
+        )
+        if cache_config:
+            MAP_CACHE = import_string(cache_config['BACKEND'])(
+                **cache_config.get('OPTIONS', {})
+            )
+        MAP_CACHE_CONFIGURED = True
+
+    return MAP_CACHE
+
+
+def _write_atomic(path, content):
+    """ Write the file via a temporary file and rename it to its final path,
+        so that concurrent readers never see partially written files.
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+# ------------------------------------------------------------------------------
+# Invalidation
+# ------------------------------------------------------------------------------
+
+
+def _invalidate(identifiers):
+    map_cache = get_map_cache()
+    if map_cache is None:
+        return
+
+    for identifier in identifiers:
+        logger.debug('Invalidating cached maps of layer %r' % identifier)
+        map_cache.invalidate(identifier)
+
+
+@receiver(m2m_changed, sender='coverages.Product_collections')
+@receiver(m2m_changed, sender='coverages.Coverage_collections')
+def _on_collection_changed(sender, instance, action, reverse, model, pk_set,
+                           **kwargs):
+    """ Invalidate the cached maps of collections when products or coverages
+        are inserted or removed.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear') \
+            or get_map_cache() is None:
+        return
+
+    if reverse:
+        # the collection itself was changed
+        identifiers = [instance.identifier]
+    elif action == 'pre_clear':
+        identifiers = instance.collections.values_list(
+            'identifier', flat=True
+        )
+    else:
+        identifiers = model.objects.filter(pk__in=pk_set).values_list(
+            'identifier', flat=True
+        )
+
+    _invalidate(identifiers)
+
+
+@receiver(pre_delete, sender='coverages.Product')
+@receiver(pre_delete, sender='coverages.Coverage')
+def _on_eo_object_deleted(sender, instance, **kwargs):
+    """ Invalidate the cached maps of the deleted object and its collections,
+        as the removal from the collections does not trigger ``m2m_changed``.
+    """
+    if get_map_cache() is None:
+        return
+
+    _invalidate(
+        [instance.identifier] + list(
+            instance.collections.values_list('identifier', flat=True)
+        )
+    )
@@ -29,3 +29,5 @@
 DEFAULT_EOXS_MAP_RENDERER = (
     "eoxserver.render.mapserver.map_renderer.MapserverMapRenderer"
 )
+
+DEFAULT_EOXS_MAP_CACHE = None
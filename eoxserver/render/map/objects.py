@@ -292,6 +292,40 @@ class OutlinesLayer(Layer):
         return self._fill
 
 
+class DensityLayer(Layer):
+    """ Representation of a layer showing the number of objects per cell of a
+        grid in EPSG:4326.
+
+        :param extent: the extent of the grid in EPSG:4326
+        :param size: the number of (columns, rows) of the grid
+        :param counts: a dict mapping (column, row) to the number of objects
+        :param range: the count range to scale the colors to. Defaults to one
+                      up to the maximum count.
+    """
+    def __init__(self, name, style, extent, size, counts, range=None):
+        super(DensityLayer, self).__init__(name, style)
+        self._extent = extent
+        self._size = size
+        self._counts = counts
+        self._range = range
+
+    @property
+    def extent(self):
+        return self._extent
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def range(self):
+        return self._range
+
+
 class Map(object):
     """ Abstract interpretation of a map to be drawn.
     """
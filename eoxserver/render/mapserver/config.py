@@ -34,4 +34,5 @@ DEFAULT_EOXS_MAPSERVER_LAYER_FACTORIES = [
     'eoxserver.render.mapserver.factories.MaskLayerFactory',
     'eoxserver.render.mapserver.factories.MaskedBrowseLayerFactory',
     'eoxserver.render.mapserver.factories.OutlinesLayerFactory',
+    'eoxserver.render.mapserver.factories.DensityLayerFactory',
 ]
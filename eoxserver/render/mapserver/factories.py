@@ -27,6 +27,9 @@
 
 from os.path import join
 from uuid import uuid4
+import struct
+from itertools import groupby
+from multiprocessing.pool import ThreadPool
 try:
     from itertools import izip_longest
 except ImportError:
@@ -35,11 +38,13 @@ except ImportError:
 from django.conf import settings
 from django.utils.module_loading import import_string
 
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.decoders import config
 from eoxserver.core.util.iteratortools import pairwise_iterative
 from eoxserver.contrib import mapserver as ms
 from eoxserver.contrib import vsi, vrt, gdal, osr
 from eoxserver.render.browse.objects import (
-    Browse, GeneratedBrowse, BROWSE_MODE_GRAYSCALE
+    Browse, GeneratedBrowse, BROWSE_MODE_GRAYSCALE, BROWSE_MODE_RGB
 )
 from eoxserver.render.browse.generate import (
     generate_browse, FilenameGenerator
@@ -47,7 +52,7 @@ from eoxserver.render.browse.generate import (
 from eoxserver.render.map.objects import (
     CoverageLayer, CoveragesLayer, MosaicLayer, OutlinedCoveragesLayer,
     BrowseLayer, OutlinedBrowseLayer,
-    MaskLayer, MaskedBrowseLayer, OutlinesLayer
+    MaskLayer, MaskedBrowseLayer, OutlinesLayer, DensityLayer
 )
 from eoxserver.render.mapserver.config import (
     DEFAULT_EOXS_MAPSERVER_LAYER_FACTORIES,
@@ -331,21 +336,66 @@ class MosaicLayerFactory(CoverageLayerFactoryMixIn, BaseMapServerLayerFactory):
 # very similar
 
 
+class BrowseLayerConfigReader(config.Reader):
+    section = "services.ows.wms"
+    browse_generation_workers = config.Option(type=int, default=1)
+    browse_mosaic = config.Option(type=bool, default=False)
+    browse_mosaic_min_count = config.Option(type=int, default=2)
+
+
 class BrowseLayerMixIn(object):
+    def generate_browses(self, browses, map_, filename_generator):
+        """ Generate the output files for all :class:`GeneratedBrowse`
+            instances in ``browses``. When configured, the browses are
+            generated concurrently using a pool of threads, as GDAL releases
+            the GIL when warping. Returns a list of the generation results
+            in the order of the browses (``None`` for non-generated
+            browses).
+        """
+        def generate(browse):
+            if not isinstance(browse, GeneratedBrowse):
+                return None
+            return generate_browse(
+                browse.band_expressions,
+                browse.fields_and_coverages,
+                map_.width, map_.height,
+                map_.bbox,
+                map_.crs,
+                filename_generator
+            )
+
+        generated_count = sum(
+            1 for browse in browses if isinstance(browse, GeneratedBrowse)
+        )
+        workers = min(
+            BrowseLayerConfigReader(
+                get_eoxserver_config()
+            ).browse_generation_workers,
+            generated_count
+        )
+
+        if workers <= 1:
+            return [generate(browse) for browse in browses]
+
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(generate, browses, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
     def make_browse_layer_generator(self, map_obj, browses, map_,
                                     filename_generator, group_name, ranges,
                                     style):
-        for browse in browses:
+        browses = list(browses)
+        generation_results = self.generate_browses(
+            browses, map_, filename_generator
+        )
+
+        for browse, generation_result in zip(browses, generation_results):
             if isinstance(browse, GeneratedBrowse):
                 creation_info, filename_generator, reset_info = \
-                    generate_browse(
-                        browse.band_expressions,
-                        browse.fields_and_coverages,
-                        map_.width, map_.height,
-                        map_.bbox,
-                        map_.crs,
-                        filename_generator
-                    )
+                    generation_result
                 layer_objs = _create_raster_layer_objs(
                     map_obj, browse.extent, browse.spatial_reference,
                     creation_info.filename, filename_generator
@@ -435,6 +485,42 @@ class BrowseLayerMixIn(object):
 
             yield browse, layer_objs
 
+    def make_browse_mosaic_layer(self, map_obj, browses, filename_generator,
+                                 group_name):
+        """ Create a single raster layer for all ``browses`` by combining
+            them into a mosaic VRT. The browses must share their CRS, mode
+            and storage configuration. Returns ``None`` when not all browses
+            could be included in the mosaic, in which case they have to be
+            rendered individually.
+        """
+        env = browses[0].env or {}
+        ms.set_env(map_obj, env, True)
+
+        filenames = [browse.filename for browse in browses]
+        filename = filename_generator.generate('vrt')
+        mosaic_ds, included = vrt.build_mosaic(
+            filenames, env, filename, nodata=0
+        )
+        extent = gdal.get_extent(mosaic_ds)
+        # close the dataset to write the VRT
+        mosaic_ds = None
+
+        if len(included) < len(set(filenames)):
+            logger.warning(
+                'Could only include %d of %d browses in the mosaic, '
+                'falling back to one layer per browse.'
+                % (len(included), len(set(filenames)))
+            )
+            return None
+
+        layer_objs = _create_raster_layer_objs(
+            map_obj, extent, browses[0].spatial_reference, filename,
+            filename_generator
+        )
+        for layer_obj in layer_objs:
+            layer_obj.group = group_name
+        return layer_objs
+
 
 class BrowseLayerFactory(CoverageLayerFactoryMixIn, BrowseLayerMixIn,
                          BaseMapServerLayerFactory):
@@ -448,13 +534,27 @@ class BrowseLayerFactory(CoverageLayerFactoryMixIn, BrowseLayerMixIn,
         ranges = layer.ranges
         style = layer.style
 
-        generator = self.make_browse_layer_generator(
-            map_obj, reversed(layer.browses), layer.map, filename_generator,
-            group_name, ranges, style
-        )
+        reader = BrowseLayerConfigReader(get_eoxserver_config())
+        browses = list(reversed(layer.browses))
+        if reader.browse_mosaic:
+            runs = _split_browse_mosaic_runs(
+                browses, reader.browse_mosaic_min_count
+            )
+        else:
+            runs = [(False, browses)]
 
-        for _ in generator:
-            pass
+        for mosaic, run_browses in runs:
+            if mosaic and self.make_browse_mosaic_layer(
+                    map_obj, run_browses, filename_generator, group_name):
+                continue
+
+            generator = self.make_browse_layer_generator(
+                map_obj, run_browses, layer.map, filename_generator,
+                group_name, ranges, style
+            )
+
+            for _ in generator:
+                pass
 
         return filename_generator
 
@@ -508,11 +608,8 @@ class MaskLayerFactory(BaseMapServerLayerFactory):
     def create(self, map_obj, layer):
         layer_obj = _create_polygon_layer(map_obj)
         for mask in reversed(layer.masks):
-            if mask.geometry:
-                mask_geom = mask.geometry
-            elif mask.filename:
-                mask_geom = mask.load_geometry()
-            else:
+            mask_geom = mask.get_geometry()
+            if not mask_geom:
                 continue
 
             shape_obj = ms.shapeObj.fromWKT(mask_geom.wkt)
@@ -552,12 +649,7 @@ class MaskedBrowseLayerFactory(BrowseLayerMixIn, BaseMapServerLayerFactory):
                 _create_geometry_class("black", "white", fill_opacity=1.0)
             )
 
-            if mask.geometry:
-                mask_geom = mask.geometry
-            elif mask.filename:
-                mask_geom = mask.load_geometry()
-            else:
-                mask_geom = None
+            mask_geom = mask.get_geometry()
 
             # the current logic:
             # when dealing with validity masks:
@@ -575,7 +667,7 @@ class MaskedBrowseLayerFactory(BrowseLayerMixIn, BaseMapServerLayerFactory):
                 if mask.validity:
                     outline = mask_geom
                 else:
-                    outline = outline - mask_geom
+                    outline = mask.apply(outline)
             elif mask.validity:
                 outline = None
 
@@ -607,15 +699,9 @@ class OutlinesLayerFactory(BaseMapServerLayerFactory):
         )
         for footprint, mask in reversed(footprint_masks):
             if mask:
-                if mask.geometry:
-                    mask_geom = mask.geometry
-                elif mask.filename:
-                    mask_geom = mask.load_geometry()
-
-                if mask.validity:
-                    footprint = footprint.intersection(mask_geom)
-                else:
-                    footprint = footprint.difference(mask_geom)
+                footprint = mask.apply(footprint)
+                if footprint is None:
+                    continue
 
             shape_obj = ms.shapeObj.fromWKT(footprint.wkt)
             layer_obj.addFeature(shape_obj)
@@ -626,6 +712,71 @@ class OutlinesLayerFactory(BaseMapServerLayerFactory):
         layer_obj.insertClass(class_obj)
 
 
+class DensityLayerConfigReader(config.Reader):
+    section = "services.ows.wms"
+    density_style = config.Option(type=str, default="viridis")
+
+
+class DensityLayerFactory(BaseMapServerLayerFactory):
+    """ Renders the counts of a :class:`DensityLayer` as a color-scaled
+        raster. Empty cells are transparent.
+    """
+    handled_layer_types = [DensityLayer]
+
+    def create(self, map_obj, layer):
+        filename_generator = FilenameGenerator(
+            '/vsimem/{uuid}.{extension}', 'tif'
+        )
+        path = filename_generator.generate()
+        columns, rows = layer.size
+        minx, miny, maxx, maxy = layer.extent
+
+        values = [0.0] * (columns * rows)
+        for (column, row), count in layer.counts.items():
+            values[row * columns + column] = count
+
+        sr = osr.SpatialReference(4326)
+        driver = gdal.GetDriverByName('GTiff')
+        ds = driver.Create(path, columns, rows, 1, gdal.GDT_Float32)
+        ds.SetGeoTransform([
+            minx, (maxx - minx) / columns, 0,
+            maxy, 0, -(maxy - miny) / rows
+        ])
+        ds.SetProjection(sr.wkt)
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(0)
+        band.WriteRaster(
+            0, 0, columns, rows,
+            struct.pack('%df' % len(values), *values)
+        )
+        band = None
+        ds = None
+
+        if layer.range:
+            range_ = layer.range
+        else:
+            range_ = (1, max(list(layer.counts.values()) or [1]))
+
+        style = layer.style or DensityLayerConfigReader(
+            get_eoxserver_config()
+        ).density_style
+
+        layer_objs = _create_raster_layer_objs(
+            map_obj, layer.extent, sr, path, filename_generator,
+        )
+        for layer_obj in layer_objs:
+            layer_obj.setProcessingKey("CLOSE_CONNECTION", "CLOSE")
+            _create_raster_style(
+                style, layer_obj, range_[0], range_[1], [0]
+            )
+
+        return filename_generator
+
+    def destroy(self, map_obj, layer, filename_generator):
+        for filename in filename_generator.filenames:
+            vsi.unlink(filename)
+
+
 # ------------------------------------------------------------------------------
 # utils
 # ------------------------------------------------------------------------------
@@ -681,6 +832,42 @@ def _create_raster_layer_objs(map_obj, extent, sr, data, filename_generator,
         return [layer_obj]
 
 
+def _get_browse_mosaic_key(browse):
+    """ Get the key by which browses can be combined in a mosaic or ``None``
+        if the browse has to be rendered in its own layer: generated browses
+        need their own scaling, browses with an alpha channel or crossing the
+        dateline cannot be mosaicked. Browses are only combined when they are
+        accessed with the same storage configuration.
+    """
+    if type(browse) is not Browse or browse.mode not in (
+            BROWSE_MODE_RGB, BROWSE_MODE_GRAYSCALE):
+        return None
+
+    sr = browse.spatial_reference
+    if sr.srid and extent_crosses_dateline(browse.extent, sr.srid):
+        return None
+
+    return (browse.crs, browse.mode, tuple(sorted((browse.env or {}).items())))
+
+
+def _split_browse_mosaic_runs(browses, min_count):
+    """ Split the browses (in render order) into runs of consecutive browses
+        that can be rendered as a single mosaic. Returns a list of tuples of a
+        flag whether the run shall be mosaicked and the browses of the run.
+        Keeping the runs consecutive retains the order in which the browses
+        are drawn.
+    """
+    runs = []
+    for key, run_browses in groupby(browses, _get_browse_mosaic_key):
+        run_browses = list(run_browses)
+        mosaic = key is not None and len(run_browses) >= min_count
+        if runs and not mosaic and not runs[-1][0]:
+            runs[-1][1].extend(run_browses)
+        else:
+            runs.append((mosaic, run_browses))
+    return runs
+
+
 def _create_polygon_layer(map_obj):
     layer_obj = ms.layerObj(map_obj)
     layer_obj.type = ms.MS_LAYER_POLYGON
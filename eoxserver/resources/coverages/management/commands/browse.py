@@ -32,17 +32,24 @@ from eoxserver.resources.coverages import models
 from eoxserver.resources.coverages.management.commands import (
     CommandOutputMixIn, SubParserMixIn
 )
-from eoxserver.resources.coverages.registration.browse import BrowseRegistrator
+from eoxserver.backends.access import gdal_open
+from eoxserver.resources.coverages.registration.browse import (
+    BrowseRegistrator, read_browse_raster_properties
+)
 
 
 class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
     """ Command to manage browses. This command uses sub-commands for the
-        specific tasks: register, generate, deregister
+        specific tasks: register, generate, deregister, update
     """
     def add_arguments(self, parser):
         register_parser = self.add_subparser(parser, 'register')
         generate_parser = self.add_subparser(parser, 'generate')
         deregister_parser = self.add_subparser(parser, 'deregister')
+        update_parser = self.add_subparser(
+            parser, 'update',
+            help='Store the raster properties of already registered browses.'
+        )
 
         for parser in [register_parser, generate_parser, deregister_parser]:
             parser.add_argument(
@@ -58,10 +65,28 @@ class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
             help='The name of the browse type to associate the browse with.'
         )
 
+        update_parser.add_argument(
+            'identifiers', nargs='*',
+            help='The product identifiers to update the browses for.'
+        )
+        update_parser.add_argument(
+            '--all', '-a', action="store_true",
+            default=False, dest='all_products',
+            help='Update the browses of all products.'
+        )
+        update_parser.add_argument(
+            '--force', '-f', action="store_true", default=False,
+            help='Also update browses which already have stored properties.'
+        )
+
     @transaction.atomic
-    def handle(self, subcommand, identifier, *args, **kwargs):
-        """ Dispatch sub-commands: register, deregister.
+    def handle(self, subcommand, identifier=None, *args, **kwargs):
+        """ Dispatch sub-commands: register, generate, deregister, update.
         """
+        if subcommand == "update":
+            self.handle_update(*args, **kwargs)
+            return
+
         identifier = identifier[0]
         if subcommand == "register":
             self.handle_register(identifier, *args, **kwargs)
@@ -93,3 +118,38 @@ class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
         """ Handle the deregistration a browse image
         """
         raise NotImplementedError
+
+    def handle_update(self, identifiers, all_products, force, **kwargs):
+        """ Handle the update of the stored raster properties (band count,
+            data type and mode) of already registered browses.
+        """
+        if not identifiers and not all_products:
+            raise CommandError(
+                'Either specify the product identifiers or use --all.'
+            )
+
+        browses = models.Browse.objects.select_related(
+            'product', 'storage'
+        ).order_by('pk')
+        if not all_products:
+            browses = browses.filter(product__identifier__in=identifiers)
+        if not force:
+            browses = browses.filter(mode__isnull=True)
+
+        count = 0
+        for browse in browses.iterator():
+            try:
+                ds = gdal_open(browse, False)
+                read_browse_raster_properties(browse, ds)
+                ds = None
+            except Exception as e:
+                self.print_wrn(
+                    'Failed to read browse %r of product %r: %s'
+                    % (browse.location, browse.product.identifier, e)
+                )
+                continue
+
+            browse.save(update_fields=['band_count', 'data_type', 'mode'])
+            count += 1
+
+        print('Successfully updated %d browse(s)' % count)
@@ -59,6 +59,142 @@ dbapi2.register_converter("timestamp", decoder(parse_datetime))
 dbapi2.register_converter("TIMESTAMP", decoder(parse_datetime))
 
 
+def get_time_intervals(collection, unique_times=False):
+    """ Get the time intervals of the products of the collection as tuples of
+        (begin-time, end-time, min-x, min-y, max-x, max-y). With
+        ``unique_times``, products with equal times are merged and
+        overlapping intervals are combined.
+    """
+    logger.debug("Starting query for browses")
+
+    products_qs = models.Product.objects.filter(
+        collections=collection,
+    ).annotate(
+        extent=Extent('footprint')
+    ).values(
+        'begin_time', 'end_time', 'extent'
+    ).order_by(
+        'begin_time', 'end_time'
+    )
+
+    logger.info("Number products: %s" % products_qs.count())
+
+    if not unique_times:
+        time_intervals = (
+            (
+                product['begin_time'],
+                product['end_time']
+            ) + product['extent']
+            for product in products_qs
+        )
+    else:
+        logger.debug("Starting query for unique times")
+        # optimization for when there are a lot of equal time entries
+        # like for Sentinel-2
+        unique_times_qs = models.Product.objects.filter(
+            collections=collection,
+        ).values_list(
+            'begin_time', 'end_time'
+        ).distinct(
+            'begin_time', 'end_time'
+        ).order_by(
+            'begin_time', 'end_time'
+        )
+        logger.info(
+            "Number unique times: %s" % unique_times_qs.count()
+        )
+
+        logger.info("Iterating through unique times")
+        time_intervals = []
+        i = 1
+        for begin_time, end_time in unique_times_qs:
+            logger.debug(
+                "Working on unique time %s: %s/%s " %
+                (i, begin_time, end_time)
+            )
+            i += 1
+
+            minx, miny, maxx, maxy = (None,) * 4
+
+            # search for all browses within that time interval and
+            # combine extent
+            time_qs = products_qs.filter(
+                begin_time=begin_time,
+                end_time=end_time
+            )
+
+            if time_qs.count() <= 0:
+                logger.errro(
+                    "DB queries got different results which should "
+                    "never happen."
+                )
+                raise CommandError("DB queries got different results.")
+            else:
+                for time in time_qs:
+                    # decode extent from the above hack
+                    minx_tmp, miny_tmp, maxx_tmp, maxy_tmp = \
+                        time['extent']
+                    # change one extent to ]0,360] if difference gets
+                    # smaller
+                    if minx is not None and maxx is not None:
+                        if (minx_tmp <= 0 and maxx_tmp <= 0 and
+                                (minx-maxx_tmp) > (360+minx_tmp-maxx)):
+                            minx_tmp += 360
+                            maxx_tmp += 360
+                        elif (minx <= 0 and maxx <= 0 and
+                                (minx_tmp-maxx) > (360+minx-maxx_tmp)):
+                            minx += 360
+                            maxx += 360
+                    minx = min(
+                        i for i in [minx_tmp, minx] if i is not None
+                    )
+                    miny = min(
+                        i for i in [miny_tmp, miny] if i is not None
+                    )
+                    maxx = max(
+                        i for i in [maxx_tmp, maxx] if i is not None
+                    )
+                    maxy = max(
+                        i for i in [maxy_tmp, maxy] if i is not None
+                    )
+
+            # check if previous element in ordered list overlaps
+            if (
+                len(time_intervals) > 0 and (
+                    (
+                        (
+                            begin_time == end_time or
+                            time_intervals[-1][0] ==
+                            time_intervals[-1][1]
+                        ) and (
+                            time_intervals[-1][0] <= end_time and
+                            time_intervals[-1][1] >= begin_time
+                        )
+                    ) or (
+                        time_intervals[-1][0] < end_time and
+                        time_intervals[-1][1] > begin_time
+                    )
+                )
+            ):
+                begin_time = min(begin_time, time_intervals[-1][0])
+                end_time = max(end_time, time_intervals[-1][1])
+                minx = min(minx, time_intervals[-1][2])
+                miny = min(miny, time_intervals[-1][3])
+                maxx = max(maxx, time_intervals[-1][4])
+                maxy = max(maxy, time_intervals[-1][5])
+                time_intervals.pop(-1)
+            time_intervals.append(
+                (begin_time, end_time, minx, miny, maxx, maxy)
+            )
+
+        logger.info(
+            "Number non-overlapping time intervals: %s" %
+            len(time_intervals)
+        )
+
+    return time_intervals
+
+
 class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
     help = ("Synchronizes the MapCache SQLite DB holding times and extents.")
 
@@ -150,132 +286,7 @@ class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
         try:
             logger.info("Syncing layer '%s'" % collection.identifier)
 
-            logger.debug("Starting query for browses")
-
-            products_qs = models.Product.objects.filter(
-                collections=collection,
-            ).annotate(
-                extent=Extent('footprint')
-            ).values(
-                'begin_time', 'end_time', 'extent'
-            ).order_by(
-                'begin_time', 'end_time'
-            )
-
-            logger.info("Number products: %s" % products_qs.count())
-
-            if not unique_times:
-                time_intervals = (
-                    (
-                        product['begin_time'],
-                        product['end_time']
-                    ) + product['extent']
-                    for product in products_qs
-                )
-            else:
-                logger.debug("Starting query for unique times")
-                # optimization for when there are a lot of equal time entries
-                # like for Sentinel-2
-                unique_times_qs = models.Product.objects.filter(
-                    collections=collection,
-                ).values_list(
-                    'begin_time', 'end_time'
-                ).distinct(
-                    'begin_time', 'end_time'
-                ).order_by(
-                    'begin_time', 'end_time'
-                )
-                logger.info(
-                    "Number unique times: %s" % unique_times_qs.count()
-                )
-
-                logger.info("Iterating through unique times")
-                time_intervals = []
-                i = 1
-                for begin_time, end_time in unique_times_qs:
-                    logger.debug(
-                        "Working on unique time %s: %s/%s " %
-                        (i, begin_time, end_time)
-                    )
-                    i += 1
-
-                    minx, miny, maxx, maxy = (None,) * 4
-
-                    # search for all browses within that time interval and
-                    # combine extent
-                    time_qs = products_qs.filter(
-                        begin_time=begin_time,
-                        end_time=end_time
-                    )
-
-                    if time_qs.count() <= 0:
-                        logger.errro(
-                            "DB queries got different results which should "
-                            "never happen."
-                        )
-                        raise CommandError("DB queries got different results.")
-                    else:
-                        for time in time_qs:
-                            # decode extent from the above hack
-                            minx_tmp, miny_tmp, maxx_tmp, maxy_tmp = \
-                                time['extent']
-                            # change one extent to ]0,360] if difference gets
-                            # smaller
-                            if minx is not None and maxx is not None:
-                                if (minx_tmp <= 0 and maxx_tmp <= 0 and
-                                        (minx-maxx_tmp) > (360+minx_tmp-maxx)):
-                                    minx_tmp += 360
-                                    maxx_tmp += 360
-                                elif (minx <= 0 and maxx <= 0 and
-                                        (minx_tmp-maxx) > (360+minx-maxx_tmp)):
-                                    minx += 360
-                                    maxx += 360
-                            minx = min(
-                                i for i in [minx_tmp, minx] if i is not None
-                            )
-                            miny = min(
-                                i for i in [miny_tmp, miny] if i is not None
-                            )
-                            maxx = max(
-                                i for i in [maxx_tmp, maxx] if i is not None
-                            )
-                            maxy = max(
-                                i for i in [maxy_tmp, maxy] if i is not None
-                            )
-
-                    # check if previous element in ordered list overlaps
-                    if (
-                        len(time_intervals) > 0 and (
-                            (
-                                (
-                                    begin_time == end_time or
-                                    time_intervals[-1][0] ==
-                                    time_intervals[-1][1]
-                                ) and (
-                                    time_intervals[-1][0] <= end_time and
-                                    time_intervals[-1][1] >= begin_time
-                                )
-                            ) or (
-                                time_intervals[-1][0] < end_time and
-                                time_intervals[-1][1] > begin_time
-                            )
-                        )
-                    ):
-                        begin_time = min(begin_time, time_intervals[-1][0])
-                        end_time = max(end_time, time_intervals[-1][1])
-                        minx = min(minx, time_intervals[-1][2])
-                        miny = min(miny, time_intervals[-1][3])
-                        maxx = max(maxx, time_intervals[-1][4])
-                        maxy = max(maxy, time_intervals[-1][5])
-                        time_intervals.pop(-1)
-                    time_intervals.append(
-                        (begin_time, end_time, minx, miny, maxx, maxy)
-                    )
-
-                logger.info(
-                    "Number non-overlapping time intervals: %s" %
-                    len(time_intervals)
-                )
+            time_intervals = get_time_intervals(collection, unique_times)
 
             logger.info(
                 "Starting saving time intervals to MapCache SQLite file"
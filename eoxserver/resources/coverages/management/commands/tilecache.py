@@ -0,0 +1,372 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+import json
+import logging
+import time
+from multiprocessing import Pool
+from os import remove
+from os.path import abspath, exists
+
+from django.core.management.base import CommandError, BaseCommand
+from django.contrib.gis.geos import Polygon
+from django.db import connections
+
+from eoxserver.render.map.cache import get_map_cache
+from eoxserver.resources.coverages import models
+from eoxserver.resources.coverages.management.commands import (
+    CommandOutputMixIn, SubParserMixIn
+)
+from eoxserver.resources.coverages.management.commands.mapcache import (
+    get_time_intervals
+)
+from eoxserver.services.ows.wms.parsing import parse_time
+from eoxserver.services.ows.wmts.tilematrixsets import (
+    TILE_MATRIX_SETS, get_tile_matrix_set
+)
+from eoxserver.services.ows.wmts.tiles import (
+    iter_metatile_ranges, seed_tiles
+)
+
+
+logger = logging.getLogger(__name__)
+
+# the maximum latitude covered by the WebMercatorQuad
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+
+def seed_job(job):
+    """ Render and cache a single metatile. Executed in the worker processes.
+        Returns the job, the number of seeded tiles and an error message.
+    """
+    layer_name, style, tile_matrix_set_id, zoom, tile_range, format, \
+        time_ = job
+    try:
+        tiles = seed_tiles(
+            layer_name, style, get_tile_matrix_set(tile_matrix_set_id),
+            zoom, tile_range, format, time_
+        )
+        return job, len(tiles), None
+    except Exception as e:
+        logger.exception("Failed to seed tiles %s of zoom %d" % (
+            tile_range, zoom
+        ))
+        return job, 0, "%s: %s" % (type(e).__name__, e)
+
+
+def get_job_key(job):
+    """ Get the string key of a job to be stored in the state file.
+    """
+    _, _, _, zoom, tile_range, _, time_ = job
+    return "%s %d %s" % (
+        "/".join(t.isoformat() for t in time_) if time_ else "-",
+        zoom, ",".join(str(v) for v in tile_range)
+    )
+
+
+def transform_bbox(bbox, crs):
+    """ Transform the WGS84 bbox to the given CRS of a tile matrix set.
+    """
+    if crs == 'EPSG:4326':
+        return bbox
+
+    minx, miny, maxx, maxy = bbox
+    polygon = Polygon.from_bbox((
+        minx, max(miny, -MAX_MERCATOR_LATITUDE),
+        maxx, min(maxy, MAX_MERCATOR_LATITUDE),
+    ))
+    polygon.srid = 4326
+    return polygon.transform(int(crs.split(':')[1]), clone=True).extent
+
+
+def intersect_bbox(a, b):
+    """ Get the intersection of two bboxes or ``None`` if they do not
+        intersect.
+    """
+    bbox = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return None
+    return bbox
+
+
+class Command(CommandOutputMixIn, SubParserMixIn, BaseCommand):
+    """ Command to pre-render tiles of collections into the map cache. This
+        command uses sub-commands for the specific tasks: seed.
+    """
+    help = ("Pre-renders tiles of collections into the map cache.")
+
+    def add_arguments(self, parser):
+        seed_parser = self.add_subparser(parser, 'seed')
+
+        seed_parser.add_argument(
+            'identifier', nargs=1, help='The collection identifier.'
+        )
+        seed_parser.add_argument(
+            '--tile-matrix-set', '-m', dest='tile_matrix_set',
+            default='WebMercatorQuad', choices=sorted(TILE_MATRIX_SETS),
+            help='Optional. The tile matrix set to seed. Default is '
+                 '"WebMercatorQuad".'
+        )
+        seed_parser.add_argument(
+            '--min-zoom', dest='min_zoom', type=int, default=0,
+            help='Optional. The minimum zoom level to seed. Default is 0.'
+        )
+        seed_parser.add_argument(
+            '--max-zoom', dest='max_zoom', type=int, default=8,
+            help='Optional. The maximum zoom level to seed. Default is 8.'
+        )
+        seed_parser.add_argument(
+            '--bbox', '-b', dest='bbox', type=float, nargs=4, default=None,
+            metavar=('MINLON', 'MINLAT', 'MAXLON', 'MAXLAT'),
+            help='Optional. Restrict the seeding to the WGS84 bbox. By '
+                 'default the extent of the collection is used.'
+        )
+        seed_parser.add_argument(
+            '--time', '-t', dest='times', action='append', default=[],
+            help='Optional. An ISO 8601 time instant or interval '
+                 '("begin/end") to seed. Can be specified multiple times.'
+        )
+        seed_parser.add_argument(
+            '--product-times', '-p', dest='product_times',
+            action='store_true', default=False,
+            help='Optional. Seed each product time interval of the '
+                 'collection within its extent.'
+        )
+        seed_parser.add_argument(
+            '--unique-times', '-u', dest='unique_times',
+            action='store_true', default=False,
+            help='Optional. Merge equal and overlapping product time '
+                 'intervals. Only used with --product-times.'
+        )
+        seed_parser.add_argument(
+            '--suffix', '-s', dest='suffix', default=None,
+            help='Optional. The layer suffix to seed, like "outlines".'
+        )
+        seed_parser.add_argument(
+            '--style', dest='style', default='',
+            help='Optional. The style to seed.'
+        )
+        seed_parser.add_argument(
+            '--format', '-f', dest='format', default='image/png',
+            help='Optional. The tile format. Default is "image/png".'
+        )
+        seed_parser.add_argument(
+            '--processes', '-n', dest='processes', type=int, default=1,
+            help='Optional. The number of rendering processes. Default is 1.'
+        )
+        seed_parser.add_argument(
+            '--state-file', dest='state_file', default=None,
+            help='Optional. The file recording the seeded metatiles to '
+                 'resume an interrupted run. Defaults to '
+                 '"<identifier>.seed" in the current directory.'
+        )
+        seed_parser.add_argument(
+            '--restart', dest='restart', action='store_true', default=False,
+            help='Optional. Discard the state of a previous run.'
+        )
+
+    def handle(self, subcommand, *args, **kwargs):
+        """ Dispatch sub-commands: seed.
+        """
+        if subcommand == "seed":
+            self.handle_seed(*args, **kwargs)
+
+    def handle_seed(self, identifier, tile_matrix_set, min_zoom, max_zoom,
+                    bbox, times, product_times, unique_times, suffix, style,
+                    format, processes, state_file, restart, **kwargs):
+        self.verbosity = int(kwargs.get("verbosity", 1))
+        identifier = identifier[0]
+
+        if get_map_cache() is None:
+            raise CommandError(
+                "No map cache is configured. Set EOXS_MAP_CACHE to seed."
+            )
+
+        try:
+            collection = models.Collection.objects.get(identifier=identifier)
+        except models.Collection.DoesNotExist:
+            raise CommandError("No such collection '%s'." % identifier)
+
+        tile_matrix_set = get_tile_matrix_set(tile_matrix_set)
+        zooms = range(min_zoom, max_zoom + 1)
+        if not zooms or any(
+            zoom not in tile_matrix_set.zoom_levels for zoom in zooms
+        ):
+            raise CommandError("Invalid zoom range %d-%d." % (
+                min_zoom, max_zoom
+            ))
+
+        if bbox is None:
+            if collection.footprint:
+                bbox = collection.footprint.extent
+            else:
+                bbox = (-180, -90, 180, 90)
+
+        # the time slices to seed along with their WGS84 extents
+        slices = []
+        try:
+            for time_ in times:
+                slices.append((parse_time(time_), bbox))
+        except Exception as e:
+            raise CommandError("Invalid time: %s" % e)
+
+        if product_times:
+            for interval in get_time_intervals(collection, unique_times):
+                extent = intersect_bbox(interval[2:], bbox)
+                if extent:
+                    slices.append((list(interval[:2]), extent))
+
+        if not slices:
+            slices.append((None, bbox))
+
+        layer_name = identifier
+        if suffix:
+            layer_name = "%s__%s" % (identifier, suffix)
+
+        jobs = [
+            (
+                layer_name, style, tile_matrix_set.identifier, zoom,
+                metatile_range, format, time_
+            )
+            for time_, extent in slices
+            for zoom in zooms
+            for metatile_range in iter_metatile_ranges(
+                tile_matrix_set, zoom, tile_matrix_set.get_tile_range(
+                    zoom, transform_bbox(extent, tile_matrix_set.crs)
+                ), format
+            )
+        ]
+
+        state_file = abspath(state_file or "%s.seed" % identifier)
+        header = json.dumps({
+            'layer': layer_name,
+            'style': style,
+            'tile_matrix_set': tile_matrix_set.identifier,
+            'format': format,
+        }, sort_keys=True)
+
+        done = self.read_state(state_file, header, restart)
+        pending = [job for job in jobs if get_job_key(job) not in done]
+
+        self.print_msg(
+            "Seeding %d metatiles of layer '%s' in %d time slice(s) and "
+            "zoom levels %d-%d (%d already seeded)." % (
+                len(jobs), layer_name, len(slices), min_zoom, max_zoom,
+                len(jobs) - len(pending)
+            )
+        )
+
+        failed = self.seed(pending, state_file, header, processes)
+
+        if failed:
+            raise CommandError(
+                "Failed to seed %d metatiles. Re-run the command to retry "
+                "them." % failed
+            )
+
+        remove(state_file)
+        self.print_msg("Finished seeding of layer '%s'." % layer_name)
+
+    def read_state(self, state_file, header, restart):
+        """ Read the keys of the already seeded jobs from the state file.
+        """
+        if not exists(state_file):
+            return set()
+
+        if restart:
+            remove(state_file)
+            return set()
+
+        with open(state_file) as f:
+            if f.readline().strip() != header:
+                raise CommandError(
+                    "The state file '%s' belongs to a run with different "
+                    "parameters. Use --restart to discard it." % state_file
+                )
+            return set(line.strip() for line in f)
+
+    def seed(self, jobs, state_file, header, processes):
+        """ Seed the jobs, either in process or with a pool of processes.
+            Completed jobs are appended to the state file. Returns the
+            number of failed jobs.
+        """
+        new_file = not exists(state_file)
+        num_tiles = 0
+        failed = 0
+        start = last_report = time.time()
+
+        pool = None
+        if processes > 1:
+            # the database connections must not be shared with the forked
+            # worker processes
+            connections.close_all()
+            pool = Pool(processes)
+            results = pool.imap_unordered(seed_job, jobs)
+        else:
+            results = (seed_job(job) for job in jobs)
+
+        try:
+            with open(state_file, 'a') as f:
+                if new_file:
+                    f.write(header + "\n")
+
+                for i, (job, count, error) in enumerate(results, 1):
+                    if error:
+                        failed += 1
+                        self.print_wrn("Failed to seed %s: %s" % (
+                            get_job_key(job), error
+                        ))
+                    else:
+                        num_tiles += count
+                        f.write(get_job_key(job) + "\n")
+                        f.flush()
+
+                    now = time.time()
+                    if now - last_report >= 10 or i == len(jobs):
+                        last_report = now
+                        elapsed = now - start
+                        rate = num_tiles / elapsed if elapsed else 0.0
+                        self.print_msg(
+                            "%d/%d metatiles, %d tiles seeded (%.1f "
+                            "tiles/s, %.0fs elapsed)." % (
+                                i, len(jobs), num_tiles, rate, elapsed
+                            )
+                        )
+
+        except KeyboardInterrupt:
+            if pool:
+                pool.terminate()
+            raise CommandError(
+                "Seeding interrupted. Re-run the command to resume."
+            )
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        return failed
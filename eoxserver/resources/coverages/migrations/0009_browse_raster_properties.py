@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coverages', '0008_incidence_angle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='browse',
+            name='band_count',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='browse',
+            name='data_type',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='browse',
+            name='mode',
+            field=models.CharField(blank=True, choices=[('grayscale', 'Grayscale'), ('rgb', 'RGB'), ('rgba', 'RGBA')], max_length=16, null=True),
+        ),
+    ]
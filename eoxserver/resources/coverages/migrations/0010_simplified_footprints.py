@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+TOLERANCES = (0.001, 0.01, 0.1)
+
+
+def simplify_footprints(apps, schema_editor):
+    EOObject = apps.get_model('coverages', 'EOObject')
+    qs = EOObject.objects.filter(
+        footprint__isnull=False
+    ).only('pk', 'footprint')
+
+    for eo_object in qs.iterator():
+        footprint = eo_object.footprint
+        values = {}
+        for i, tolerance in enumerate(TOLERANCES, 1):
+            simplified = footprint.simplify(tolerance, preserve_topology=True)
+            if simplified.empty or \
+                    simplified.num_points >= footprint.num_points:
+                simplified = None
+            values['footprint_simplified_%d' % i] = simplified
+
+        EOObject.objects.filter(pk=eo_object.pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coverages', '0009_browse_raster_properties'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eoobject',
+            name='footprint_simplified_1',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='eoobject',
+            name='footprint_simplified_2',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='eoobject',
+            name='footprint_simplified_3',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, null=True, srid=4326),
+        ),
+        migrations.RunPython(
+            simplify_footprints, migrations.RunPython.noop
+        ),
+    ]
@@ -308,6 +308,45 @@ class GridFixture(models.Model):
 # Actual item models: Collection, Product and Coverage
 # ==============================================================================
 
+# the tolerances (in degrees) of the simplified footprint levels, from the
+# finest to the coarsest
+FOOTPRINT_SIMPLIFICATION_TOLERANCES = (0.001, 0.01, 0.1)
+
+SIMPLIFIED_FOOTPRINT_FIELDS = tuple(
+    'footprint_simplified_%d' % (i + 1)
+    for i in range(len(FOOTPRINT_SIMPLIFICATION_TOLERANCES))
+)
+
+
+def simplify_footprint(footprint, tolerance):
+    """ Simplify the footprint with the given tolerance. Returns ``None`` when
+        the simplification does not reduce the number of vertices.
+    """
+    if footprint is None:
+        return None
+    simplified = footprint.simplify(tolerance, preserve_topology=True)
+    if simplified.empty or simplified.num_points >= footprint.num_points:
+        return None
+    return simplified
+
+
+def get_simplified_footprint_field(resolution):
+    """ Get the name of the coarsest simplified footprint field whose
+        tolerance does not exceed the given resolution (in degrees per pixel).
+        Falls back to the full resolution ``footprint``.
+    """
+    field = 'footprint'
+    if resolution is None:
+        return field
+
+    for tolerance, name in zip(
+            FOOTPRINT_SIMPLIFICATION_TOLERANCES, SIMPLIFIED_FOOTPRINT_FIELDS):
+        if tolerance > resolution:
+            break
+        field = name
+    return field
+
+
 def eo_object_identifier_validator(value):
     if getattr(settings, 'EOXS_VALIDATE_IDS_NCNAME', True):
         identifier_validators[0](value)
@@ -323,6 +362,13 @@ class EOObject(models.Model):
     end_time = models.DateTimeField(**optional)
     footprint = models.GeometryField(**optional)
 
+    # simplified variants of the footprint for rendering at coarse
+    # resolutions, see FOOTPRINT_SIMPLIFICATION_TOLERANCES. ``None`` when the
+    # simplification does not reduce the footprint.
+    footprint_simplified_1 = models.GeometryField(**optional)
+    footprint_simplified_2 = models.GeometryField(**optional)
+    footprint_simplified_3 = models.GeometryField(**optional)
+
     inserted = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -331,6 +377,32 @@ class EOObject(models.Model):
     def __str__(self):
         return self.identifier
 
+    def save(self, *args, **kwargs):
+        # keep the simplified footprints in sync with the footprint
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'footprint' in update_fields:
+            self.update_simplified_footprints()
+            if update_fields is not None:
+                kwargs['update_fields'] = (
+                    set(update_fields) | set(SIMPLIFIED_FOOTPRINT_FIELDS)
+                )
+        super(EOObject, self).save(*args, **kwargs)
+
+    def update_simplified_footprints(self):
+        """ Recompute the simplified footprints from the footprint.
+        """
+        for tolerance, name in zip(
+                FOOTPRINT_SIMPLIFICATION_TOLERANCES,
+                SIMPLIFIED_FOOTPRINT_FIELDS):
+            setattr(self, name, simplify_footprint(self.footprint, tolerance))
+
+    def get_simplified_footprint(self, resolution):
+        """ Get the footprint simplified for the given resolution (in degrees
+            per pixel).
+        """
+        field = get_simplified_footprint_field(resolution)
+        return getattr(self, field) or self.footprint
+
 
 class Collection(EOObject):
     collection_type = models.ForeignKey(CollectionType, related_name='collections', **optional_protected)
@@ -434,6 +506,12 @@ class MetaDataItem(backends.DataItem):
 
 
 class Browse(backends.DataItem):
+    MODE_CHOICES = [
+        ('grayscale', 'Grayscale'),
+        ('rgb', 'RGB'),
+        ('rgba', 'RGBA'),
+    ]
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='browses', **mandatory)
     browse_type = models.ForeignKey(BrowseType, on_delete=models.CASCADE, **optional)
     style = models.CharField(max_length=256, **optional)
@@ -446,6 +524,12 @@ class Browse(backends.DataItem):
     width = models.PositiveIntegerField(**mandatory)
     height = models.PositiveIntegerField(**mandatory)
 
+    # raster properties stored upon registration, so that the file does not
+    # need to be opened when rendering
+    band_count = models.PositiveSmallIntegerField(**optional)
+    data_type = models.CharField(max_length=16, **optional)
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES, **optional)
+
     class Meta:
         unique_together = [('product', 'browse_type', 'style')]
 
@@ -1211,3 +1295,8 @@ def product_get_metadata(product):
         if field.name not in ('id', 'product') and
         getattr(product_metadata, field.name, None) is not None
     ]
+
+
+# connect the invalidation of cached maps to the signals of the models above,
+# regardless of which process changes them
+from eoxserver.render.map import cache  # noqa: E402,F401
@@ -28,6 +28,7 @@
 from eoxserver.contrib import gdal
 from eoxserver.backends.access import get_vsi_path, gdal_open
 from eoxserver.backends.util import resolve_storage
+from eoxserver.render.browse.objects import get_ds_mode
 from eoxserver.resources.coverages import models
 from eoxserver.resources.coverages.registration import base
 from eoxserver.resources.coverages.registration.exceptions import (
@@ -56,15 +57,34 @@ class BrowseRegistrator(base.BaseRegistrator):
             browse_type=browse_type
         )
 
-        # Get a VSI handle for the browse to get the size, extent and CRS
-        # via GDAL
+        # Get a VSI handle for the browse to get the size, extent, CRS and
+        # raster properties via GDAL
         ds = gdal_open(browse)
-        browse.width = ds.RasterXSize
-        browse.height = ds.RasterYSize
-        browse.coordinate_reference_system = ds.GetProjection()
-        extent = gdal.get_extent(ds)
-        browse.min_x, browse.min_y, browse.max_x, browse.max_y = extent
+        read_browse_properties(browse, ds)
 
         browse.full_clean()
         browse.save()
         return browse
+
+
+def read_browse_properties(browse, ds):
+    """ Set the size, extent and CRS of the browse model from the given GDAL
+        dataset.
+    """
+    browse.width = ds.RasterXSize
+    browse.height = ds.RasterYSize
+    browse.coordinate_reference_system = ds.GetProjection()
+    extent = gdal.get_extent(ds)
+    browse.min_x, browse.min_y, browse.max_x, browse.max_y = extent
+    read_browse_raster_properties(browse, ds)
+
+
+def read_browse_raster_properties(browse, ds):
+    """ Set the band count, data type and mode of the browse model from the
+        given GDAL dataset.
+    """
+    browse.band_count = ds.RasterCount
+    browse.data_type = gdal.GetDataTypeName(
+        ds.GetRasterBand(1).DataType
+    )
+    browse.mode = get_ds_mode(ds)
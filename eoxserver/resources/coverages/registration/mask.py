@@ -25,15 +25,21 @@
 # THE SOFTWARE.
 # ------------------------------------------------------------------------------
 
+from django.contrib.gis.gdal import GDALException
+
 from eoxserver.contrib import gdal
 from eoxserver.backends.access import get_vsi_path
 from eoxserver.backends.util import resolve_storage
+from eoxserver.render.browse.objects import load_mask_geometry
 from eoxserver.resources.coverages import models
 from eoxserver.resources.coverages.registration import base
 from eoxserver.resources.coverages.registration.exceptions import (
     RegistrationError
 )
 
+import logging
+logger = logging.getLogger(__name__)
+
 
 class MaskRegistrator(base.BaseRegistrator):
     def register(self, product_identifier, location, type_name, geometry=None):
@@ -54,7 +60,25 @@ class MaskRegistrator(base.BaseRegistrator):
             mask_type=mask_type,
             geometry=geometry,
         )
+        vectorize_mask(mask)
 
         mask.full_clean()
         mask.save()
         return mask
+
+
+def vectorize_mask(mask):
+    """ Store the geometry of the mask file in the ``geometry`` of the mask,
+        so that the file does not have to be read when rendering. Masks that
+        already have a geometry or whose file cannot be read as a vector file
+        are left unchanged.
+    """
+    if mask.geometry is not None or not mask.location:
+        return
+
+    try:
+        mask.geometry = load_mask_geometry(get_vsi_path(mask))
+    except (GDALException, IndexError) as e:
+        logger.warning(
+            'Failed to read the geometry of mask %r: %s' % (mask.location, e)
+        )
@@ -37,6 +37,10 @@ from eoxserver.backends.access import get_vsi_path, get_vsi_env
 from eoxserver.backends.util import resolve_storage
 from eoxserver.resources.coverages import models
 from eoxserver.resources.coverages.registration import base
+from eoxserver.resources.coverages.registration.browse import (
+    read_browse_properties
+)
+from eoxserver.resources.coverages.registration.mask import vectorize_mask
 from eoxserver.resources.coverages.metadata.component import (
     ProductMetadataComponent
 )
@@ -174,13 +178,15 @@ class ProductRegistrator(base.BaseRegistrator):
             except models.MaskType.DoesNotExist:
                 raise
 
-            models.Mask.objects.create(
+            mask = models.Mask(
                 product=product,
                 mask_type=mask_type,
                 storage=storage,
                 location=location,
                 geometry=geometry
             )
+            vectorize_mask(mask)
+            mask.save()
 
         # register all browses
         for browse_handle in browse_handles:
@@ -197,15 +203,11 @@ class ProductRegistrator(base.BaseRegistrator):
                 storage=resolve_storage(browse_handle[1:-1])
             )
 
-            # Get a VSI handle for the browse to get the size, extent and CRS
-            # via GDAL
+            # Get a VSI handle for the browse to get the size, extent, CRS and
+            # raster properties via GDAL
             vsi_path = get_vsi_path(browse)
             ds = gdal.Open(vsi_path)
-            browse.width = ds.RasterXSize
-            browse.height = ds.RasterYSize
-            browse.coordinate_reference_system = ds.GetProjection()
-            extent = gdal.get_extent(ds)
-            browse.min_x, browse.min_y, browse.max_x, browse.max_y = extent
+            read_browse_properties(browse, ds)
 
             browse.full_clean()
             browse.save()
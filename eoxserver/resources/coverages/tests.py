@@ -27,7 +27,10 @@
 # THE SOFTWARE.
 #-------------------------------------------------------------------------------
 
+import os
+import shutil
 import sys
+import tempfile
 from datetime import datetime
 try:
     from StringIO import StringIO
@@ -38,16 +41,22 @@ from unittest import skipIf
 
 from django.test import TestCase
 from django.core.exceptions import ValidationError
+from django.core.management import call_command, CommandError
 from django.contrib.gis.geos import GEOSGeometry, Polygon, MultiPolygon
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import utc
 
 from eoxserver.core import env
+from eoxserver.contrib import gdal, osr
+from eoxserver.render.browse.objects import get_ds_mode
 from eoxserver.resources.coverages.models import *
 from eoxserver.resources.coverages.util import collect_eo_metadata
 from eoxserver.resources.coverages.metadata.coverage_formats import (
     native, eoom, dimap_general
 )
+from eoxserver.resources.coverages.registration.browse import (
+    BrowseRegistrator
+)
 
 
 def create(Class, **kwargs):
@@ -328,6 +337,34 @@ class ModelTests(GeometryMixIn, TestCase):
         self.assertEqual(series_1.begin_time, new_begin_time)
         self.assertEqual(series_1.end_time, new_end_time)
 
+    def test_simplified_footprints(self):
+        footprint = Polygon.from_bbox((0, 0, 10, 10)).buffer(2, 64)
+        product = create(Product, identifier="simplified", footprint=footprint)
+        product = refresh(product)
+
+        simplified = product.footprint_simplified_3
+        self.assertIsNotNone(simplified)
+        self.assertLess(simplified.num_points, footprint.num_points)
+        self.assertGeometryEqual(simplified, footprint, max_area=1)
+
+        self.assertEqual(
+            get_simplified_footprint_field(None), 'footprint'
+        )
+        self.assertEqual(
+            get_simplified_footprint_field(0.0001), 'footprint'
+        )
+        self.assertEqual(
+            get_simplified_footprint_field(0.05), 'footprint_simplified_2'
+        )
+        self.assertEqual(
+            product.get_simplified_footprint(0.0001), product.footprint
+        )
+
+        product.footprint = None
+        product.save(update_fields=['footprint'])
+        product = refresh(product)
+        self.assertIsNone(product.footprint_simplified_3)
+
 
 
 class MetadataFormatTests(GeometryMixIn, TestCase):
@@ -530,6 +567,65 @@ class MetadataFormatTests(GeometryMixIn, TestCase):
         # TODO: find example DIMAP
 
 
+class BrowseRasterPropertiesTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.product = create(Product, identifier="product")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def create_browse_file(self, band_count):
+        filename = os.path.join(self.tmp_dir, 'browse%d.tif' % band_count)
+        ds = gdal.GetDriverByName('GTiff').Create(
+            filename, 10, 10, band_count, gdal.GDT_Byte
+        )
+        ds.SetGeoTransform([0, 1, 0, 10, 0, -1])
+        ds.SetProjection(osr.SpatialReference(4326).wkt)
+        ds = None
+        return filename
+
+    def test_get_ds_mode(self):
+        driver = gdal.GetDriverByName('MEM')
+        for band_count, mode in [(1, 'grayscale'), (2, 'grayscale'),
+                                 (3, 'rgb'), (4, 'rgba'), (5, 'grayscale')]:
+            ds = driver.Create('', 1, 1, band_count, gdal.GDT_Byte)
+            self.assertEqual(get_ds_mode(ds), mode)
+
+        # three bands without the red color interpretation are still RGB
+        ds = driver.Create('', 1, 1, 3, gdal.GDT_Byte)
+        ds.GetRasterBand(1).SetColorInterpretation(gdal.GCI_GrayIndex)
+        self.assertEqual(get_ds_mode(ds), 'rgb')
+
+    def test_register(self):
+        browse = BrowseRegistrator().register(
+            self.product.identifier, [self.create_browse_file(2)]
+        )
+        self.assertEqual(browse.mode, 'grayscale')
+        self.assertEqual(browse.band_count, 2)
+        self.assertEqual(browse.data_type, 'Byte')
+        self.assertEqual((browse.width, browse.height), (10, 10))
+
+    def test_update(self):
+        filename = self.create_browse_file(3)
+        browse = create(Browse,
+            product=self.product, location=filename,
+            width=10, height=10,
+            coordinate_reference_system=osr.SpatialReference(4326).wkt,
+            min_x=0, min_y=0, max_x=10, max_y=10
+        )
+        self.assertIsNone(browse.mode)
+
+        with self.assertRaises(CommandError):
+            call_command('browse', 'update')
+
+        call_command('browse', 'update', self.product.identifier)
+        browse = Browse.objects.get(pk=browse.pk)
+        self.assertEqual(browse.mode, 'rgb')
+        self.assertEqual(browse.band_count, 3)
+        self.assertEqual(browse.data_type, 'Byte')
+
+
 class CastingTest(TestCase):
     def test_cast(self):
         coverage_type = create(CoverageType,
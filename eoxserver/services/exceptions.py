@@ -227,6 +227,14 @@ class RenderException(Exception):
         )
 
 
+class ServiceUnavailableException(Exception):
+    """ Exception to be thrown when a request cannot be processed at the
+        moment, e.g: because too many heavy requests are already processed.
+    """
+    code = "NoApplicableCode"
+    locator = None
+
+
 class NoSuchFieldException(Exception):
     """ Error in RangeSubsetting when band does not exist.
     """
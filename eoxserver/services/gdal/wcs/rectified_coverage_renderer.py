@@ -0,0 +1,374 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+from datetime import datetime
+from uuid import uuid4
+import tempfile
+import logging
+import os
+
+from django.utils.six import binary_type
+
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.decoders import config, typelist
+from eoxserver.core.util.rect import Rect
+from eoxserver.contrib import gdal, vsi, vrt
+from eoxserver.render.coverage import objects
+from eoxserver.resources.coverages import crss
+from eoxserver.resources.coverages.formats import getFormatRegistry
+from eoxserver.services.ows.version import Version
+from eoxserver.services.ows.wcs.v20.util import get_scaled_size
+from eoxserver.services.ows.wcs.v20.encoders import WCS20EOXMLEncoder
+from eoxserver.services.gdal.wcs.referenceable_dataset_renderer import (
+    _get_encoding_options, get_driver
+)
+from eoxserver.services.result import ResultFile, ResultBuffer
+from eoxserver.services.exceptions import (
+    RenderException, InterpolationMethodNotSupportedException,
+    InvalidOutputCrsException
+)
+
+
+logger = logging.getLogger(__name__)
+
+INTERPOLATION_TRANS = {
+    "nearest-neighbour": "near",
+    "linear": "bilinear",
+    "bilinear": "bilinear",
+    "cubic": "cubic",
+    "cubic-spline": "cubicspline",
+    "lanczos": "lanczos",
+    "average": "average",
+    "mode": "mode",
+}
+
+
+class GDALRectifiedCoverageRenderer(object):
+    """ A coverage renderer for rectified coverages and mosaics that uses GDAL
+        directly instead of going through MapServer. The requested bands and
+        the subset window are selected with a VRT, reprojection and scaling
+        are done with ``gdal.Warp`` and ``gdal.Translate``.
+
+        To use it, list it before the MapServer renderer in the
+        ``EOXS_COVERAGE_RENDERERS`` setting.
+    """
+
+    versions = (Version(2, 0),)
+
+    def supports(self, params):
+        return (
+            params.version in self.versions and
+            not params.coverage.grid.is_referenceable
+        )
+
+    def render(self, params):
+        coverage = params.coverage
+        range_type = coverage.range_type
+        subsets = params.subsets
+        reader = WCSConfigReader(get_eoxserver_config())
+
+        # list of the requested band indices. defaults to all bands
+        if params.rangesubset:
+            band_indices = params.rangesubset.get_band_indices(range_type, 1)
+        else:
+            band_indices = list(range(1, len(range_type) + 1))
+
+        reg_format = self.get_format(coverage, params.format, reader)
+        driver_name = reg_format.driver.split("/", 1)[-1]
+
+        resample_alg = None
+        if params.interpolation:
+            resample_alg = INTERPOLATION_TRANS.get(params.interpolation)
+            if not resample_alg:
+                raise InterpolationMethodNotSupportedException(
+                    "Interpolation method '%s' is not supported."
+                    % params.interpolation
+                )
+
+        dst_srs = None
+        if params.outputcrs is not None:
+            srid = crss.parseEPSGCode(params.outputcrs,
+                (crss.fromURL, crss.fromURN, crss.fromShortCode)
+            )
+            if srid is None:
+                raise InvalidOutputCrsException(
+                    "Failed to extract an EPSG code from the OutputCRS URI "
+                    "'%s'." % params.outputcrs
+                )
+            dst_srs = "EPSG:%d" % srid
+
+        time_stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        filename = "%s_%s%s" % (
+            coverage.identifier, time_stamp, reg_format.defaultExt
+        )
+
+        temp_filenames = []
+        fd, out_path = tempfile.mkstemp(
+            prefix='eoxs_spool_', suffix=reg_format.defaultExt
+        )
+        os.close(fd)
+
+        try:
+            src_ds, band_list, env = self.get_source_dataset(
+                coverage, band_indices, temp_filenames
+            )
+
+            with gdal.config_env(env):
+                # cut out the requested window and select the bands
+                src_rect = self.get_source_rect(src_ds, coverage, subsets)
+                subset_filename = temp_vsimem_filename()
+                temp_filenames.append(subset_filename)
+                ds = gdal.Translate(
+                    subset_filename, src_ds, format="VRT",
+                    srcWin=list(src_rect), bandList=band_list
+                )
+
+                if dst_srs:
+                    warped_filename = temp_vsimem_filename()
+                    temp_filenames.append(warped_filename)
+                    ds = gdal.Warp(
+                        warped_filename, ds, format="VRT", dstSRS=dst_srs,
+                        resampleAlg=resample_alg or "near"
+                    )
+
+                size_x, size_y = get_scaled_size(
+                    ds.RasterXSize, ds.RasterYSize,
+                    params.scalefactor, params.scales
+                )
+
+                maxsize = reader.maxsize
+                if maxsize is not None:
+                    if maxsize < size_x or maxsize < size_y:
+                        raise RenderException(
+                            "Requested image size %dpx x %dpx exceeds the "
+                            "allowed limit maxsize=%dpx." % (
+                                size_x, size_y, maxsize
+                            ), "size"
+                        )
+
+                creation_options = []
+                if reg_format.mimeType == "image/tiff":
+                    driver_name, creation_options = _get_encoding_options(
+                        getattr(params, "encoding_params", {})
+                    )
+                get_driver(driver_name)
+
+                out_ds = gdal.Translate(
+                    out_path, ds, format=driver_name,
+                    width=size_x, height=size_y,
+                    resampleAlg=resample_alg,
+                    creationOptions=creation_options
+                )
+                ds = None
+
+            result_set = [
+                ResultFile(
+                    out_path, reg_format.mimeType, filename,
+                    "coverage/%s" % filename
+                )
+            ]
+
+            mediatype = getattr(params, "mediatype", None)
+            if mediatype in ("multipart/mixed", "multipart/related"):
+                result_set.insert(0, self.encode_description(
+                    params, out_ds, filename, reg_format.mimeType
+                ))
+            out_ds = None
+
+        except:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            raise
+
+        finally:
+            for temp_filename in temp_filenames:
+                try:
+                    vsi.remove(temp_filename)
+                except Exception:
+                    pass
+
+        return result_set
+
+    def get_format(self, coverage, frmt, reader):
+        """ Get the registered output format for the requested mime type,
+            defaulting to the native format of the coverage or GeoTIFF.
+        """
+        registry = getFormatRegistry()
+        if not frmt:
+            native_format = getattr(coverage, "native_format", None)
+            reg_format = (
+                registry.getFormatByMIME(native_format)
+                if native_format else None
+            )
+            if not reg_format or not self._is_writeable(reg_format, reader):
+                reg_format = registry.getFormatByMIME("image/tiff")
+        else:
+            mime_type = frmt.split(";")[0].strip()
+            reg_format = registry.getFormatByMIME(mime_type)
+            if not reg_format:
+                wcs10_frmts = registry.getFormatsByWCS10Name(mime_type)
+                if wcs10_frmts:
+                    reg_format = wcs10_frmts[0]
+
+        if not reg_format or not self._is_writeable(reg_format, reader):
+            raise RenderException(
+                "Unsupported output format '%s'." % frmt, "format"
+            )
+        return reg_format
+
+    def _is_writeable(self, reg_format, reader):
+        return (
+            reg_format.driver.startswith("GDAL/") and
+            reg_format.mimeType in reader.supported_formats
+        )
+
+    def get_source_dataset(self, coverage, band_indices, temp_filenames):
+        """ Returns the source dataset, the list of band indices to select from
+            it and the GDAL configuration environment to open it with. Mosaics
+            and coverages stored in multiple files are combined into a VRT.
+        """
+        if isinstance(coverage, objects.Mosaic):
+            env = {}
+            for mosaic_coverage in coverage.coverages:
+                env.update(mosaic_coverage.arraydata_locations[0].env)
+
+            try:
+                nodata = " ".join(
+                    str(field.nil_values[0][0])
+                    for field in coverage.range_type
+                )
+            except IndexError:
+                nodata = None
+
+            filename = temp_vsimem_filename()
+            temp_filenames.append(filename)
+            ds, _ = vrt.build_mosaic([
+                mosaic_coverage.arraydata_locations[0].path
+                for mosaic_coverage in coverage.coverages
+            ], env, filename, nodata)
+            return ds, band_indices, env
+
+        locations = sorted(
+            coverage.arraydata_locations,
+            key=lambda location: location.start_field
+        )
+        env = {}
+        for location in locations:
+            env.update(location.env)
+
+        if len(locations) == 1:
+            ds = gdal.open_with_env(locations[0].path, env)
+            band_list = [
+                locations[0].field_index_to_band_index(index - 1) + 1
+                for index in band_indices
+            ]
+            return ds, band_list, env
+
+        # stack the bands of all files. As the locations are sorted by their
+        # first field, the band indices of the stacked VRT equal the field
+        # indices
+        filename = temp_vsimem_filename()
+        temp_filenames.append(filename)
+        ds = vrt.stack_bands(
+            [location.path for location in locations], env, filename
+        )
+        return ds, band_indices, env
+
+    def get_source_rect(self, ds, coverage, subsets):
+        """ Returns the pixel window of the dataset selected by the X and Y
+            subsets, clipped to the dataset.
+        """
+        image_rect = Rect(0, 0, ds.RasterXSize, ds.RasterYSize)
+
+        if not subsets or not (subsets.has_x or subsets.has_y):
+            return image_rect
+
+        subset_rect = subsets.pixel_rect(
+            image_rect.size, ds.GetGeoTransform(),
+            coverage.grid.spatial_reference.srid
+        )
+
+        # check whether or not the subsets intersect with the image
+        if not image_rect.intersects(subset_rect):
+            raise RenderException("Subset outside coverage extent.", "subset")
+
+        return image_rect & subset_rect
+
+    def encode_description(self, params, ds, filename, mime_type):
+        """ Encode the coverage description of the output dataset for
+            multipart responses.
+        """
+        coverage = params.coverage
+        subsets = params.subsets
+
+        grid = objects.Grid.from_gdal_dataset(ds)
+
+        # get the output CRS definition
+        crs = params.outputcrs or (subsets.crs if subsets else None)
+        if not crs or crs == 'imageCRS':
+            crs = coverage.grid.coordinate_reference_system
+        grid._coordinate_reference_system = crs
+
+        range_type = coverage.range_type
+        if params.rangesubset:
+            range_type = range_type.subset(params.rangesubset)
+
+        coverage._grid = grid
+        coverage._origin = objects.Origin.from_gdal_dataset(ds)
+        coverage._size = [ds.RasterXSize, ds.RasterYSize]
+        coverage._range_type = range_type
+
+        if isinstance(filename, binary_type):
+            filename = filename.decode()
+        reference = 'cid:coverage/%s' % filename
+
+        encoder = WCS20EOXMLEncoder()
+        if not isinstance(coverage, objects.Mosaic):
+            tree = encoder.encode_rectified_dataset(
+                coverage, getattr(params, "http_request", None), reference,
+                mime_type, subsets.bounding_polygon(coverage)
+                if subsets else None
+            )
+        else:
+            tree = encoder.encode_rectified_stitched_mosaic(
+                coverage, getattr(params, "http_request", None), reference,
+                mime_type, subsets.bounding_polygon(coverage)
+                if subsets else None
+            )
+
+        return ResultBuffer(encoder.serialize(tree), encoder.content_type)
+
+
+def temp_vsimem_filename():
+    return "/vsimem/%s.vrt" % uuid4().hex
+
+
+class WCSConfigReader(config.Reader):
+    section = "services.ows.wcs"
+    supported_formats = config.Option(type=typelist(str, ","), default=())
+    maxsize = config.Option(type=int, default=None)
@@ -114,8 +114,8 @@ class GDALReferenceableDatasetRenderer(object):
         )
 
         driver_metadata = out_driver.GetMetadata_Dict()
-        mime_type = driver_metadata.get("DMD_MIMETYPE")
-        extension = driver_metadata.get("DMD_EXTENSION")
+        mime_type = driver_metadata.get("DMD_MIMETYPE") or "image/tiff"
+        extension = driver_metadata.get("DMD_EXTENSION") or "tif"
 
         time_stamp = datetime.now().strftime("%Y%m%d%H%M%S")
         filename_base = "%s_%s" % (coverage.identifier, time_stamp)
@@ -246,16 +246,12 @@ class GDALReferenceableDatasetRenderer(object):
         return vrt.dataset
 
     def encode(self, dataset, frmt, encoding_params):
-        options = ()
-        if frmt == "image/tiff":
-            options = _get_gtiff_options(**encoding_params)
-
-        args = [
-            ("%s=%s" % key, value) for key, value in options
-        ]
+        driver_name, args = "GTiff", []
+        if frmt.split(";")[0].strip() == "image/tiff":
+            driver_name, args = _get_encoding_options(encoding_params)
 
         path = "/tmp/%s" % uuid4().hex
-        out_driver = gdal.GetDriverByName("GTiff")
+        out_driver = get_driver(driver_name)
         return out_driver.CreateCopy(path, dataset, True, args), out_driver
 
 
@@ -301,6 +297,61 @@ def _get_gtiff_options(compression=None, jpeg_quality=None,
             yield ("BLOCKYSIZE", str(tileheight))
 
 
+def _get_cog_options(compression=None, jpeg_quality=None, predictor=None,
+                     overview_resampling=None, blocksize=None, **kwargs):
+
+    logger.info("Applying Cloud Optimized GeoTIFF parameters.")
+
+    if compression:
+        yield ("COMPRESS", compression.upper())
+
+    if jpeg_quality is not None:
+        yield ("QUALITY", str(jpeg_quality))
+
+    if predictor:
+        yield ("PREDICTOR", {
+            "NONE": "NO",
+            "HORIZONTAL": "STANDARD",
+            "FLOATINGPOINT": "FLOATING_POINT",
+        }[predictor.upper()])
+
+    if overview_resampling:
+        yield ("OVERVIEW_RESAMPLING", overview_resampling.upper())
+
+    if blocksize is not None:
+        yield ("BLOCKSIZE", str(blocksize))
+
+
+def _get_encoding_options(encoding_params):
+    """ Returns the name of the GDAL driver and its creation options for the
+        given GeoTIFF encoding parameters. Cloud Optimized GeoTIFFs are written
+        with the COG driver, all others with the GTiff driver.
+    """
+    encoding_params = dict(encoding_params)
+    cog = encoding_params.pop("cog", False)
+    if cog:
+        options = _get_cog_options(**encoding_params)
+    else:
+        encoding_params.pop("overview_resampling", None)
+        encoding_params.pop("blocksize", None)
+        options = _get_gtiff_options(**encoding_params)
+
+    return "COG" if cog else "GTiff", ["%s=%s" % item for item in options]
+
+
+def get_driver(driver_name):
+    """ Returns the GDAL driver, raising a :class:`RenderException` if it is
+        not available.
+    """
+    driver = gdal.GetDriverByName(driver_name)
+    if driver is None:
+        message = "The GDAL driver '%s' is not available." % driver_name
+        if driver_name == "COG":
+            message += " Cloud Optimized GeoTIFFs require GDAL 3.1 or later."
+        raise RenderException(message, "format")
+    return driver
+
+
 class WCSConfigReader(config.Reader):
     section = "services.ows.wcs"
     maxsize = config.Option(type=int, default=None)
@@ -33,7 +33,7 @@ from django.utils.six import binary_type, b
 from lxml import etree
 
 from eoxserver.contrib import mapserver as ms
-from eoxserver.contrib import gdal, vsi
+from eoxserver.contrib import gdal
 from eoxserver.render.coverage import objects
 from eoxserver.resources.coverages import models, crss
 from eoxserver.resources.coverages.formats import getFormatRegistry
@@ -46,7 +46,9 @@ from eoxserver.services.mapserver.wcs.base_renderer import (
     BaseRenderer, is_format_supported
 )
 from eoxserver.services.ows.version import Version
-from eoxserver.services.result import result_set_from_raw_data, ResultBuffer
+from eoxserver.services.result import (
+    spooled_result_set_from_raw_data, delete_result_set, ResultBuffer
+)
 from eoxserver.services.exceptions import (
     RenderException, OperationNotSupportedException,
     InterpolationMethodNotSupportedException, InvalidOutputCrsException
@@ -122,7 +124,6 @@ class RectifiedCoverageMapServerRenderer(BaseRenderer):
         env = {}
         for data_location in data_locations:
             env.update(data_location.env)
-        gdal.set_env(env, False)
 
         # configure outputformat
         native_format = self.get_native_format(coverage, data_locations)
@@ -158,26 +159,31 @@ class RectifiedCoverageMapServerRenderer(BaseRenderer):
                 "Could not find applicable layer connector.", "coverage"
             )
 
-        try:
-            connector.connect(coverage, data_locations, layer, {})
-            # create request object and dispatch it against the map
-            request = ms.create_request(
-                self.translate_params(params, range_type)
-            )
-            request.setParameter("format", mime_type)
-            raw_result = ms.dispatch(map_, request)
+        # the storage configuration is only set while accessing the data
+        with gdal.config_env(env):
+            try:
+                connector.connect(coverage, data_locations, layer, {})
+                # create request object and dispatch it against the map
+                request = ms.create_request(
+                    self.translate_params(params, range_type)
+                )
+                request.setParameter("format", mime_type)
+                raw_result = ms.dispatch(map_, request)
 
-        finally:
-            # perform any required layer related cleanup
-            connector.disconnect(coverage, data_locations, layer, {})
+            finally:
+                # perform any required layer related cleanup
+                connector.disconnect(coverage, data_locations, layer, {})
 
-        result_set = result_set_from_raw_data(raw_result)
+        # write the output to spool files, so that it does not have to be
+        # kept in memory and can be streamed
+        result_set = spooled_result_set_from_raw_data(raw_result)
+        del raw_result
 
-        if params.version == Version(2, 0):
-            mediatype = getattr(params, "mediatype", None)
-            if mediatype in ("multipart/mixed", "multipart/related"):
-                with vsi.TemporaryVSIFile.from_buffer(result_set[1].data) as f:
-                    ds = gdal.Open(f.name)
+        try:
+            if params.version == Version(2, 0):
+                mediatype = getattr(params, "mediatype", None)
+                if mediatype in ("multipart/mixed", "multipart/related"):
+                    ds = gdal.Open(result_set[1].path)
                     grid = objects.Grid.from_gdal_dataset(ds)
 
                     # get the output CRS definition
@@ -188,45 +194,52 @@ class RectifiedCoverageMapServerRenderer(BaseRenderer):
 
                     origin = objects.Origin.from_gdal_dataset(ds)
                     size = [ds.RasterXSize, ds.RasterYSize]
+                    ds = None
+
+                    range_type = coverage.range_type
+                    if params.rangesubset:
+                        range_type = range_type.subset(params.rangesubset)
+
+                    coverage._grid = grid
+                    coverage._origin = origin
+                    coverage._size = size
+                    coverage._range_type = range_type
+                    if isinstance(result_set[1].filename, binary_type):
+                        file_name = result_set[1].filename.decode()
+                    else:
+                        file_name = result_set[1].filename
 
-                range_type = coverage.range_type
-                if params.rangesubset:
-                    range_type = range_type.subset(params.rangesubset)
-
-                coverage._grid = grid
-                coverage._origin = origin
-                coverage._size = size
-                coverage._range_type = range_type
-                if isinstance(result_set[1].filename, binary_type):
-                    file_name = result_set[1].filename.decode()
-                else:
-                    file_name = result_set[1].filename
+                    reference = 'cid:coverage/%s' % file_name
 
-                reference = 'cid:coverage/%s' % file_name
+                    encoder = WCS20EOXMLEncoder()
 
-                encoder = WCS20EOXMLEncoder()
+                    if not isinstance(coverage, objects.Mosaic):
+                        tree = encoder.encode_rectified_dataset(
+                            coverage,
+                            getattr(params, "http_request", None),
+                            reference,
+                            mime_type,
+                            subsets.bounding_polygon(coverage)
+                            if subsets else None
+                        )
+                    else:
+                        tree = encoder.encode_rectified_stitched_mosaic(
+                            coverage,
+                            getattr(params, "http_request", None),
+                            reference,
+                            mime_type,
+                            subsets.bounding_polygon(coverage)
+                            if subsets else None
+                        )
 
-                if not isinstance(coverage, objects.Mosaic):
-                    tree = encoder.encode_rectified_dataset(
-                        coverage,
-                        getattr(params, "http_request", None),
-                        reference,
-                        mime_type,
-                        subsets.bounding_polygon(coverage) if subsets else None
+                    result_set[0].delete()
+                    result_set[0] = ResultBuffer(
+                        encoder.serialize(tree),
+                        encoder.content_type
                     )
-                else:
-                    tree = encoder.encode_rectified_stitched_mosaic(
-                        coverage,
-                        getattr(params, "http_request", None),
-                        reference,
-                        mime_type,
-                        subsets.bounding_polygon(coverage) if subsets else None
-                    )
-
-                result_set[0] = ResultBuffer(
-                    encoder.serialize(tree),
-                    encoder.content_type
-                )
+        except:
+            delete_result_set(result_set)
+            raise
 
         # "default" response
         return result_set
@@ -333,7 +346,12 @@ def create_outputformat(mime_type, options, imagemode, basename, parameters):
             "Unsupported output format '%s'." % mime_type, "format"
         )
 
-    outputformat = ms.outputFormatObj(reg_format.driver, "custom")
+    # Cloud Optimized GeoTIFFs are written with GDALs COG driver
+    cog = mime_type == "image/tiff" and parameters.get("cog")
+
+    outputformat = ms.outputFormatObj(
+        "GDAL/COG" if cog else reg_format.driver, "custom"
+    )
     outputformat.name = reg_format.wcs10name
     outputformat.mimetype = reg_format.mimeType
     outputformat.extension = reg_format.defaultExt
@@ -342,7 +360,9 @@ def create_outputformat(mime_type, options, imagemode, basename, parameters):
     # for key, value in options:
     #    outputformat.setOption(str(key), str(value))
 
-    if mime_type == "image/tiff":
+    if cog:
+        _apply_cog(outputformat, **parameters)
+    elif mime_type == "image/tiff":
         _apply_gtiff(outputformat, **parameters)
 
     filename = basename + reg_format.defaultExt
@@ -353,7 +373,7 @@ def create_outputformat(mime_type, options, imagemode, basename, parameters):
 
 def _apply_gtiff(outputformat, compression=None, jpeg_quality=None,
                  predictor=None, interleave=None, tiling=False,
-                 tilewidth=None, tileheight=None):
+                 tilewidth=None, tileheight=None, **kwargs):
 
     logger.info("Applying GeoTIFF parameters.")
 
@@ -382,6 +402,34 @@ def _apply_gtiff(outputformat, compression=None, jpeg_quality=None,
             outputformat.setOption("BLOCKYSIZE", str(tileheight))
 
 
+def _apply_cog(outputformat, compression=None, jpeg_quality=None,
+               predictor=None, overview_resampling=None, blocksize=None,
+               **kwargs):
+
+    logger.info("Applying Cloud Optimized GeoTIFF parameters.")
+
+    if compression:
+        outputformat.setOption("COMPRESS", str(compression.upper()))
+
+    if jpeg_quality is not None:
+        outputformat.setOption("QUALITY", str(jpeg_quality))
+
+    if predictor:
+        outputformat.setOption("PREDICTOR", {
+            "NONE": "NO",
+            "HORIZONTAL": "STANDARD",
+            "FLOATINGPOINT": "FLOATING_POINT",
+        }[predictor.upper()])
+
+    if overview_resampling:
+        outputformat.setOption(
+            "OVERVIEW_RESAMPLING", str(overview_resampling.upper())
+        )
+
+    if blocksize is not None:
+        outputformat.setOption("BLOCKSIZE", str(blocksize))
+
+
 def get_format_by_mime(mime_type):
     """ Convenience function to return an enabled format descriptior for the
         given mime type or WCS 1.0 format name. Returns ``None``, if none
@@ -47,3 +47,8 @@ class ServiceVisibility(models.Model):
 
     class Meta:
         unique_together = ['eo_object', 'service']
+
+
+# connect the invalidation of cached capabilities to the signals of the models,
+# regardless of which process changes them
+from eoxserver.services.ows.wms import capabilitiescache  # noqa: E402,F401
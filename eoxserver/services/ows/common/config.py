@@ -65,3 +65,4 @@ class CapabilitiesConfigReader(config.Reader):
 class WCSEOConfigReader(config.Reader):
     section = "services.ows.wcs20"
     paging_count_default = config.Option(type=int, default=None)
+    package_workers = config.Option(type=int, default=4)
@@ -40,13 +40,16 @@ DEFAULT_EOXS_OWS_SERVICE_HANDLERS = [
 
     'eoxserver.services.ows.wms.v10.handlers.WMS10GetCapabilitiesHandler',
     'eoxserver.services.ows.wms.v10.handlers.WMS10GetMapHandler',
-    # 'eoxserver.services.ows.wms.v10.handlers.WMS10GetFeatureInfoHandler',
+    'eoxserver.services.ows.wms.v10.handlers.WMS10GetFeatureInfoHandler',
     'eoxserver.services.ows.wms.v11.handlers.WMS11GetCapabilitiesHandler',
     'eoxserver.services.ows.wms.v11.handlers.WMS11GetMapHandler',
-    # 'eoxserver.services.ows.wms.v11.handlers.WMS11GetFeatureInfoHandler',
+    'eoxserver.services.ows.wms.v11.handlers.WMS11GetFeatureInfoHandler',
     'eoxserver.services.ows.wms.v13.handlers.WMS13GetCapabilitiesHandler',
     'eoxserver.services.ows.wms.v13.handlers.WMS13GetMapHandler',
-    # 'eoxserver.services.ows.wms.v13.handlers.WMS13GetFeatureInfoHandler',
+    'eoxserver.services.ows.wms.v13.handlers.WMS13GetFeatureInfoHandler',
+
+    'eoxserver.services.ows.wmts.v10.handlers.WMTS10GetCapabilitiesHandler',
+    'eoxserver.services.ows.wmts.v10.handlers.WMTS10GetTileHandler',
 
     'eoxserver.services.ows.wps.v10.getcapabilities.WPS10GetCapabilitiesHandler',
     'eoxserver.services.ows.wps.v10.describeprocess.WPS10DescribeProcessHandler',
@@ -61,4 +64,5 @@ DEFAULT_EOXS_OWS_EXCEPTION_HANDLERS = [
     'eoxserver.services.ows.wcs.v11.exceptionhandler.WCS11ExceptionHandler',
     'eoxserver.services.ows.wcs.v20.exceptionhandler.WCS20ExceptionHandler',
     'eoxserver.services.ows.wms.v13.exceptionhandler.WMS13ExceptionHandler',
+    'eoxserver.services.ows.wmts.v10.exceptionhandler.WMTS10ExceptionHandler',
 ]
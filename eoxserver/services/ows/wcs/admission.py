@@ -0,0 +1,319 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Output size estimation and admission control for WCS GetCoverage requests.
+
+    Before a coverage is rendered, the size of the output is estimated from
+    the subsets, scaling and range subset of the request and the data types of
+    the coverages range type. Requests exceeding the ``maxsize`` (pixels per
+    axis) or ``maxbytes`` limits of the ``services.ows.wcs`` configuration
+    section are rejected.
+
+    Heavy requests, i.e: requests with an estimated output of at least
+    ``heavy_bytes``, are additionally limited in their concurrency, so that a
+    few of them cannot occupy all workers. This is configured via the
+    ``EOXS_WCS_ADMISSION`` setting::
+
+        EOXS_WCS_ADMISSION = {
+            'heavy_bytes': 64 * 1024 * 1024,
+            'max_concurrent': 2,
+            'timeout': 30,
+            'alias': 'default',
+        }
+
+    Heavy requests wait up to ``timeout`` seconds for one of the
+    ``max_concurrent`` slots and are rejected when none becomes available.
+    Without an ``alias``, only the threads of a process share the slots, with
+    an ``alias`` referring to one of the configured Django ``CACHES`` that is
+    shared by all workers, the slots are shared across worker processes. Set
+    ``EOXS_WCS_ADMISSION = None`` to disable the concurrency limit.
+"""
+
+from contextlib import contextmanager
+from threading import Condition
+from uuid import uuid4
+import time
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.decoders import config
+from eoxserver.core.util.rect import Rect
+from eoxserver.contrib import gdal
+from eoxserver.services.ows.wcs.v20.util import get_scaled_size
+from eoxserver.services.exceptions import (
+    RenderException, ServiceUnavailableException
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EOXS_WCS_ADMISSION = {
+    'heavy_bytes': 64 * 1024 * 1024,
+    'max_concurrent': 2,
+    'timeout': 30,
+}
+
+
+def estimate_output_size(params):
+    """ Estimate the size of the output of a GetCoverage request before it is
+        rendered. The estimate does not account for compression or
+        reprojection.
+
+        :param params: the coverage render params
+        :returns: a tuple of the output size in pixels along the X and Y axes,
+                  the number of bands and the uncompressed size in bytes
+    """
+    coverage = params.coverage
+    size_x, size_y = coverage.size[:2]
+    range_type = coverage.range_type
+
+    subsets = getattr(params, 'subsets', None)
+    if subsets and (subsets.has_x or subsets.has_y):
+        size_x, size_y = _get_subset_size(coverage, subsets)
+
+    width = getattr(params, 'width', None)
+    height = getattr(params, 'height', None)
+    if width and height:
+        size_x, size_y = width, height
+    else:
+        size_x, size_y = get_scaled_size(
+            size_x, size_y, getattr(params, 'scalefactor', None),
+            getattr(params, 'scales', None)
+        )
+
+    rangesubset = getattr(params, 'rangesubset', None)
+    if rangesubset:
+        fields = [
+            range_type[index]
+            for index in rangesubset.get_band_indices(range_type)
+        ]
+    else:
+        fields = list(range_type)
+
+    pixel_bytes = sum(
+        max(gdal.GetDataTypeSize(field.data_type) // 8, 1)
+        if field.data_type is not None else 1
+        for field in fields
+    )
+
+    return size_x, size_y, len(fields), size_x * size_y * pixel_bytes
+
+
+def _get_subset_size(coverage, subsets):
+    image_rect = Rect(0, 0, *coverage.size[:2])
+    offsets = coverage.grid.offsets
+
+    # the geotransform of referenceable grids is unknown, so only pixel
+    # subsets can be taken into account
+    if subsets.srid is not None and offsets[0] is None:
+        return image_rect.size
+
+    geotransform = None
+    if offsets[0] is not None:
+        geotransform = [
+            coverage.origin[0], offsets[0], 0, coverage.origin[1], 0,
+            offsets[1]
+        ]
+
+    subset_rect = subsets.pixel_rect(
+        image_rect.size, geotransform, coverage.grid.spatial_reference.srid
+    )
+    return (image_rect & subset_rect).size
+
+
+def check_output_size(params):
+    """ Estimate the output size of the request and check it against the
+        configured ``maxsize`` and ``maxbytes`` limits.
+
+        :returns: the estimate as returned by :func:`estimate_output_size`
+        :raises RenderException: if the estimate exceeds one of the limits
+    """
+    estimate = estimate_output_size(params)
+    size_x, size_y, _, num_bytes = estimate
+    reader = WCSConfigReader(get_eoxserver_config())
+
+    maxsize = reader.maxsize
+    if maxsize is not None and (maxsize < size_x or maxsize < size_y):
+        raise RenderException(
+            "Requested image size %dpx x %dpx exceeds the allowed limit "
+            "maxsize=%dpx." % (size_x, size_y, maxsize), "size"
+        )
+
+    maxbytes = reader.maxbytes
+    if maxbytes is not None and maxbytes < num_bytes:
+        raise RenderException(
+            "Requested coverage size of approximately %d bytes exceeds the "
+            "allowed limit maxbytes=%d bytes." % (num_bytes, maxbytes), "size"
+        )
+
+    return estimate
+
+
+class ConcurrencyLimiter(object):
+    """ Limits the number of concurrently executed heavy requests.
+
+        :param max_concurrent: the number of requests that may run at once
+        :param heavy_bytes: the estimated output size in bytes from which on a
+                            request is limited
+        :param timeout: the maximum time in seconds a request waits for a
+                        slot before it is rejected
+        :param alias: the Django cache to share the slots between worker
+                      processes or ``None`` to only share them between the
+                      threads of this process
+        :param slot_timeout: the time in seconds after which a slot of a
+                             crashed worker process is released
+        :param poll_interval: the interval in seconds to poll the cache for a
+                              free slot
+    """
+
+    def __init__(self, max_concurrent=2, heavy_bytes=0, timeout=30,
+                 alias=None, slot_timeout=600, poll_interval=0.1,
+                 key_prefix='eoxs_wcs_admission'):
+        self.max_concurrent = max_concurrent
+        self.heavy_bytes = heavy_bytes
+        self.timeout = timeout
+        self.alias = alias
+        self.slot_timeout = slot_timeout
+        self.poll_interval = poll_interval
+        self.key_prefix = key_prefix
+        self._running = 0
+        self._condition = Condition()
+
+    def is_heavy(self, num_bytes):
+        return num_bytes >= self.heavy_bytes
+
+    @contextmanager
+    def limit(self):
+        """ Context manager to run a heavy request within one of the slots.
+
+            :raises ServiceUnavailableException: if no slot became available
+                                                 within the timeout
+        """
+        deadline = time.time() + self.timeout
+        self._acquire_local(deadline)
+        try:
+            slot = self._acquire_shared(deadline)
+            try:
+                yield
+            finally:
+                self._release_shared(slot)
+        finally:
+            self._release_local()
+
+    def _acquire_local(self, deadline):
+        with self._condition:
+            while self._running >= self.max_concurrent:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise self._get_exception()
+                self._condition.wait(remaining)
+            self._running += 1
+
+    def _release_local(self):
+        with self._condition:
+            self._running -= 1
+            self._condition.notify()
+
+    def _acquire_shared(self, deadline):
+        if self.alias is None:
+            return None
+
+        cache = caches[self.alias]
+        token = uuid4().hex
+        while True:
+            for index in range(self.max_concurrent):
+                key = '%s:%d' % (self.key_prefix, index)
+                if cache.add(key, token, self.slot_timeout):
+                    return key, token
+
+            if time.time() > deadline:
+                raise self._get_exception()
+            time.sleep(self.poll_interval)
+
+    def _release_shared(self, slot):
+        if slot is None:
+            return
+
+        cache = caches[self.alias]
+        key, token = slot
+        if cache.get(key) == token:
+            cache.delete(key)
+
+    def _get_exception(self):
+        return ServiceUnavailableException(
+            "Too many large coverage requests are currently processed. "
+            "Please try again later or request a smaller subset."
+        )
+
+
+LIMITER = None
+LIMITER_CONFIGURED = False
+
+
+def get_concurrency_limiter():
+    """ Get the configured :class:`ConcurrencyLimiter` or ``None`` if the
+        concurrency of heavy requests is not limited.
+    """
+    global LIMITER, LIMITER_CONFIGURED
+    if not LIMITER_CONFIGURED:
+        admission_config = getattr(
+            settings, 'EOXS_WCS_ADMISSION', DEFAULT_EOXS_WCS_ADMISSION
+        )
+        if admission_config is not None:
+            LIMITER = ConcurrencyLimiter(**admission_config)
+        LIMITER_CONFIGURED = True
+
+    return LIMITER
+
+
+@contextmanager
+def admission(params):
+    """ Context manager to check the estimated output size of the request
+        and to run it within the concurrency limit if it is a heavy one.
+    """
+    num_bytes = check_output_size(params)[3]
+    limiter = get_concurrency_limiter()
+    if limiter is None or not limiter.is_heavy(num_bytes):
+        yield
+    else:
+        logger.debug(
+            "Limiting heavy coverage request of approximately %d bytes."
+            % num_bytes
+        )
+        with limiter.limit():
+            yield
+
+
+class WCSConfigReader(config.Reader):
+    section = "services.ows.wcs"
+    maxsize = config.Option(type=int, default=None)
+    maxbytes = config.Option(type=int, default=None)
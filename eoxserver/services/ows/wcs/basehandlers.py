@@ -30,10 +30,17 @@ This module contains a set of handler base classes which shall help to
 implement a specific handler. Interface methods need to be overridden in order
 to work, default methods can be overidden.
 """
+import hashlib
+
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 
 from eoxserver.resources.coverages import models
-from eoxserver.services.result import to_http_response
+from eoxserver.services.result import (
+    to_http_response, copy_result_set, RESULT_CHUNK_SIZE
+)
+from eoxserver.services.singleflight import single_flight
+from eoxserver.services.ows.wcs.admission import admission
 from eoxserver.services.ows.wcs.parameters import WCSCapabilitiesRenderParams
 from eoxserver.services.exceptions import (
     NoSuchCoverageException, OperationNotSupportedException
@@ -296,9 +303,12 @@ class WCSGetCoverageHandlerBase(object):
         return renderer
 
     def to_http_response(self, result_set):
-        """ Default result to response conversion method.
+        """ Default result to response conversion method. The result items are
+            streamed in chunks, instead of being read into memory.
         """
-        return to_http_response(result_set)
+        return to_http_response(
+            result_set, StreamingHttpResponse, chunk_size=RESULT_CHUNK_SIZE
+        )
 
     def handle(self, request):
         """ Default handling method implementation.
@@ -307,18 +317,42 @@ class WCSGetCoverageHandlerBase(object):
         # parse the request
         decoder = self.get_decoder(request)
 
-        # get the decoded subsets
-        subsets = self.get_subsets(decoder)
+        def render():
+            # get the decoded subsets
+            subsets = self.get_subsets(decoder)
 
-        # get the coverage model
-        coverage = self.lookup_coverage(decoder, subsets)
+            # get the coverage model
+            coverage = self.lookup_coverage(decoder, subsets)
 
-        # create the render params
-        params = self.get_params(coverage, decoder, request)
+            # create the render params
+            params = self.get_params(coverage, decoder, request)
 
-        # get the renderer
-        renderer = self.get_renderer(params)
+            # get the renderer
+            renderer = self.get_renderer(params)
 
-        # render the coverage and return the response
-        result_set = renderer.render(params)
+            # render the coverage, if its estimated size is admitted
+            with admission(params):
+                return renderer.render(params)
+
+        # identical concurrent requests share a single rendering, each
+        # getting its own copy of the result files
+        result_set = single_flight(
+            ['GetCoverage', get_normalized_request(request)], render,
+            copy_result_set
+        )
         return self.to_http_response(result_set)
+
+
+def get_normalized_request(request):
+    """ Get the parameters of the request, independent of the order and case
+        of the KVP keys, to identify identical requests.
+    """
+    params = sorted(
+        (key.lower(), value)
+        for key, values in request.GET.lists()
+        for value in values
+    )
+    body = None
+    if request.method == 'POST':
+        body = hashlib.sha256(request.body).hexdigest()
+    return [request.method, params, body]
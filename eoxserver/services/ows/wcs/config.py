@@ -42,4 +42,9 @@ DEFAULT_EOXS_COVERAGE_RENDERERS = [
 
 DEFAULT_EOXS_COVERAGE_ENCODING_EXTENSIONS = [
     'eoxserver.services.ows.wcs.v20.encodings.geotiff.WCS20GeoTIFFEncodingExtension'
-]
\ No newline at end of file
+]
+
+DEFAULT_EOXS_COVERAGE_PACKAGE_WRITERS = [
+    'eoxserver.services.ows.wcs.v20.packages.tar.TarPackageWriter',
+    'eoxserver.services.ows.wcs.v20.packages.zip.ZipPackageWriter',
+]
@@ -78,28 +78,20 @@ class PackageWriterInterface(object):
             format.
         """
 
-    def create_package(self, filename, format, params):
-        """ Create a package, which the encoder can later add items to with the 
-            `cleanup` and `add_to_package` method.
+    def iter_package(self, items, format, params):
+        """ Yield the package contents as chunks of bytes. ``items`` is an
+            iterable of the location within the package and the
+            :class:`ResultItem <eoxserver.services.result.ResultItem>` to be
+            added. The chunks of each item shall be yielded before the next
+            item is requested, so that the package can be streamed.
         """
 
-    def cleanup(self, package):
-        """ Perform any necessary cleanups, like closing files, etc.
+    def get_mime_type(self, format, params):
+        """ Retrieve the output mime type for the given format specifier.
         """
 
-    def add_to_package(self, package, file_obj, size, location):
-        """ Add the file object to the package, that is returned by the 
-            `create_package` method.
-        """
-
-    def get_mime_type(self, package, format, params):
-        """ Retrieve the output mime type for the given package and/or format
-            specifier.
-        """
-
-    def get_file_extension(self, package, format, params):
-        """ Retrieve the file extension for the given package and format 
-            specifier.
+    def get_file_extension(self, format, params):
+        """ Retrieve the file extension for the given format specifier.
         """
 
 
@@ -29,6 +29,7 @@ from eoxserver.services.ows.common.v11.encoders import OWS11ExceptionXMLEncoder
 from eoxserver.core.decoders import (
     DecodingException, MissingParameterException
 )
+from eoxserver.services.exceptions import ServiceUnavailableException
 
 
 class WCS11ExceptionHandler(object):
@@ -51,6 +52,9 @@ class WCS11ExceptionHandler(object):
             else:
                 code = "InvalidRequest"
 
+        if isinstance(exception, ServiceUnavailableException):
+            status = 503
+
         encoder = OWS11ExceptionXMLEncoder()
         xml = encoder.serialize(
             encoder.encode_exception(message, "1.1.2", code, locator)
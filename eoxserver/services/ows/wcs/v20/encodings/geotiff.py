@@ -54,6 +54,27 @@ class InterleavingInvalid(InvalidParameterException):
 class TilingInvalid(InvalidParameterException):
     code = "TilingInvalid"
 
+class OverviewResamplingInvalid(InvalidParameterException):
+    code = "OverviewResamplingInvalid"
+
+class CloudOptimizedInvalid(InvalidParameterException):
+    code = "CloudOptimizedInvalid"
+
+COG_PROFILES = ("cloud-optimized", "cog")
+
+def is_cog_format(frmt):
+    """ Checks whether the format requests a Cloud Optimized GeoTIFF via a
+        ``profile`` mime type parameter, e.g:
+        ``image/tiff; application=geotiff; profile=cloud-optimized``
+    """
+    if not frmt:
+        return False
+    for part in frmt.split(";")[1:]:
+        key, _, value = part.partition("=")
+        if key.strip().lower() == "profile":
+            return value.strip().strip('"').lower() in COG_PROFILES
+    return False
+
 def parse_jpeg_quality(value):
 
     value = int(value)
@@ -68,7 +89,7 @@ class WCS20GeoTIFFEncodingExtension(object):
         # To allow "native" GeoTIFF formats aswell
         if not frmt:
             return True
-        return frmt.lower() == "image/tiff"
+        return frmt.split(";")[0].strip().lower() == "image/tiff"
 
     def get_decoder(self, request):
         if request.method == "GET":
@@ -86,6 +107,9 @@ class WCS20GeoTIFFEncodingExtension(object):
         tiling = decoder.tiling
         tileheight = decoder.tileheight
         tilewidth = decoder.tilewidth
+        cog = decoder.cog or is_cog_format(decoder.format)
+        overview_resampling = decoder.overview_resampling
+        blocksize = decoder.blocksize
 
         if predictor and compression not in ("LZW", "Deflate"):
             raise PredictorNotSupported(
@@ -108,6 +132,28 @@ class WCS20GeoTIFFEncodingExtension(object):
                 "geotiff:tileheight to be set.", "geotiff:tiling"
             )
 
+        if cog:
+            if compression and compression.lower() in ("packbits", "huffman"):
+                raise CompressionNotSupported(
+                    "geotiff:compression '%s' is not supported for Cloud "
+                    "Optimized GeoTIFFs." % compression, "geotiff:compression"
+                )
+            if tiling or tileheight is not None or tilewidth is not None:
+                raise TilingInvalid(
+                    "Cloud Optimized GeoTIFFs are always tiled, use "
+                    "geotiff:blocksize to set the tile size.", "geotiff:tiling"
+                )
+            if decoder.interleave and decoder.interleave.lower() == "band":
+                raise InterleavingInvalid(
+                    "Cloud Optimized GeoTIFFs are always pixel interleaved.",
+                    "geotiff:interleave"
+                )
+        elif overview_resampling or blocksize is not None:
+            raise CloudOptimizedInvalid(
+                "geotiff:overview_resampling and geotiff:blocksize require "
+                "geotiff:cog.", "geotiff:cog"
+            )
+
         return {
             "compression": compression,
             "jpeg_quality": jpeg_quality,
@@ -115,7 +161,10 @@ class WCS20GeoTIFFEncodingExtension(object):
             "interleave": decoder.interleave,
             "tiling": tiling,
             "tileheight": tileheight,
-            "tilewidth": tilewidth
+            "tilewidth": tilewidth,
+            "cog": cog,
+            "overview_resampling": overview_resampling,
+            "blocksize": blocksize,
         }
 
 
@@ -124,6 +173,10 @@ compression_enum = enum(
 )
 predictor_enum = enum(("None", "Horizontal", "FloatingPoint"), True, PredictorInvalid)
 interleave_enum = enum(("Pixel", "Band"), True, InterleavingInvalid)
+overview_resampling_enum = enum(
+    ("Nearest", "Average", "Bilinear", "Cubic", "CubicSpline", "Lanczos",
+     "Mode"), True, OverviewResamplingInvalid
+)
 
 def parse_multiple_16(raw):
     value = int(raw)
@@ -142,6 +195,10 @@ class WCS20GeoTIFFEncodingExtensionKVPDecoder(kvp.Decoder):
     tiling      = kvp.Parameter("geotiff:tiling", num="?", type=boolean)
     tileheight  = kvp.Parameter("geotiff:tileheight", num="?", type=parse_multiple_16)
     tilewidth   = kvp.Parameter("geotiff:tilewidth", num="?", type=parse_multiple_16)
+    cog         = kvp.Parameter("geotiff:cog", num="?", type=boolean)
+    overview_resampling = kvp.Parameter("geotiff:overview_resampling", num="?", type=overview_resampling_enum)
+    blocksize   = kvp.Parameter("geotiff:blocksize", num="?", type=parse_multiple_16)
+    format      = kvp.Parameter("format", num="?")
 
 
 class WCS20GeoTIFFEncodingExtensionXMLDecoder(xml.Decoder):
@@ -152,6 +209,10 @@ class WCS20GeoTIFFEncodingExtensionXMLDecoder(xml.Decoder):
     tiling      = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:tiling/text()", num="?", type=boolean, locator="geotiff:tiling")
     tileheight  = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:tileheight/text()", num="?", type=parse_multiple_16, locator="geotiff:tileheight")
     tilewidth   = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:tilewidth/text()", num="?", type=parse_multiple_16, locator="geotiff:tilewidth")
+    cog         = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:cog/text()", num="?", type=boolean, locator="geotiff:cog")
+    overview_resampling = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:overview_resampling/text()", num="?", type=overview_resampling_enum, locator="geotiff:overview_resampling")
+    blocksize   = xml.Parameter("wcs:Extension/geotiff:parameters/geotiff:blocksize/text()", num="?", type=parse_multiple_16, locator="geotiff:blocksize")
+    format      = xml.Parameter("wcs:format/text()", num="?", locator="format")
 
     namespaces = NameSpaceMap(
         ns_wcs, NameSpace("http://www.opengis.net/gmlcov/geotiff/1.0", "geotiff")
@@ -32,6 +32,7 @@ from eoxserver.services.ows.common.v20.encoders import OWS20ExceptionXMLEncoder
 from eoxserver.core.decoders import (
     DecodingException, MissingParameterException
 )
+from eoxserver.services.exceptions import ServiceUnavailableException
 
 
 CODES_404 = frozenset((
@@ -41,7 +42,7 @@ CODES_404 = frozenset((
     "ScaleAxisUndefined", "SubsettingCrs-NotSupported", "OutputCrs-NotSupported",
     "CompressionNotSupported", "CompressionInvalid", "JpegQualityInvalid",
     "PredictorInvalid", "PredictorNotSupported", "InterleavingInvalid",
-    "TilingInvalid"
+    "TilingInvalid", "OverviewResamplingInvalid", "CloudOptimizedInvalid"
 
 ))
 
@@ -71,6 +72,8 @@ class WCS20ExceptionHandler(Component):
             status = 404
         elif code in ("OperationNotSupported", "OptionNotSupported"):
             status = 501
+        elif isinstance(exception, ServiceUnavailableException):
+            status = 503
 
         encoder = OWS20ExceptionXMLEncoder()
         xml = encoder.serialize(
@@ -26,36 +26,28 @@
 #-------------------------------------------------------------------------------
 
 
-import os
-import tempfile
 import logging
-from itertools import chain
+from multiprocessing.pool import ThreadPool
 import mimetypes
 
+from django.db import connection
 from django.db.models import Q
-from django.http import HttpResponse
-try:
-    from django.http import StreamingHttpResponse
-except:
-    StreamingHttpResponse = HttpResponse
-
-from django.utils.six import MAXSIZE
-from eoxserver.core import Component, implements, ExtensionPoint
+from django.http import StreamingHttpResponse
+from django.utils.six import MAXSIZE, binary_type
+from django.utils.six.moves import queue
+
 from eoxserver.core.config import get_eoxserver_config
 from eoxserver.core.decoders import xml, kvp, typelist, enum
+from eoxserver.render.coverage.objects import Coverage
 from eoxserver.resources.coverages import models
-from eoxserver.services.ows.interfaces import (
-    ServiceHandlerInterface, GetServiceHandlerInterface,
-    PostServiceHandlerInterface
-)
 from eoxserver.services.ows.wcs.v20.util import (
     nsmap, parse_subset_kvp, parse_subset_xml
 )
 from eoxserver.services.ows.wcs.v20.parameters import WCS20CoverageRenderParams
+from eoxserver.services.ows.wcs.v20.packages import get_package_writer
+from eoxserver.services.ows.wcs.renderers import get_coverage_renderer
 from eoxserver.services.ows.common.config import WCSEOConfigReader
-from eoxserver.services.ows.wcs.interfaces import (
-    WCSCoverageRendererInterface, PackageWriterInterface
-)
+from eoxserver.services.result import delete_result_set
 from eoxserver.services.subset import Subsets, Trim
 from eoxserver.services.exceptions import (
     NoSuchDatasetSeriesOrCoverageException, InvalidRequestException,
@@ -66,14 +58,7 @@ from eoxserver.services.exceptions import (
 logger = logging.getLogger(__name__)
 
 
-class WCS20GetEOCoverageSetHandler(Component):
-    implements(ServiceHandlerInterface)
-    implements(GetServiceHandlerInterface)
-    implements(PostServiceHandlerInterface)
-
-    coverage_renderers = ExtensionPoint(WCSCoverageRendererInterface)
-    package_writers = ExtensionPoint(PackageWriterInterface)
-
+class WCS20GetEOCoverageSetHandler(object):
     service = "WCS"
     versions = ("2.0.0", "2.0.1")
     methods = ['GET', 'POST']
@@ -87,28 +72,27 @@ class WCS20GetEOCoverageSetHandler(Component):
         elif request.method == "POST":
             return WCS20GetEOCoverageSetXMLDecoder(request.body)
 
-    def get_params(self, coverage, decoder, request):
+    def get_params(self, coverage, subsets, request):
         return WCS20CoverageRenderParams(
-            coverage, Subsets(decoder.subsets), http_request=request
+            coverage, subsets, http_request=request
         )
 
     def get_renderer(self, params):
-        for renderer in self.coverage_renderers:
-            if renderer.supports(params):
-                return renderer
-
-        raise InvalidRequestException(
-            "Could not find renderer for coverage '%s'."
-        )
-
-    def get_pacakge_writer(self, format, params):
-        for writer in self.package_writers:
-            if writer.supports(format, params):
-                return writer
+        renderer = get_coverage_renderer(params)
+        if not renderer:
+            raise InvalidRequestException(
+                "Could not find renderer for coverage '%s'."
+                % params.coverage.identifier
+            )
+        return renderer
 
-        raise InvalidRequestException(
-            "Format '%s' is not supported." % format, locator="format"
-        )
+    def get_package_writer(self, format, params):
+        writer = get_package_writer(format, params)
+        if not writer:
+            raise InvalidRequestException(
+                "Format '%s' is not supported." % format, locator="format"
+            )
+        return writer
 
     @property
     def constraints(self):
@@ -122,7 +106,7 @@ class WCS20GetEOCoverageSetHandler(Component):
         eo_ids = decoder.eo_ids
 
         format, format_params = decoder.format
-        writer = self.get_pacakge_writer(format, format_params)
+        writer = self.get_package_writer(format, format_params)
 
         containment = decoder.containment
 
@@ -222,62 +206,119 @@ class WCS20GetEOCoverageSetHandler(Component):
         if containment == "within":
             collection_set = filter(lambda c: subsets.matches(c), collection_set)
 
-        coverages = []
-        dataset_series = []
-
-        # finally iterate over everything that has been retrieved and get
-        # a list of dataset series and coverages to be encoded into the response
-        for eo_object in chain(coverages_qs, collection_set):
-            if issubclass(eo_object.real_type, models.Coverage):
-                coverages.append(eo_object.cast())
-
-        fd, pkg_filename = tempfile.mkstemp()
-        tmp = os.fdopen(fd)
-        tmp.close()
-        package = writer.create_package(pkg_filename, format, format_params)
+        coverages = [
+            Coverage.from_model(coverage)
+            for coverage in coverages_qs.distinct().order_by(
+                "identifier"
+            ).prefetch_related("arraydata_items", "metadata_items")
+        ]
 
+        # look up all renderers beforehand, so that errors can still be
+        # reported before the response is streamed
+        renderings = []
         for coverage in coverages:
-            params = self.get_params(coverage, decoder, request)
-            renderer = self.get_renderer(params)
-            result_set = renderer.render(params)
-            all_filenames = set()
-            for result_item in result_set:
-                if not result_item.filename:
-                    ext = mimetypes.guess_extension(result_item.content_type)
-                    filename = coverage.identifier + ext
-                else:
-                    filename = result_item.filename
-                if filename in all_filenames:
-                    continue  # TODO: create new filename
-                all_filenames.add(filename)
-                location = "%s/%s" % (coverage.identifier, filename)
-                writer.add_to_package(
-                    package, result_item.data_file, result_item.size, location
-                )
+            params = self.get_params(coverage, subsets, request)
+            renderings.append((coverage, self.get_renderer(params), params))
 
-        mime_type = writer.get_mime_type(package, format, format_params)
-        ext = writer.get_file_extension(package, format, format_params)
-        writer.cleanup(package)
+        workers = WCSEOConfigReader(get_eoxserver_config()).package_workers
 
         response = StreamingHttpResponse(
-            tempfile_iterator(pkg_filename), mime_type
+            writer.iter_package(
+                iter_package_items(renderings, workers), format, format_params
+            ),
+            writer.get_mime_type(format, format_params)
+        )
+        response["Content-Disposition"] = 'inline; filename="ows%s"' % (
+            writer.get_file_extension(format, format_params)
         )
-        response["Content-Disposition"] = 'inline; filename="ows%s"' % ext
-        response["Content-Length"] = str(os.path.getsize(pkg_filename))
-
         return response
 
 
-def tempfile_iterator(filename, chunksize=2048, delete=True):
-    with open(filename) as file_obj:
-        while True:
-            data = file_obj.read(chunksize)
-            if not data:
-                break
-            yield data
-
-    if delete:
-        os.remove(filename)
+def iter_package_items(renderings, workers):
+    """ Yield the location within the package and the result item of all
+        rendered coverages. The result items are deleted once they have been
+        added to the package.
+    """
+    for coverage, result_set in iter_rendered(renderings, workers):
+        try:
+            filenames = set()
+            for result_item in result_set:
+                filename = result_item.filename
+                if isinstance(filename, binary_type):
+                    filename = filename.decode("utf-8")
+                if not filename:
+                    content_type = result_item.content_type
+                    if isinstance(content_type, binary_type):
+                        content_type = content_type.decode("utf-8")
+                    ext = mimetypes.guess_extension(content_type) or ""
+                    filename = coverage.identifier + ext
+                if filename in filenames:
+                    continue  # TODO: create new filename
+                filenames.add(filename)
+                yield "%s/%s" % (coverage.identifier, filename), result_item
+        finally:
+            delete_result_set(result_set)
+
+
+def iter_rendered(renderings, workers):
+    """ Render the coverages in a pool of ``workers`` threads and yield each
+        coverage and its result set as soon as it is finished, regardless of
+        the order. Besides the result set being consumed, at most ``workers``
+        renderings are in progress or waiting to be consumed, which bounds
+        the disk space taken by result files.
+
+        :param renderings: a list of coverage, renderer and render params
+                           tuples
+        :param workers: the maximum number of renderings at once
+    """
+    renderings = iter(renderings)
+    workers = max(workers, 1)
+    results = queue.Queue()
+    pool = ThreadPool(workers)
+    pending = 0
+
+    def submit():
+        for rendering in renderings:
+            pool.apply_async(_render, rendering, callback=results.put)
+            return True
+        return False
+
+    try:
+        while pending < workers and submit():
+            pending += 1
+
+        while pending:
+            coverage, result_set, exception = results.get()
+            pending -= 1
+            if exception is not None:
+                raise exception
+
+            if submit():
+                pending += 1
+            yield coverage, result_set
+
+    finally:
+        # wait for the renderings still in progress and discard their results
+        pool.close()
+        while pending:
+            result_set = results.get()[1]
+            pending -= 1
+            if result_set:
+                delete_result_set(result_set)
+        pool.join()
+
+
+def _render(coverage, renderer, params):
+    try:
+        return coverage, renderer.render(params), None
+    except Exception as e:
+        logger.exception(
+            "Failed to render coverage '%s'." % coverage.identifier
+        )
+        return coverage, None, e
+    finally:
+        # database connections are per thread
+        connection.close()
 
 
 def pos_int(value):
@@ -0,0 +1,57 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2013 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from eoxserver.services.ows.wcs.config import (
+    DEFAULT_EOXS_COVERAGE_PACKAGE_WRITERS
+)
+
+COVERAGE_PACKAGE_WRITERS = None
+
+
+def _setup_package_writers():
+    global COVERAGE_PACKAGE_WRITERS
+    specifiers = getattr(
+        settings, 'EOXS_COVERAGE_PACKAGE_WRITERS',
+        DEFAULT_EOXS_COVERAGE_PACKAGE_WRITERS
+    )
+    COVERAGE_PACKAGE_WRITERS = [
+        import_string(identifier)()
+        for identifier in specifiers
+    ]
+
+
+def get_package_writer(format, params):
+    if COVERAGE_PACKAGE_WRITERS is None:
+        _setup_package_writers()
+
+    for writer in COVERAGE_PACKAGE_WRITERS:
+        if writer.supports(format, params):
+            return writer
+    return None
@@ -26,12 +26,12 @@
 #-------------------------------------------------------------------------------
 
 
+import bz2
+import time
 import tarfile
+import zlib
 
-from eoxserver.core import Component, implements
-from eoxserver.services.ows.wcs.interfaces import (
-    PackageWriterInterface
-)
+from eoxserver.services.result import RESULT_CHUNK_SIZE
 
 
 gzip_mimes = ("application/gzip", "application/x-gzip")
@@ -39,37 +39,66 @@ bzip_mimes = ("application/bzip", "application/x-bzip")
 mime_list = ("application/tar", "application/x-tar") + gzip_mimes + bzip_mimes
 
 
-class TarPackageWriter(Component):
-    """ Package writer for compressed and uncompressed tar files.
+class TarPackageWriter(object):
+    """ Package writer for compressed and uncompressed tar files. The package
+        is streamed: each member is emitted as soon as it is added.
     """
 
-    implements(PackageWriterInterface)
-
     def supports(self, format, params):
         return format.lower() in mime_list
 
-    def create_package(self, filename, format, params):
+    def iter_package(self, items, format, params):
+        format = format.lower()
         if format in gzip_mimes:
-            mode = "w:gz"
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
         elif format in bzip_mimes:
-            mode = "w:bz2"
+            compressor = bz2.BZ2Compressor()
         else:
-            mode = "w"
-
-        return tarfile.open(filename, mode)
-
-    def cleanup(self, package):
-        package.close()
-
-    def add_to_package(self, package, file_obj, size, location):
-        info = tarfile.TarInfo(location)
-        info.size = size
-        package.addfile(info, file_obj)
-
-    def get_mime_type(self, package, format, params):
+            compressor = None
+
+        for data in self._iter_tar(items):
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+        if compressor:
+            yield compressor.flush()
+
+    def _iter_tar(self, items):
+        written = 0
+        for location, item in items:
+            info = tarfile.TarInfo(location)
+            info.size = len(item)
+            info.mtime = int(time.time())
+            header = info.tobuf()
+            yield header
+            written += len(header)
+
+            for chunk in item.chunked(RESULT_CHUNK_SIZE):
+                yield chunk
+
+            # pad the member data to full blocks
+            blocks, remainder = divmod(info.size, tarfile.BLOCKSIZE)
+            if remainder:
+                yield b"\0" * (tarfile.BLOCKSIZE - remainder)
+                blocks += 1
+            written += blocks * tarfile.BLOCKSIZE
+
+        # end of archive marker, padded to full records
+        end = 2 * tarfile.BLOCKSIZE
+        remainder = (written + end) % tarfile.RECORDSIZE
+        if remainder:
+            end += tarfile.RECORDSIZE - remainder
+        yield b"\0" * end
+
+    def get_mime_type(self, format, params):
         return "application/x-compressed-tar"
 
-    def get_file_extension(self, package, format, params):#
+    def get_file_extension(self, format, params):
+        format = format.lower()
         if format in gzip_mimes:
             return ".tar.gz"
 
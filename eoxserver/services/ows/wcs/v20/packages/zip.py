@@ -26,34 +26,38 @@
 #-------------------------------------------------------------------------------
 
 
-import zipfile
+import zipstream
 
-from eoxserver.core import Component, implements
-from eoxserver.services.ows.wcs.interfaces import (
-    PackageWriterInterface
-)
+from eoxserver.services.result import RESULT_CHUNK_SIZE
 
 
-class ZipPackageWriter(Component):
-    implements(PackageWriterInterface)
+class ZipPackageWriter(object):
+    """ Package writer for ZIP files. The package is streamed: each member is
+        emitted as soon as it is added.
+    """
 
     def supports(self, format, params):
         return format.lower() == "application/zip"
 
-    def create_package(self, filename, format, params):
-        compression = zipfile.ZIP_STORED
+    def iter_package(self, items, format, params):
+        compression = zipstream.ZIP_STORED
         if params.get("compression", "").upper() == "DEFLATED":
-            compression = zipfile.ZIP_DEFLATED
-        return zipfile.ZipFile(filename, "a", compression)
+            compression = zipstream.ZIP_DEFLATED
 
-    def cleanup(self, package):
-        package.close()
+        package = zipstream.ZipFile(
+            mode="w", compression=compression, allowZip64=True
+        )
+        for location, item in items:
+            package.write_iter(location, item.chunked(RESULT_CHUNK_SIZE))
+            for data in package.flush():
+                yield data
 
-    def add_to_package(self, package, file_obj, size, location):
-        package.writestr(location, file_obj.read())
+        # the central directory
+        for data in package:
+            yield data
 
-    def get_mime_type(self, package, format, params):
+    def get_mime_type(self, format, params):
         return "application/zip"
 
-    def get_file_extension(self, package, format, params):
+    def get_file_extension(self, format, params):
         return ".zip"
@@ -34,7 +34,9 @@ from django.utils.six import string_types
 
 from eoxserver.core.util.xmltools import NameSpace, NameSpaceMap, ns_xsi
 from eoxserver.core.util.timetools import parse_iso8601
-from eoxserver.services.subset import Trim, Slice, is_temporal, all_axes
+from eoxserver.services.subset import (
+    Trim, Slice, is_temporal, all_axes, x_axes, y_axes
+)
 from eoxserver.services.gml.v32.encoders import (
     ns_gml, ns_gmlcov, ns_om, ns_eop, GML, GMLCOV, OM, EOP
 )
@@ -148,6 +150,33 @@ class ScaleExtent(Scale):
         self.high = high
 
 
+def get_scaled_size(size_x, size_y, scalefactor=None, scales=None):
+    """ Applies the scalefactor and the scale axes, sizes or extents to the
+        given size and returns the resulting size in pixels.
+    """
+    if scalefactor is not None:
+        size_x = size_x / float(scalefactor)
+        size_y = size_y / float(scalefactor)
+
+    for scale in scales or ():
+        if isinstance(scale, ScaleSize):
+            value = scale.size
+        elif isinstance(scale, ScaleExtent):
+            value = scale.high - scale.low
+        elif isinstance(scale, ScaleAxis):
+            size = size_x if scale.axis in x_axes else size_y
+            value = size / float(scale.scale)
+        else:
+            continue
+
+        if scale.axis in x_axes:
+            size_x = value
+        elif scale.axis in y_axes:
+            size_y = value
+
+    return max(int(round(size_x)), 1), max(int(round(size_y)), 1)
+
+
 class SectionsMixIn(object):
     """ Mix-in for request decoders that use sections.
     """
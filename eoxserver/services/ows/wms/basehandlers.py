@@ -33,18 +33,22 @@ default methods can be overidden.
 """
 import math
 import re
+import hashlib
 
 from django.conf import settings
 from django.db.models import Q
+from django.contrib.gis.geos import Polygon
 from django.urls import reverse
 from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
 
-from eoxserver.core.decoders import kvp, typelist, InvalidParameterException
-from eoxserver.core.config import get_eoxserver_config
-from eoxserver.render.map.renderer import (
-    get_map_renderer, # get_feature_info_renderer
+from eoxserver.core.decoders import (
+    kvp, typelist, enum, InvalidParameterException
 )
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.render.map.renderer import get_map_renderer
 from eoxserver.render.map.objects import Map
+from eoxserver.render.map.cache import get_map_cache
 from eoxserver.resources.coverages import crss
 from eoxserver.resources.coverages import models
 from eoxserver.services.ows.wms.util import parse_bbox, parse_time, int_or_str
@@ -53,9 +57,20 @@ from eoxserver.services.ows.wms.exceptions import InvalidCRS
 from eoxserver.services.ecql import parse, to_filter, get_field_mapping_for_model
 from eoxserver.services import filters
 from eoxserver.services.ows.wms.layermapper import LayerMapper
+from eoxserver.services.ows.wms.capabilitiescache import (
+    get_capabilities_cache, get_config_digest
+)
+from eoxserver.services.singleflight import single_flight
+from eoxserver.services.ows.wms.featureinfo import (
+    FEATURE_INFO_FORMATS, encode_feature_info
+)
 from eoxserver.services import views
 
 
+# meters per degree on the WGS84 equator
+METERS_PER_DEGREE = 6378137 * 2 * math.pi / 360
+
+
 class WMSBaseGetCapabilitiesHandler(object):
     """ Base for WMS capabilities handlers.
     """
@@ -70,6 +85,32 @@ class WMSBaseGetCapabilitiesHandler(object):
 
     def handle(self, request):
         decoder = self.get_decoder(request)
+        ows_url = request.build_absolute_uri(reverse(views.ows))
+
+        config = get_eoxserver_config()
+        map_renderer = get_map_renderer()
+        supported_crss = crss.getSupportedCRS_WMS(
+            format_function=crss.asShortCode
+        )
+        supported_formats = map_renderer.get_supported_formats()
+
+        # look up the serialized document before any object is looked up
+        capabilities_cache = get_capabilities_cache()
+        document_key = None
+        if capabilities_cache:
+            document_key = capabilities_cache.get_document_key({
+                'version': self.versions[0],
+                'url': ows_url,
+                'cql': decoder.cql,
+                'debug': settings.DEBUG,
+                'config': get_config_digest(config),
+                'crss': supported_crss,
+                'formats': supported_formats,
+            })
+            cached = capabilities_cache.get_document(document_key)
+            if cached:
+                return make_capabilities_response(request, *cached)
+
         qs = models.EOObject.objects.all()
 
         cql_text = decoder.cql
@@ -102,31 +143,46 @@ class WMSBaseGetCapabilitiesHandler(object):
         qs = qs.select_subclasses()
 
         #
-        map_renderer = get_map_renderer()
-        raster_styles = map_renderer.get_raster_styles()
-        geometry_styles = map_renderer.get_geometry_styles()
+        raster_styles = list(map_renderer.get_raster_styles())
+        geometry_styles = list(map_renderer.get_geometry_styles())
 
         layer_mapper = LayerMapper(
             map_renderer.get_supported_layer_types(), "__"
         )
-        layer_descriptions = [
-            layer_mapper.get_layer_description(
+
+        def get_layer_description(eo_object):
+            return layer_mapper.get_layer_description(
                 eo_object, raster_styles, geometry_styles
             )
-            for eo_object in qs
-        ]
+
+        if capabilities_cache:
+            layer_descriptions = capabilities_cache.get_layer_descriptions(
+                qs, get_layer_description, [raster_styles, geometry_styles]
+            )
+        else:
+            layer_descriptions = [
+                get_layer_description(eo_object) for eo_object in qs
+            ]
 
         encoder = self.get_encoder()
-        conf = CapabilitiesConfigReader(get_eoxserver_config())
-        return encoder.serialize(
+        conf = CapabilitiesConfigReader(config)
+        content = encoder.serialize(
             encoder.encode_capabilities(
-                conf, request.build_absolute_uri(reverse(views.ows)),
-                crss.getSupportedCRS_WMS(format_function=crss.asShortCode),
-                map_renderer.get_supported_formats(), [],
-                layer_descriptions
+                conf, ows_url, supported_crss, supported_formats,
+                sorted(FEATURE_INFO_FORMATS), layer_descriptions
             ),
             pretty_print=settings.DEBUG
-        ), encoder.content_type
+        )
+        etag = get_etag(content)
+
+        if document_key:
+            capabilities_cache.set_document(
+                document_key, content, encoder.content_type, etag
+            )
+
+        return make_capabilities_response(
+            request, content, encoder.content_type, etag
+        )
 
 
 class WMSBaseGetMapHandler(object):
@@ -137,97 +193,144 @@ class WMSBaseGetMapHandler(object):
     def handle(self, request):
         decoder = self.get_decoder(request)
 
-        minx, miny, maxx, maxy = decoder.bbox
-        time = decoder.time
-        crs = decoder.srs
         layer_names = decoder.layers
-
-        width = decoder.width
-        height = decoder.height
-
-        # calculate the zoomlevel
-        zoom = calculate_zoom((minx, miny, maxx, maxy), width, height, crs)
-
         if not layer_names:
             raise InvalidParameterException("No layers specified", "layers")
 
-        srid = crss.parseEPSGCode(
-            crs, (crss.fromShortCode, crss.fromURN, crss.fromURL)
-        )
-        if srid is None:
-            raise InvalidCRS(crs, "crs")
-
-        field_mapping, mapping_choices = get_field_mapping_for_model(
-            models.Product
-        )
+        styles = decoder.styles
+        if styles:
+            styles = styles.split(',')
 
-        filter_expressions = filters.bbox(
-            filters.attribute('footprint', field_mapping),
-            minx, miny, maxx, maxy, crs, bboverlaps=False
+        # look up the rendered map in the cache, before any layer is looked
+        # up or rendered
+        map_cache = get_map_cache()
+        cache_key = None
+        if map_cache:
+            layer_mapper = LayerMapper(None, "__")
+            cache_key = map_cache.get_key(
+                get_normalized_map_request(decoder), [
+                    layer_mapper.split_layer_suffix_name(layer_name)[0]
+                    for layer_name in layer_names
+                ]
+            )
+            cached = map_cache.get(cache_key)
+            if cached:
+                return make_map_response(*cached)
+
+        def render():
+            result = render_layers(
+                layer_names, styles, decoder.bbox, decoder.srs,
+                decoder.width, decoder.height, decoder.format,
+                time=decoder.time, elevation=decoder.elevation,
+                ranges=decoder.dim_range, bands=decoder.dim_bands,
+                wavelengths=decoder.dim_wavelengths,
+                cql=getattr(decoder, 'cql', None),
+                sort_by=getattr(decoder, 'sort_by', None),
+                dedup=getattr(decoder, 'dedup', None),
+                bgcolor=decoder.bgcolor, transparent=decoder.transparent,
+            )
+            # only the rendering call stores the map, not the coalesced ones
+            if cache_key:
+                map_cache.set(cache_key, result)
+            return result
+
+        # identical concurrent requests share a single rendering
+        result_bytes, content_type, filename = single_flight(
+            ['GetMap', cache_key or get_normalized_map_request(decoder)],
+            render
         )
 
-        if time:
-            filter_expressions &= filters.time_interval(time)
+        return make_map_response(result_bytes, content_type, filename)
 
-        cql = getattr(decoder, 'cql', None)
-        if cql:
-            cql_filters = to_filter(
-                parse(cql), field_mapping, mapping_choices
-            )
-            filter_expressions &= cql_filters
 
-        # TODO: multiple sorts per layer?
-        sort_by = getattr(decoder, 'sort_by', None)
-        if sort_by:
-            sort_by = (field_mapping.get(sort_by[0], sort_by[0]), sort_by[1])
+def render_layers(layer_names, styles, bbox, crs, width, height, format,
+                  time=None, elevation=None, ranges=None, bands=None,
+                  wavelengths=None, cql=None, sort_by=None, dedup=None,
+                  bgcolor=None, transparent=True, zoom=None):
+    """ Look up the given layers within the bbox and render them with the
+        configured map renderer. Returns the rendered bytes, the content type
+        and the filename. The ``zoom`` level is calculated from the bbox,
+        unless it is already known, as for tiles.
+    """
+    minx, miny, maxx, maxy = bbox
 
-        styles = decoder.styles
+    # calculate the zoomlevel
+    if zoom is None:
+        zoom = calculate_zoom((minx, miny, maxx, maxy), width, height, crs)
 
-        if styles:
-            styles = styles.split(',')
-        else:
-            styles = [None] * len(layer_names)
+    srid = crss.parseEPSGCode(
+        crs, (crss.fromShortCode, crss.fromURN, crss.fromURL)
+    )
+    if srid is None:
+        raise InvalidCRS(crs, "crs")
 
-        dimensions = {
-            "time": time,
-            "elevation": decoder.elevation,
-            "ranges": decoder.dim_range,
-            "bands": decoder.dim_bands,
-            "wavelengths": decoder.dim_wavelengths,
-        }
+    resolution = calculate_resolution((minx, miny, maxx, maxy), width, srid)
 
-        map_renderer = get_map_renderer()
+    field_mapping, mapping_choices = get_field_mapping_for_model(
+        models.Product
+    )
 
-        layer_mapper = LayerMapper(
-            map_renderer.get_supported_layer_types(), "__"
-        )
+    filter_expressions = filters.bbox(
+        filters.attribute('footprint', field_mapping),
+        minx, miny, maxx, maxy, crs, bboverlaps=False
+    )
 
-        layers = []
-        for layer_name, style in zip(layer_names, styles):
-            name, suffix = layer_mapper.split_layer_suffix_name(layer_name)
-            layer = layer_mapper.lookup_layer(
-                name, suffix, style,
-                filter_expressions, sort_by, zoom=zoom, **dimensions
-            )
-            layers.append(layer)
+    if time:
+        filter_expressions &= filters.time_interval(time)
 
-        map_ = Map(
-            width=decoder.width, height=decoder.height, format=decoder.format,
-            bbox=(minx, miny, maxx, maxy), crs=crs,
-            bgcolor=decoder.bgcolor, transparent=decoder.transparent,
-            layers=layers
+    if cql:
+        cql_filters = to_filter(
+            parse(cql), field_mapping, mapping_choices
         )
+        filter_expressions &= cql_filters
+
+    # TODO: multiple sorts per layer?
+    if sort_by:
+        sort_by = (field_mapping.get(sort_by[0], sort_by[0]), sort_by[1])
+
+    if not styles:
+        styles = [None] * len(layer_names)
+
+    dimensions = {
+        "time": time,
+        "elevation": elevation,
+        "ranges": ranges,
+        "bands": bands,
+        "wavelengths": wavelengths,
+    }
+
+    map_renderer = get_map_renderer()
+
+    layer_mapper = LayerMapper(
+        map_renderer.get_supported_layer_types(), "__"
+    )
+
+    layers = []
+    for layer_name, style in zip(layer_names, styles):
+        name, suffix = layer_mapper.split_layer_suffix_name(layer_name)
+        layer = layer_mapper.lookup_layer(
+            name, suffix, style,
+            filter_expressions, sort_by, zoom=zoom,
+            bbox=(minx, miny, maxx, maxy), crs=crs, dedup=dedup,
+            resolution=resolution, **dimensions
+        )
+        layers.append(layer)
 
-        result_bytes, content_type, filename = map_renderer.render_map(map_)
-
-        response = HttpResponse(result_bytes, content_type=content_type)
-        if filename:
-            response['Content-Disposition'] = 'inline; filename="%s"' % filename
+    map_ = Map(
+        width=width, height=height, format=format,
+        bbox=(minx, miny, maxx, maxy), crs=crs,
+        bgcolor=bgcolor, transparent=transparent,
+        layers=layers
+    )
 
-        return response
+    return map_renderer.render_map(map_)
 
 
 class WMSBaseGetFeatureInfoHandler(object):
+    """ Base for WMS feature info handlers. The objects under the queried
+        pixel are looked up with a single database query per layer and
+        encoded directly, without rendering a map.
+    """
     methods = ['GET']
     service = "WMS"
     request = "GetFeatureInfo"
@@ -236,20 +339,15 @@ class WMSBaseGetFeatureInfoHandler(object):
         decoder = self.get_decoder(request)
 
         minx, miny, maxx, maxy = decoder.bbox
-        x = decoder.x
-        y = decoder.y
-        time = decoder.time
         crs = decoder.srs
-        layer_names = decoder.layers
-
-        width = decoder.width
-        height = decoder.height
-
-        # calculate the zoomlevel
-        zoom = calculate_zoom((minx, miny, maxx, maxy), width, height, crs)
+        layer_names = decoder.query_layers
+        width = int(decoder.width)
+        height = int(decoder.height)
 
         if not layer_names:
-            raise InvalidParameterException("No layers specified", "layers")
+            raise InvalidParameterException(
+                "No layers specified", "query_layers"
+            )
 
         srid = crss.parseEPSGCode(
             crs, (crss.fromShortCode, crss.fromURN, crss.fromURL)
@@ -257,27 +355,26 @@ class WMSBaseGetFeatureInfoHandler(object):
         if srid is None:
             raise InvalidCRS(crs, "crs")
 
-        field_mapping, mapping_choices = get_field_mapping_for_model(
-            models.Product
-        )
-
-        # calculate resolution
+        # the extent of the queried pixel, rows are counted from the top
         # TODO: dateline
         resx = (maxx - minx) / width
         resy = (maxy - miny) / height
+        p_minx = minx + decoder.x * resx
+        p_maxx = p_minx + resx
+        p_maxy = maxy - decoder.y * resy
+        p_miny = p_maxy - resy
 
-        p_minx = x * resx
-        p_miny = y * resy
-        p_maxx = (x + 1) * resx
-        p_maxy = (y + 1) * resy
+        field_mapping, mapping_choices = get_field_mapping_for_model(
+            models.Product
+        )
 
         filter_expressions = filters.bbox(
             filters.attribute('footprint', field_mapping),
             p_minx, p_miny, p_maxx, p_maxy, crs, bboverlaps=False
         )
 
-        if time:
-            filter_expressions &= filters.time_interval(time)
+        if decoder.time:
+            filter_expressions &= filters.time_interval(decoder.time)
 
         cql = getattr(decoder, 'cql', None)
         if cql:
@@ -291,50 +388,30 @@ class WMSBaseGetFeatureInfoHandler(object):
         if sort_by:
             sort_by = (field_mapping.get(sort_by[0], sort_by[0]), sort_by[1])
 
-        styles = decoder.styles
-
-        if styles:
-            styles = styles.split(',')
-        else:
-            styles = [None] * len(layer_names)
+        # the queried pixel to exclude masked out products
+        pixel = Polygon.from_bbox((p_minx, p_miny, p_maxx, p_maxy))
+        pixel.srid = srid
+        if srid != 4326:
+            pixel.transform(4326)
 
-        dimensions = {
-            "time": time,
-            "elevation": decoder.elevation,
-            "ranges": decoder.dim_range,
-            "bands": decoder.dim_bands,
-            "wavelengths": decoder.dim_wavelengths,
-        }
-
-        feature_info_renderer = get_feature_info_renderer()
-
-        layer_mapper = LayerMapper(
-            feature_info_renderer.get_supported_layer_types(), "__"
-        )
+        layer_mapper = LayerMapper(None, "__")
 
-        layers = []
-        for layer_name, style in zip(layer_names, styles):
+        results = []
+        for layer_name in layer_names:
             name, suffix = layer_mapper.split_layer_suffix_name(layer_name)
-            layer = layer_mapper.lookup_layer(
-                name, suffix, style,
-                filter_expressions, sort_by, zoom=zoom, **dimensions
-            )
-            layers.append(layer)
-
-        map_ = Map(
-            width=decoder.width, height=decoder.height, format=decoder.format,
-            bbox=(minx, miny, maxx, maxy), crs=crs,
-            bgcolor=decoder.bgcolor, transparent=decoder.transparent,
-            layers=layers
+            results.append((
+                layer_name, list(layer_mapper.lookup_features(
+                    name, filter_expressions, sort_by,
+                    limit=decoder.feature_count,
+                    dedup=getattr(decoder, 'dedup', None),
+                    suffix=suffix, pixel=pixel
+                ))
+            ))
+
+        result_bytes, content_type = encode_feature_info(
+            decoder.info_format, results
         )
-
-        result_bytes, content_type, filename = feature_info_renderer.render_feature_info(map_)
-
-        response = HttpResponse(result_bytes, content_type=content_type)
-        if filename:
-            response['Content-Disposition'] = 'inline; filename="%s"' % filename
-
-        return response
+        return HttpResponse(result_bytes, content_type=content_type)
 
 
 class WMSBaseGetCapbilitiesDecoder(kvp.Decoder):
@@ -390,6 +467,97 @@ class WMSBaseGetMapDecoder(kvp.Decoder):
 
     sort_by = kvp.Parameter('sortBy', type=parse_sort_by, num="?")
 
+    dedup = kvp.Parameter(type=enum(('tile',)), num="?")
+
+
+class WMSBaseGetFeatureInfoDecoder(WMSBaseGetMapDecoder):
+    query_layers = kvp.Parameter(type=typelist(str, ","), num=1)
+    info_format = kvp.Parameter(num="?", default="text/html")
+    feature_count = kvp.Parameter(type=int, num="?", default=1)
+    x = kvp.Parameter(type=int, num=1)
+    y = kvp.Parameter(type=int, num=1)
+
+
+def get_etag(content):
+    """ Get the strong ETag of the given content.
+    """
+    return quote_etag(hashlib.sha1(content).hexdigest())
+
+
+def make_capabilities_response(request, content, content_type, etag):
+    """ Make the response for the capabilities document, or a ``304 Not
+        Modified`` response, when the client already has the document with the
+        same ETag.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if etag in etags or '*' in etags:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
+def make_map_response(result_bytes, content_type, filename):
+    response = HttpResponse(result_bytes, content_type=content_type)
+    if filename:
+        response['Content-Disposition'] = 'inline; filename="%s"' % filename
+    return response
+
+
+def get_normalized_map_request(decoder):
+    """ Get the parameters of a GetMap request relevant to the rendered map,
+        to be used as a cache key. The bbox is expressed in hundredths of a
+        pixel, so that requests only differing by rounding errors share their
+        key.
+    """
+    width = int(decoder.width)
+    height = int(decoder.height)
+    minx, miny, maxx, maxy = decoder.bbox
+    res_x = (maxx - minx) / width
+    res_y = (maxy - miny) / height
+    bbox = [
+        int(round(value / res * 100)) if res else value
+        for value, res in zip(
+            (minx, miny, maxx, maxy), (res_x, res_y, res_x, res_y)
+        )
+    ]
+
+    return {
+        'layers': decoder.layers,
+        'styles': decoder.styles,
+        'bbox': bbox,
+        'resolution': ['%.12g' % res_x, '%.12g' % res_y],
+        'crs': decoder.srs,
+        'size': [width, height],
+        'format': decoder.format,
+        'bgcolor': decoder.bgcolor,
+        'transparent': decoder.transparent,
+        'time': decoder.time,
+        'elevation': decoder.elevation,
+        'dim_bands': decoder.dim_bands,
+        'dim_wavelengths': decoder.dim_wavelengths,
+        'dim_range': decoder.dim_range,
+        'cql': getattr(decoder, 'cql', None),
+        'sort_by': getattr(decoder, 'sort_by', None),
+        'dedup': getattr(decoder, 'dedup', None),
+    }
+
+
+def calculate_resolution(bbox, width, srid):
+    """ Calculate the horizontal size of a pixel in degrees, the unit of the
+        stored footprints. For projected CRSs, meters on the equator are
+        assumed.
+    """
+    resolution = (bbox[2] - bbox[0]) / float(width)
+    if crss.isProjected(srid):
+        resolution /= METERS_PER_DEGREE
+    return resolution
+
 
 def calculate_zoom(bbox, width, height, crs):
     # TODO: make this work for other CRSs
@@ -0,0 +1,247 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+
+""" Caching of WMS capabilities documents.
+
+    Two kinds of entries are stored: the ``LayerDescription`` of every
+    object, keyed by its primary key and modification time, and the
+    serialized documents, keyed by the request parameters. Both keys also
+    contain a generation token, which is renewed when objects, their
+    visibility or the types they refer to are changed, so that outdated entries
+    become unreachable. When a document needs to be re-generated, only the
+    descriptions of the objects changed since are computed again. The
+    document keys additionally contain the configuration the documents embed
+    (the service metadata, CRSs and formats), so that configuration changes
+    take effect on restart.
+
+    The cache uses one of the configured Django ``CACHES``, which should be a
+    persistent one shared by all processes, and is enabled via the
+    ``EOXS_CAPABILITIES_CACHE`` setting::
+
+        EOXS_CAPABILITIES_CACHE = {
+            'alias': 'default',
+            'timeout': None,
+        }
+"""
+
+import json
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EOXS_CAPABILITIES_CACHE = None
+
+
+class CapabilitiesCache(object):
+    """ Cache for capabilities documents and the layer descriptions they are
+        built from, stored in the Django cache with the given ``alias``.
+    """
+
+    def __init__(self, alias='default', timeout=None,
+                 key_prefix='eoxs_capabilities'):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _get_generation_key(self, name):
+        return '%s_generation:%s' % (self.key_prefix, name)
+
+    def get_generation(self, name):
+        """ Get the current generation token of either the ``documents`` or
+            the ``types``.
+        """
+        return self.cache.get(self._get_generation_key(name), '0')
+
+    def invalidate(self, name):
+        """ Renew the generation token of either the ``documents`` or the
+            ``types``.
+        """
+        # generations must never expire, otherwise stale entries would
+        # become reachable again
+        self.cache.set(self._get_generation_key(name), uuid4().hex, None)
+
+    def get_document_key(self, request_params):
+        """ Compute the key of the document for the given request parameters.
+            The key must be computed before the objects are looked up, so that
+            documents generated concurrently to a change are not stored under
+            the new generation.
+        """
+        serialized = json.dumps(
+            [request_params, self.get_generation('documents')],
+            sort_keys=True, default=str
+        )
+        return '%s:document:%s' % (
+            self.key_prefix,
+            hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+        )
+
+    def get_document(self, key):
+        """ Get the cached document as a tuple of content, content type and
+            ETag or ``None``.
+        """
+        return self.cache.get(key)
+
+    def set_document(self, key, content, content_type, etag):
+        self.cache.set(key, (content, content_type, etag), self.timeout)
+
+    def get_layer_descriptions(self, eo_objects, get_layer_description,
+                               context):
+        """ Get the layer descriptions of the given objects, in the same order.
+            Only the descriptions that are not yet cached are computed via the
+            ``get_layer_description`` function. The ``context`` must
+            contain everything else the descriptions depend on, e.g: the
+            available styles.
+        """
+        eo_objects = list(eo_objects)
+        prefix = '%s:layer:%s:%s' % (
+            self.key_prefix, self.get_generation('types'),
+            hashlib.sha1(
+                json.dumps(context, sort_keys=True, default=str)
+                .encode('utf-8')
+            ).hexdigest()
+        )
+        keys = [
+            '%s:%d:%s' % (
+                prefix, eo_object.pk,
+                eo_object.updated.isoformat() if eo_object.updated else ''
+            )
+            for eo_object in eo_objects
+        ]
+
+        cached = self.cache.get_many(keys)
+        missing = {}
+        layer_descriptions = []
+        for key, eo_object in zip(keys, eo_objects):
+            layer_description = cached.get(key)
+            if layer_description is None:
+                layer_description = get_layer_description(eo_object)
+                missing[key] = layer_description
+            layer_descriptions.append(layer_description)
+
+        if missing:
+            logger.debug(
+                'Computed %d of %d layer descriptions'
+                % (len(missing), len(keys))
+            )
+            self.cache.set_many(missing, self.timeout)
+
+        return layer_descriptions
+
+
+def get_config_digest(config):
+    """ Compute a digest of all options of the given ``RawConfigParser``.
+    """
+    serialized = json.dumps([
+        [section, sorted(config.items(section))]
+        for section in sorted(config.sections())
+    ])
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+CAPABILITIES_CACHE = None
+CAPABILITIES_CACHE_CONFIGURED = False
+
+
+def get_capabilities_cache():
+    """ Get the configured capabilities cache or ``None`` if caching of
+        capabilities is disabled.
+    """
+    global CAPABILITIES_CACHE, CAPABILITIES_CACHE_CONFIGURED
+    if not CAPABILITIES_CACHE_CONFIGURED:
+        cache_config = getattr(
+            settings, 'EOXS_CAPABILITIES_CACHE',
+            DEFAULT_EOXS_CAPABILITIES_CACHE
+        )
+        if cache_config is not None:
+            CAPABILITIES_CACHE = CapabilitiesCache(**cache_config)
+        CAPABILITIES_CACHE_CONFIGURED = True
+
+    return CAPABILITIES_CACHE
+
+
+# ------------------------------------------------------------------------------
+# Invalidation
+# ------------------------------------------------------------------------------
+
+
+@receiver(post_save, sender='coverages.Collection')
+@receiver(post_save, sender='coverages.Product')
+@receiver(post_save, sender='coverages.Coverage')
+@receiver(post_save, sender='coverages.Mosaic')
+@receiver(post_delete, sender='coverages.Collection')
+@receiver(post_delete, sender='coverages.Product')
+@receiver(post_delete, sender='coverages.Coverage')
+@receiver(post_delete, sender='coverages.Mosaic')
+@receiver(post_save, sender='services.ServiceVisibility')
+@receiver(post_delete, sender='services.ServiceVisibility')
+def _on_object_changed(sender, **kwargs):
+    """ Invalidate the cached documents when objects or their visibility are
+        changed. The descriptions of changed objects are outdated by their
+        modification time.
+    """
+    capabilities_cache = get_capabilities_cache()
+    if capabilities_cache is not None:
+        capabilities_cache.invalidate('documents')
+
+
+@receiver(post_save, sender='coverages.CollectionType')
+@receiver(post_save, sender='coverages.ProductType')
+@receiver(post_save, sender='coverages.CoverageType')
+@receiver(post_save, sender='coverages.BrowseType')
+@receiver(post_save, sender='coverages.MaskType')
+@receiver(post_save, sender='coverages.FieldType')
+@receiver(post_save, sender='coverages.Grid')
+@receiver(post_delete, sender='coverages.CollectionType')
+@receiver(post_delete, sender='coverages.ProductType')
+@receiver(post_delete, sender='coverages.CoverageType')
+@receiver(post_delete, sender='coverages.BrowseType')
+@receiver(post_delete, sender='coverages.MaskType')
+@receiver(post_delete, sender='coverages.FieldType')
+@receiver(post_delete, sender='coverages.Grid')
+@receiver(m2m_changed, sender='coverages.CollectionType_allowed_product_types')
+def _on_type_changed(sender, **kwargs):
+    """ Invalidate all cached descriptions and documents when the types the
+        descriptions are derived from are changed.
+    """
+    capabilities_cache = get_capabilities_cache()
+    if capabilities_cache is not None:
+        capabilities_cache.invalidate('types')
+        capabilities_cache.invalidate('documents')
@@ -0,0 +1,149 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Encoding of GetFeatureInfo results directly from the queried objects,
+    without rendering a map.
+"""
+
+import json
+
+from django.template.loader import render_to_string
+from lxml.builder import ElementMaker
+
+from eoxserver.core.util.timetools import isoformat
+from eoxserver.core.util.xmltools import XMLEncoder, NameSpace, NameSpaceMap
+from eoxserver.services.gml.v32.encoders import (
+    EOP20Encoder, ns_gml, ns_om, ns_eop
+)
+from eoxserver.services.ows.wms.exceptions import InvalidFormat
+
+
+ns_wfs = NameSpace(
+    "http://www.opengis.net/wfs/2.0", "wfs",
+    "http://schemas.opengis.net/wfs/2.0/wfs.xsd"
+)
+nsmap = NameSpaceMap(ns_wfs, ns_gml, ns_om, ns_eop)
+WFS = ElementMaker(namespace=ns_wfs.uri, nsmap=nsmap)
+
+# the supported INFO_FORMATs with the encoding they are mapped to
+FEATURE_INFO_FORMATS = {
+    'text/html': 'html',
+    'application/json': 'json',
+    'application/geo+json': 'json',
+    'application/vnd.ogc.gml': 'xml',
+    'application/xml': 'xml',
+    'text/xml': 'xml',
+}
+
+
+def encode_feature_info(info_format, results):
+    """ Encode the objects found per layer in the requested format.
+
+        :param info_format: the requested INFO_FORMAT
+        :param results: a list of tuples of the layer names and the lists of
+                        the found objects
+        :returns: a tuple of the encoded bytes and the content type
+    """
+    encoding = FEATURE_INFO_FORMATS.get(info_format)
+    if encoding == 'html':
+        return render_to_string('wms/feature_info.html', {
+            'layers': [
+                {'name': layer_name, 'objects': eo_objects}
+                for layer_name, eo_objects in results
+            ]
+        }).encode('utf-8'), info_format
+    elif encoding == 'json':
+        return encode_json(results), info_format
+    elif encoding == 'xml':
+        encoder = FeatureInfoXMLEncoder()
+        return encoder.serialize(
+            encoder.encode_feature_collection(results)
+        ), encoder.content_type
+
+    raise InvalidFormat(info_format)
+
+
+def encode_json(results):
+    features = []
+    for layer_name, eo_objects in results:
+        for eo_object in eo_objects:
+            features.append({
+                'type': 'Feature',
+                'id': eo_object.identifier,
+                'geometry': (
+                    json.loads(eo_object.footprint.json)
+                    if eo_object.footprint else None
+                ),
+                'properties': {
+                    'layer': layer_name,
+                    'identifier': eo_object.identifier,
+                    'begin_time': (
+                        isoformat(eo_object.begin_time)
+                        if eo_object.begin_time else None
+                    ),
+                    'end_time': (
+                        isoformat(eo_object.end_time)
+                        if eo_object.end_time else None
+                    ),
+                },
+            })
+
+    return json.dumps({
+        'type': 'FeatureCollection',
+        'features': features,
+    }).encode('utf-8')
+
+
+class FeatureInfoXMLEncoder(EOP20Encoder, XMLEncoder):
+    """ Encodes the found objects as EO O&M observations in a WFS 2.0
+        feature collection.
+    """
+
+    def encode_feature_collection(self, results):
+        members = [
+            WFS("member",
+                self.encode_earth_observation(
+                    eo_object.identifier, eo_object.begin_time,
+                    eo_object.end_time, eo_object.footprint
+                )
+            )
+            for _, eo_objects in results
+            for eo_object in eo_objects
+        ]
+        return WFS("FeatureCollection",
+            *members,
+            numberMatched=str(len(members)),
+            numberReturned=str(len(members))
+        )
+
+    def get_schema_locations(self):
+        return nsmap.schema_locations
+
+    @property
+    def content_type(self):
+        return "application/xml"
@@ -25,23 +25,32 @@
 # THE SOFTWARE.
 # ------------------------------------------------------------------------------
 
-from django.db.models import Case, Value, When, IntegerField, BooleanField
+import math
+
+from django.db import connections
+from django.db.models import (
+    Case, Value, When, BooleanField, Prefetch, Q, Exists, OuterRef, Count
+)
+from django.db.models.functions import Coalesce
+from django.contrib.gis.db.models.functions import Centroid, SnapToGrid
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import Polygon, GEOSException
 
 from eoxserver.core.config import get_eoxserver_config
-from eoxserver.core.decoders import config, enum
+from eoxserver.core.decoders import config, enum, typelist, strip
 from eoxserver.core.util.timetools import isoformat
 from eoxserver.render.map.objects import (
     CoverageLayer, CoveragesLayer, OutlinedCoveragesLayer, MosaicLayer,
     OutlinesLayer, BrowseLayer, OutlinedBrowseLayer,
-    MaskLayer, MaskedBrowseLayer,
+    MaskLayer, MaskedBrowseLayer, DensityLayer,
     LayerDescription,
 )
 from eoxserver.render.coverage.objects import Coverage as RenderCoverage
 from eoxserver.render.coverage.objects import Mosaic as RenderMosaic
 from eoxserver.render.browse.objects import (
-    Browse, GeneratedBrowse, Mask, MaskedBrowse
+    Browse, GeneratedBrowse, Mask, MaskedBrowse, BROWSE_MODE_RGBA
 )
-from eoxserver.resources.coverages import models
+from eoxserver.resources.coverages import crss, models
 
 
 class UnsupportedObject(Exception):
@@ -113,8 +122,18 @@ class LayerMapper(object):
                     ),
                     styles=geometry_styles,
                     queryable=True
-                )
+                ),
             ]
+            # the density of the products is only meaningful for collections
+            if isinstance(eo_object, models.Collection):
+                sub_layers.append(
+                    LayerDescription(
+                        "%s%sdensity" % (
+                            eo_object.identifier, self.suffix_separator
+                        ),
+                        styles=raster_styles
+                    )
+                )
             for name, is_gray in browse_types_name_and_is_gray:
                 sub_layers.append(
                     LayerDescription(
@@ -168,13 +187,29 @@ class LayerMapper(object):
 
     def lookup_layer(self, layer_name, suffix, style, filters_expressions,
                      sort_by, time, ranges, bands, wavelengths, elevation,
-                     zoom):
+                     zoom, bbox=None, crs=None, dedup=None,
+                     resolution=None):
         """ Lookup the layer from the registered objects.
+
+            When ``bbox`` and ``crs`` are passed and occlusion culling is
+            enabled, browses hidden by the browses rendered above them are
+            dropped from browse layers.
+
+            With ``dedup='tile'`` only the most recent product per tile (as
+            configured by ``dedup_tile_fields``) is rendered.
+
+            Outline layers use the simplified footprints matching the
+            ``resolution`` (in degrees per pixel), when passed. The
+            resolution and the bbox are required for density layers.
         """
         reader = LayerMapperConfigReader(get_eoxserver_config())
         limit_products = (
             reader.limit_products if reader.limit_mode == 'hide' else None
         )
+        dedup_fields = reader.dedup_tile_fields if dedup == 'tile' else None
+        cull_bbox = None
+        if reader.occlusion_culling and bbox is not None:
+            cull_bbox = _get_bbox_polygon(bbox, crs)
         min_render_zoom = reader.min_render_zoom
         full_name = '%s%s%s' % (layer_name, self.suffix_separator, suffix)
 
@@ -199,7 +234,9 @@ class LayerMapper(object):
             elif suffix == 'outlines':
                 return OutlinesLayer(
                     name=full_name, style=style, fill=None,
-                    footprints=[eo_object.footprint]
+                    footprints=[
+                        eo_object.get_simplified_footprint(resolution)
+                    ]
                 )
 
             # TODO: masked coverages, when using the coverages product
@@ -212,12 +249,11 @@ class LayerMapper(object):
             if suffix == 'outlines':
                 return OutlinesLayer(
                     name=full_name, style=style, fill=None,
-                    footprints=[
-                        coverage.footprint
-                        for coverage in self.iter_coverages(
+                    footprints=_get_outline_footprints(
+                        self.iter_coverages(
                             eo_object, filters_expressions, sort_by
-                        )
-                    ]
+                        ), resolution
+                    )
                 )
             else:
                 return MosaicLayer(
@@ -233,41 +269,28 @@ class LayerMapper(object):
         elif isinstance(eo_object, (models.Collection, models.Product)):
             if suffix == '' or suffix == 'outlined' or suffix == 'bands':
                 browses = []
-                product_browses = self.iter_products_browses(
+                product_browses = list(self.iter_products_browses(
                     eo_object, filters_expressions, sort_by, None, style,
-                    limit=limit_products
+                    limit=limit_products, dedup_fields=dedup_fields
+                ))
+                generated_browses = _generate_missing_browses(
+                    product_browses, bands, wavelengths, ranges
                 )
 
                 has_products = False
                 for product, browse, _ in product_browses:
-                    # When bands/wavelengths are specifically requested, make a
-                    # generated browse
-                    if bands or wavelengths:
-                        browse = _generate_browse_from_bands(
-                            product, bands, wavelengths, ranges
-                        )
-                        if browse:
-                            browses.append(browse)
-                            has_products = True
-
-                    # When available use the default browse
-                    elif browse:
+                    # When available and no bands/wavelengths are specifically
+                    # requested, use the default browse
+                    if browse and not (bands or wavelengths):
                         browses.append(Browse.from_model(product, browse))
                         has_products = True
 
-                    # As fallback use the default browse type (with empty name)
-                    # to generate a browse from the specified bands
-                    else:
-                        browse_type = product.product_type.browse_types.filter(
-                            name=''
-                        ).first()
-                        if browse_type:
-                            browse = _generate_browse_from_browse_type(
-                                product, browse_type
-                            )
-                            if browse:
-                                browses.append(browse)
-                                has_products = True
+                    # Otherwise use the generated browse: either from the
+                    # requested bands or from the default browse type (with
+                    # empty name)
+                    elif product.pk in generated_browses:
+                        browses.append(generated_browses[product.pk])
+                        has_products = True
 
                 if not has_products:
                     coverages = self.iter_coverages(
@@ -295,6 +318,11 @@ class LayerMapper(object):
                 if min_render_zoom is None or zoom >= min_render_zoom:
                     # either return the simple browse layer or the outlined one
                     if suffix == '':
+                        if cull_bbox is not None:
+                            browses = _cull_occluded(
+                                browses, cull_bbox, _get_browse_footprint,
+                                _get_browse_opaque_footprint
+                            )
                         return BrowseLayer(
                             name=full_name, style=style,
                             browses=browses, ranges=ranges
@@ -305,28 +333,46 @@ class LayerMapper(object):
                             browses=browses, ranges=ranges
                         )
 
+                # render the density when we are below the zoom limit
+                elif reader.min_render_zoom_mode == 'density' and \
+                        bbox is not None and resolution:
+                    return self.make_density_layer(
+                        full_name, None, eo_object, filters_expressions,
+                        bbox, crs, resolution, ranges, dedup_fields
+                    )
+
                 # render outlines when we are below the zoom limit
                 else:
                     return OutlinesLayer(
                         name=full_name, style=reader.color,
                         fill=reader.fill_opacity,
-                        footprints=[
-                            product.footprint for product in self.iter_products(
+                        footprints=_get_outline_footprints(
+                            self.iter_products(
                                 eo_object, filters_expressions, sort_by,
-                                limit=limit_products
-                            )
-                        ]
+                                limit=limit_products, dedup_fields=dedup_fields
+                            ), resolution
+                        )
                     )
 
             elif suffix == 'outlines':
                 return OutlinesLayer(
                     name=full_name, style=style, fill=None,
-                    footprints=[
-                        product.footprint for product in self.iter_products(
+                    footprints=_get_outline_footprints(
+                        self.iter_products(
                             eo_object, filters_expressions, sort_by,
-                            limit=limit_products
-                        )
-                    ]
+                            limit=limit_products, dedup_fields=dedup_fields
+                        ), resolution
+                    )
+                )
+
+            elif suffix == 'density':
+                if bbox is None or not resolution:
+                    raise NoSuchLayer(
+                        'Layer %r can only be rendered' % full_name
+                    )
+                return self.make_density_layer(
+                    full_name, style, eo_object, filters_expressions,
+                    bbox, crs, resolution, ranges, dedup_fields
                 )
 
             elif suffix.startswith('outlines_masked_'):
@@ -334,12 +380,14 @@ class LayerMapper(object):
 
                 product_browses_mask = self.iter_products_browses_masks(
                     eo_object, filters_expressions, sort_by, post_suffix,
-                    limit=limit_products
+                    limit=limit_products, dedup_fields=dedup_fields
                 )
                 footprints = []
                 masks = []
                 for product, browse, mask, mask_type in product_browses_mask:
-                    footprints.append(product.footprint)
+                    footprints.append(
+                        product.get_simplified_footprint(resolution)
+                    )
                     masks.append(Mask.from_model(mask, mask_type))
 
                 return OutlinesLayer(
@@ -357,46 +405,41 @@ class LayerMapper(object):
 
                 masked_browses = []
 
-                product_browses_mask = self.iter_products_browses_masks(
+                product_browses_mask = list(self.iter_products_browses_masks(
                     eo_object, filters_expressions, sort_by, post_suffix,
-                    limit=limit_products
+                    limit=limit_products, dedup_fields=dedup_fields
+                ))
+                generated_browses = _generate_missing_browses(
+                    product_browses_mask, bands, wavelengths, ranges
                 )
+
                 for product, browse, mask, mask_type in product_browses_mask:
-                    # When bands/wavelengths are specifically requested, make a
-                    # generated browse
-                    if bands or wavelengths:
+                    # When available and no bands/wavelengths are specifically
+                    # requested, use the default browse
+                    if browse and not (bands or wavelengths):
                         masked_browses.append(
-                            MaskedBrowse(
-                                browse=_generate_browse_from_bands(
-                                    product, bands, wavelengths, ranges
-                                ),
-                                mask=Mask.from_model(mask, mask_type)
+                            MaskedBrowse.from_models(
+                                product, browse, mask, mask_type
                             )
                         )
 
-                    # When available use the default browse
-                    elif browse:
+                    # Otherwise use the generated browse: either from the
+                    # requested bands or from the default browse type (with
+                    # empty name)
+                    elif product.pk in generated_browses:
                         masked_browses.append(
-                            MaskedBrowse.from_models(
-                                product, browse, mask, mask_type
+                            MaskedBrowse(
+                                browse=generated_browses[product.pk],
+                                mask=Mask.from_model(mask, mask_type)
                             )
                         )
 
-                    # As fallback use the default browse type (with empty name)
-                    # to generate a browse from the specified bands
-                    else:
-                        browse_type = product.product_type.browse_types.filter(
-                            name=''
-                        ).first()
-                        if browse_type:
-                            masked_browses.append(
-                                MaskedBrowse(
-                                    browse=_generate_browse_from_browse_type(
-                                        product, browse_type
-                                    ),
-                                    mask=Mask.from_model(mask, mask_type)
-                                )
-                            )
+                if cull_bbox is not None:
+                    masked_browses = _cull_occluded(
+                        masked_browses, cull_bbox,
+                        _get_masked_browse_footprint,
+                        _get_masked_browse_opaque_footprint
+                    )
 
                 return MaskedBrowseLayer(
                     name=full_name, style=style,
@@ -409,9 +452,18 @@ class LayerMapper(object):
                 if browse_type:
                     browses = []
 
-                    product_browses = self.iter_products_browses(
+                    product_browses = list(self.iter_products_browses(
                         eo_object, filters_expressions, sort_by, suffix,
-                        style, limit=limit_products
+                        style, limit=limit_products, dedup_fields=dedup_fields
+                    ))
+
+                    # if no browse is available for that browse type,
+                    # generate a new browse with the instructions of that
+                    # browse type
+                    generated_browses = _generate_browses_from_browse_types(
+                        (product, browse_type)
+                        for product, browse, browse_type in product_browses
+                        if not browse
                     )
 
                     for product, browse, browse_type in product_browses:
@@ -420,15 +472,14 @@ class LayerMapper(object):
                         if browse:
                             browses.append(Browse.from_model(product, browse))
 
-                        # if no browse is available for that browse type,
-                        # generate a new browse with the instructions of that
-                        # browse type
-                        else:
-                            browse = _generate_browse_from_browse_type(
-                                product, browse_type
-                            )
-                            if browse:
-                                browses.append(browse)
+                        elif product.pk in generated_browses:
+                            browses.append(generated_browses[product.pk])
+
+                    if cull_bbox is not None:
+                        browses = _cull_occluded(
+                            browses, cull_bbox, _get_browse_footprint,
+                            _get_browse_opaque_footprint
+                        )
 
                     return BrowseLayer(
                         name=full_name, style=style, ranges=ranges,
@@ -443,13 +494,91 @@ class LayerMapper(object):
                             Mask.from_model(mask_model, mask_type)
                             for _, mask_model in self.iter_products_masks(
                                 eo_object, filters_expressions, sort_by, suffix,
-                                limit=limit_products
+                                limit=limit_products, dedup_fields=dedup_fields
                             )
                         ]
                     )
 
                 raise NoSuchLayer('Invalid layer suffix %r' % suffix)
 
+    def lookup_features(self, layer_name, filters_expressions, sort_by=None,
+                        limit=None, dedup=None, suffix='', pixel=None):
+        """ Lookup the objects of the layer matching the filters, as used for
+            feature info requests. Only the database is queried: for
+            collection and product layers the products are returned, for
+            coverage and mosaic layers the coverages.
+
+            For collection and product layers, the products are restricted
+            according to the layer ``suffix`` to the ones drawn by
+            :meth:`lookup_layer`. When the queried ``pixel`` polygon is
+            passed, products masked out within the pixel are excluded for
+            masked layers. Masks only stored as files are not considered.
+        """
+        reader = LayerMapperConfigReader(get_eoxserver_config())
+        dedup_fields = reader.dedup_tile_fields if dedup == 'tile' else None
+
+        try:
+            eo_object = models.EOObject.objects.select_subclasses(
+                models.Collection, models.Product, models.Coverage,
+                models.Mosaic
+            ).get(
+                identifier=layer_name
+            )
+        except models.EOObject.DoesNotExist:
+            raise NoSuchLayer('Layer %r does not exist' % layer_name)
+
+        if isinstance(eo_object, models.Coverage):
+            return models.Coverage.objects.filter(
+                filters_expressions, pk=eo_object.pk
+            )
+        elif isinstance(eo_object, models.Mosaic):
+            qs = self.iter_coverages(eo_object, filters_expressions, sort_by)
+            return qs[:limit] if limit is not None else qs
+
+        elif isinstance(eo_object, (models.Collection, models.Product)):
+            return self.iter_products(
+                eo_object, filters_expressions & self._get_suffix_filter(
+                    eo_object, suffix, pixel
+                ), sort_by, limit=limit, dedup_fields=dedup_fields
+            )
+
+        raise NoSuchLayer('Layer %r cannot be queried' % layer_name)
+
+    def _get_suffix_filter(self, eo_object, suffix, pixel):
+        """ Get the filter for the products drawn in the layer of the given
+            suffix of a collection or product.
+        """
+        if suffix in ('', 'outlined', 'bands', 'outlines', 'density'):
+            return Q()
+
+        elif suffix.startswith('outlines_masked_'):
+            return _mask_visibility_filter(
+                suffix[len('outlines_masked_'):], pixel
+            )
+
+        elif suffix.startswith('masked_'):
+            post_suffix = suffix[len('masked_'):]
+            if not self.get_mask_type(eo_object, post_suffix):
+                raise NoSuchLayer('No such mask type %r' % post_suffix)
+
+            # masked browses are drawn from the default browses
+            return _browse_filter('') & _mask_visibility_filter(
+                post_suffix, pixel
+            )
+
+        elif self.get_browse_type(eo_object, suffix):
+            return _browse_filter(suffix)
+
+        elif self.get_mask_type(eo_object, suffix):
+            masks = models.Mask.objects.filter(mask_type__name=suffix)
+            if pixel is not None:
+                masks = masks.filter(
+                    Q(geometry__isnull=True) | Q(geometry__intersects=pixel)
+                )
+            return Q(pk__in=masks.values('product_id'))
+
+        raise NoSuchLayer('Invalid layer suffix %r' % suffix)
+
     def split_layer_suffix_name(self, layer_name):
         return layer_name.partition(self.suffix_separator)[::2]
 
@@ -477,6 +606,72 @@ class LayerMapper(object):
     # iteration methods
     #
 
+    def make_density_layer(self, name, style, eo_object, filters_expressions,
+                           bbox, crs, resolution, ranges=None,
+                           dedup_fields=None):
+        """ Create a layer counting the products per cell of a grid covering
+            the bbox. The footprint centroids are binned in the database, so
+            that only one row per non-empty cell is fetched.
+
+            The cell size is derived from the ``resolution`` and the
+            configured ``density_cell_size`` in pixels, rounded to a power of
+            two fraction of 360 degrees, so that the grids of neighbouring
+            tiles line up.
+        """
+        reader = LayerMapperConfigReader(get_eoxserver_config())
+        cell_size = resolution * max(1, reader.density_cell_size)
+        cell_size = 360.0 / 2 ** max(
+            1, int(math.ceil(math.log(360.0 / cell_size, 2)))
+        )
+
+        bbox_polygon = _get_bbox_polygon(bbox, crs)
+        if bbox_polygon is not None:
+            bbox_minx, bbox_miny, bbox_maxx, bbox_maxy = bbox_polygon.extent
+        else:
+            bbox_minx, bbox_miny, bbox_maxx, bbox_maxy = (-180, -90, 180, 90)
+
+        def align(value, origin, limit, round_func):
+            value = origin + round_func((value - origin) / cell_size) \
+                * cell_size
+            return max(-limit, min(limit, value))
+
+        minx = align(bbox_minx, -180, 180, math.floor)
+        maxx = align(bbox_maxx, -180, 180, math.ceil)
+        miny = align(bbox_miny, -90, 90, math.floor)
+        maxy = align(bbox_maxy, -90, 90, math.ceil)
+        columns = max(1, int(round((maxx - minx) / cell_size)))
+        rows = max(1, int(round((maxy - miny) / cell_size)))
+
+        qs = self.iter_products(
+            eo_object, filters_expressions, dedup_fields=dedup_fields
+        )
+        if dedup_fields:
+            qs = models.Product.objects.filter(pk__in=qs.values('pk'))
+
+        # snap the centroids to the centers of the cells
+        cells = qs.order_by().annotate(
+            cell=SnapToGrid(
+                Centroid('footprint'), cell_size, cell_size,
+                minx + cell_size / 2, miny + cell_size / 2
+            )
+        ).values('cell').annotate(
+            count=Count('pk')
+        ).values_list('cell', 'count')
+
+        counts = {}
+        for cell, count in cells:
+            if cell is None:
+                continue
+            column = int((cell.x - minx) // cell_size)
+            row = int((maxy - cell.y) // cell_size)
+            if 0 <= column < columns and 0 <= row < rows:
+                counts[(column, row)] = counts.get((column, row), 0) + count
+
+        return DensityLayer(
+            name, style, (minx, miny, maxx, maxy), (columns, rows), counts,
+            ranges[0] if ranges else None
+        )
+
     def iter_coverages(self, eo_object, filters_expressions, sort_by=None):
         if isinstance(eo_object, models.Mosaic):
             base_filter = dict(mosaics=eo_object)
@@ -499,15 +694,19 @@ class LayerMapper(object):
         return qs
 
     def iter_products(self, eo_object, filters_expressions, sort_by=None,
-                      limit=None):
+                      limit=None, dedup_fields=None):
+        """ Get the products of the given object. When ``dedup_fields`` are
+            passed, only the most recent product for each combination of
+            these ``ProductMetadata`` fields is kept.
+        """
         if isinstance(eo_object, models.Collection):
             base_filter = dict(collections=eo_object)
         else:
             base_filter = dict(pk=eo_object.pk)
 
         qs = models.Product.objects.filter(filters_expressions, **base_filter)
-        if limit is not None:
-            qs = qs[:limit]
+        if dedup_fields:
+            qs = _filter_latest_per_group(qs, dedup_fields)
 
         if sort_by:
             qs = qs.order_by('%s%s' % (
@@ -519,70 +718,102 @@ class LayerMapper(object):
                 '-begin_time', '-end_time', 'identifier'
             )
 
+        # slice only after ordering, as sliced querysets cannot be reordered
+        if limit is not None:
+            qs = qs[:limit]
+
         return qs
 
     def iter_products_browses(self, eo_object, filters_expressions, sort_by,
-                              name=None, style=None, limit=None):
-        products = self.iter_products(
-            eo_object, filters_expressions, sort_by, limit
-        ).prefetch_related('browses')
+                              name=None, style=None, limit=None,
+                              dedup_fields=None):
+        if name:
+            browse_filter = dict(browse_type__name=name)
+        else:
+            browse_filter = dict(browse_type__isnull=True)
+
+        # if style:
+        #     browse_filter['style'] = style
+        # else:
+        #     browse_filter['style__isnull'] = True
+
+        products = list(
+            self.iter_products(
+                eo_object, filters_expressions, sort_by, limit, dedup_fields
+            ).prefetch_related(
+                _filtered_prefetch(
+                    'browses', models.Browse, browse_filter,
+                    'browse_type', 'filtered_browses'
+                )
+            )
+        )
+
+        browse_types = (
+            _lookup_types(models.BrowseType, products, name) if name else {}
+        )
 
         for product in products:
-            browses = product.browses
-            if name:
-                browses = browses.filter(browse_type__name=name)
-                browse = browses.first()
-                if browse:
-                    browse_type = browse.browse_type
-                else:
-                    browse_type = models.BrowseType.objects.get(
-                        name=name, product_type=product.product_type
-                    )
+            browse = _first(product.filtered_browses)
+            if browse:
+                browse_type = browse.browse_type
             else:
-                browses = browses.filter(browse_type__isnull=True)
-                browse_type = None
+                browse_type = browse_types.get(product.product_type_id)
 
-            # if style:
-            #     browses = browses.filter(style=style)
-            # else:
-            #     browses = browses.filter(style__isnull=True)
-
-            yield (product, browses.first(), browse_type)
+            yield (product, browse, browse_type)
 
     def iter_products_masks(self, eo_object, filters_expressions, sort_by,
-                            name=None, limit=None):
+                            name=None, limit=None, dedup_fields=None):
+        if name:
+            mask_filter = dict(mask_type__name=name)
+        else:
+            mask_filter = dict(mask_type__isnull=True)
+
         products = self.iter_products(
-            eo_object, filters_expressions, sort_by, limit
-        ).prefetch_related('masks')
+            eo_object, filters_expressions, sort_by, limit, dedup_fields
+        ).prefetch_related(
+            _filtered_prefetch(
+                'masks', models.Mask, mask_filter,
+                'mask_type', 'filtered_masks'
+            )
+        )
 
         for product in products:
-            masks = product.masks
-            if name:
-                mask = masks.filter(mask_type__name=name).first()
-            else:
-                mask = masks.filter(mask_type__isnull=True).first()
-
-            yield (product, mask)
+            yield (product, _first(product.filtered_masks))
 
     def iter_products_browses_masks(self, eo_object, filters_expressions,
-                                    sort_by, name=None, limit=None):
-        products = self.iter_products(
-            eo_object, filters_expressions, sort_by, limit
-        ).prefetch_related('masks', 'browses')
-
-        for product in products:
-            if name:
-                mask = product.masks.filter(mask_type__name=name).first()
-                mask_type = models.MaskType.objects.filter(
-                    product_type=product.product_type, name=name
-                ).first()
-            else:
-                mask = product.masks.filter(mask_type__isnull=True).first()
-                mask_type = None
+                                    sort_by, name=None, limit=None,
+                                    dedup_fields=None):
+        if name:
+            mask_filter = dict(mask_type__name=name)
+        else:
+            mask_filter = dict(mask_type__isnull=True)
+
+        products = list(
+            self.iter_products(
+                eo_object, filters_expressions, sort_by, limit, dedup_fields
+            ).prefetch_related(
+                _filtered_prefetch(
+                    'masks', models.Mask, mask_filter,
+                    'mask_type', 'filtered_masks'
+                ),
+                _filtered_prefetch(
+                    'browses', models.Browse, dict(browse_type__isnull=True),
+                    'browse_type', 'filtered_browses'
+                ),
+            )
+        )
 
-            browse = product.browses.filter(browse_type__isnull=True).first()
+        mask_types = (
+            _lookup_types(models.MaskType, products, name) if name else {}
+        )
 
-            yield (product, browse, mask, mask_type)
+        for product in products:
+            yield (
+                product,
+                _first(product.filtered_browses),
+                _first(product.filtered_masks),
+                mask_types.get(product.product_type_id),
+            )
 
 
 class LayerMapperConfigReader(config.Reader):
@@ -592,12 +823,135 @@ class LayerMapperConfigReader(config.Reader):
     min_render_zoom = config.Option(type=int)
     fill_opacity = config.Option(type=float)
     color = config.Option(type=str, default='grey')
+    dedup_tile_fields = config.Option(
+        type=typelist(strip, ","), default=('track', 'frame')
+    )
+    occlusion_culling = config.Option(type=bool, default=False)
+    min_render_zoom_mode = config.Option(
+        type=enum(('outlines', 'density')), default='outlines'
+    )
+    density_cell_size = config.Option(type=int, default=4)
 
 
-def _generate_browse_from_browse_type(product, browse_type):
-    if not browse_type.red_or_grey_expression:
-        return None
+def _browse_filter(name):
+    """ Get the filter for products with a browse of the browse type with the
+        given name or with a product type allowing to generate one.
+    """
+    if name:
+        browses = models.Browse.objects.filter(browse_type__name=name)
+    else:
+        browses = models.Browse.objects.filter(browse_type__isnull=True)
+
+    return Q(
+        pk__in=browses.values('product_id')
+    ) | Q(
+        product_type__in=models.BrowseType.objects.filter(
+            name=name
+        ).values('product_type_id')
+    )
+
+
+def _mask_visibility_filter(name, pixel):
+    """ Get the filter excluding the products which are masked out within the
+        queried pixel by their mask of the given mask type: the pixel is
+        either completely covered by the mask or, for validity masks, outside
+        of it.
+    """
+    if pixel is None:
+        return Q()
+
+    return ~Q(pk__in=models.Mask.objects.filter(
+        Q(mask_type__validity=False, geometry__contains=pixel) |
+        Q(mask_type__validity=True, geometry__disjoint=pixel),
+        mask_type__name=name
+    ).values('product_id'))
+
+
+def _filtered_prefetch(lookup, model, filter_, type_field, to_attr):
+    """ Helper to create a :class:`django.db.models.Prefetch` for the browses
+        or masks of a product queryset, already filtered by their type and
+        with their type and storage resolved in the same query.
+    """
+    return Prefetch(
+        lookup,
+        queryset=model.objects.filter(**filter_).select_related(
+            type_field, 'storage', 'storage__storage_auth', 'storage__parent'
+        ).order_by('pk'),
+        to_attr=to_attr
+    )
+
+
+def _first(items):
+    return items[0] if items else None
+
+
+def _lookup_types(model, products, name):
+    """ Fetch all browse or mask types with the given name for the product
+        types of the given products in a single query. Returns a mapping of
+        the product type ID to the type.
+    """
+    product_type_ids = set(
+        product.product_type_id for product in products
+    )
+    product_type_ids.discard(None)
+    if not product_type_ids:
+        return {}
+
+    return {
+        type_.product_type_id: type_
+        for type_ in model.objects.filter(
+            name=name, product_type__in=product_type_ids
+        )
+    }
+
+
+def _generate_missing_browses(product_items, bands, wavelengths, ranges):
+    """ Generate the browses for all items of ``(product, browse, ...)``
+        tuples in bulk. When bands or wavelengths are requested, browses are
+        generated for all products, otherwise only for the ones without a
+        stored browse using the default browse type (with empty name) of their
+        respective product type. Returns a mapping of the product ID to the
+        generated browse.
+    """
+    if bands or wavelengths:
+        return _generate_browses_from_bands(
+            [item[0] for item in product_items], bands, wavelengths, ranges
+        )
 
+    products = [item[0] for item in product_items if not item[1]]
+    if not products:
+        return {}
+
+    default_browse_types = _lookup_types(models.BrowseType, products, '')
+    return _generate_browses_from_browse_types(
+        (product, default_browse_types.get(product.product_type_id))
+        for product in products
+    )
+
+
+def _generate_browses_from_browse_types(products_and_browse_types):
+    """ Generate browses for the given pairs of product and browse type,
+        resolving the coverages once per browse type.
+    """
+    products_per_browse_type = {}
+    for product, browse_type in products_and_browse_types:
+        if browse_type:
+            products_per_browse_type.setdefault(
+                browse_type.pk, (browse_type, [])
+            )[1].append(product)
+
+    generated_browses = {}
+    for browse_type, products in products_per_browse_type.values():
+        generated_browses.update(
+            _generate_browses_from_browse_type(products, browse_type)
+        )
+    return generated_browses
+
+
+def _get_band_expressions(browse_type):
+    """ Get the band expressions with their ranges and all referenced field
+        names of the given browse type.
+    """
     from eoxserver.render.browse.generate import extract_fields
 
     band_expressions = []
@@ -639,71 +993,234 @@ def _generate_browse_from_browse_type(product, browse_type):
             ))
             field_names.extend(alpha_bands)
 
-    coverages, fields_and_coverages = _lookup_coverages(product, field_names)
+    return band_expressions, field_names
 
-    # only return a browse instance if coverages were found
-    if coverages:
-        return GeneratedBrowse.from_coverage_models(
-            band_expressions, fields_and_coverages, product
-        )
-    return None
+
+def _generate_browses_from_browse_type(products, browse_type):
+    if not browse_type.red_or_grey_expression:
+        return {}
+
+    band_expressions, field_names = _get_band_expressions(browse_type)
+    return _generate_browses(products, band_expressions, field_names)
 
 
-def _generate_browse_from_bands(product, bands, wavelengths, ranges):
+def _generate_browses_from_bands(products, bands, wavelengths, ranges):
     assert len(bands or wavelengths or []) in (1, 3, 4)
-    if bands:
-        coverages, fields_and_coverages = _lookup_coverages(product, bands)
     # TODO: implement with wavelengths
-    # elif wavelengths:
-    #     fields_and_coverages = [
-    #         (
-    #             [product.coverages.filter(
-    #                 coverage_type__field_types__wavelength=wavelength
-    #             ).first().name],
-    #             product.coverages.filter(
-    #                 coverage_type__field_types__wavelength=wavelength
-    #             )
-    #         )
-    #         for wavelength in wavelengths
-    #     ]
-    # only return a browse instance if coverages were found
-    if coverages:
-        return GeneratedBrowse.from_coverage_models(
-            zip(bands, ranges or [(None, None)] * len(bands)), fields_and_coverages, product
+    if not bands:
+        return {}
+
+    band_expressions = list(zip(bands, ranges or [(None, None)] * len(bands)))
+    return _generate_browses(products, band_expressions, bands)
+
+
+def _generate_browses(products, band_expressions, field_names):
+    coverages_per_product = _lookup_coverages_bulk(products, field_names)
+
+    generated_browses = {}
+    for product in products:
+        coverages, fields_and_coverages = coverages_per_product.get(
+            product.pk, ([], {})
         )
-    return None
+        # only return a browse instance if coverages were found
+        if coverages:
+            generated_browses[product.pk] = (
+                GeneratedBrowse.from_coverage_models(
+                    band_expressions, fields_and_coverages, product
+                )
+            )
+    return generated_browses
 
 
-def _lookup_coverages(product, field_names):
-    # make a query of all coverages in that product for the given fields
-    coverages = product.coverages.filter(
-        coverage_type__field_types__identifier__in=field_names
+def _lookup_coverages_bulk(products, field_names):
+    """ Look up the coverages of all given products providing any of the
+        given fields. Returns a mapping of the product ID to a tuple of the
+        product's coverages and a dictionary mapping each field name to its
+        respective coverages.
+    """
+    product_ids = [product.pk for product in products]
+    if not product_ids or not field_names:
+        return {}
+
+    # make a query of all coverages in the products for the given fields
+    coverages = list(
+        models.Coverage.objects.filter(
+            parent_product__in=product_ids,
+            coverage_type__field_types__identifier__in=field_names
+        ).distinct().select_related(
+            'grid', 'coverage_type', 'parent_product'
+        ).prefetch_related(
+            'arraydata_items__storage', 'metadata_items__storage'
+        )
     )
 
-    # annotate the coverages with booleans indicating whether or not they have a
-    # certain field
-    coverages = coverages.annotate(**{
-        'has_%s' % field_name: Case(
-            When(
-                coverage_type__field_types__identifier=field_name,
-                then=Value(1)
-            ),
-            default=Value(0),
-            output_field=IntegerField()
+    # get the field names provided by each of the involved coverage types
+    coverage_type_fields = {}
+    field_types = models.FieldType.objects.filter(
+        coverage_type__in=set(
+            coverage.coverage_type_id for coverage in coverages
+        ),
+        identifier__in=field_names
+    ).values_list('coverage_type', 'identifier')
+    for coverage_type_id, identifier in field_types:
+        coverage_type_fields.setdefault(coverage_type_id, set()).add(
+            identifier
         )
-        for field_name in field_names
-    })
-
-    # evaluate the queryset
-    coverages = list(coverages)
 
     # make a dictionary for all field mapping to their respective coverages
-    fields_and_coverages = {
-        field_name: [
-            coverage
-            for coverage in coverages
-            if getattr(coverage, 'has_%s' % field_name)
-        ]
-        for field_name in field_names
-    }
-    return coverages, fields_and_coverages
+    # per product
+    result = {}
+    for coverage in coverages:
+        product_coverages, fields_and_coverages = result.setdefault(
+            coverage.parent_product_id, ([], {
+                field_name: [] for field_name in field_names
+            })
+        )
+        product_coverages.append(coverage)
+        fields = coverage_type_fields.get(coverage.coverage_type_id, ())
+        for field_name in fields_and_coverages:
+            if field_name in fields:
+                fields_and_coverages[field_name].append(coverage)
+
+    return result
+
+
+def _filter_latest_per_group(qs, group_fields):
+    """ Filter the product queryset to only contain the most recent product
+        (by begin time) per combination of the given ``ProductMetadata``
+        fields. Products lacking any of these fields or a begin time are not
+        grouped and are always kept.
+    """
+    lookups = ['product_metadata__%s' % name for name in group_fields]
+    ungrouped = Q(begin_time__isnull=True)
+    for lookup in lookups:
+        ungrouped |= Q(**{'%s__isnull' % lookup: True})
+
+    grouped = qs.exclude(ungrouped)
+
+    if connections[qs.db].features.can_distinct_on_fields:
+        # PostgreSQL: DISTINCT ON the grouping fields
+        latest = grouped.order_by(
+            *(lookups + ['-begin_time', 'identifier'])
+        ).distinct(*lookups).values('pk')
+        return qs.filter(ungrouped | Q(pk__in=latest))
+
+    # other backends: exclude products with a more recent one in their group
+    newer = grouped.filter(
+        Q(begin_time__gt=OuterRef('begin_time')) | Q(
+            begin_time=OuterRef('begin_time'),
+            identifier__lt=OuterRef('identifier'),
+        ),
+        **dict((lookup, OuterRef(lookup)) for lookup in lookups)
+    ).values('pk')
+    return qs.annotate(
+        has_newer_in_group=Exists(newer)
+    ).filter(ungrouped | Q(has_newer_in_group=False))
+
+
+def _get_bbox_polygon(bbox, crs):
+    """ Get the requested bounding box as a polygon in EPSG:4326, the
+        reference system of the footprints, or ``None`` if the CRS is not
+        supported.
+    """
+    polygon = Polygon.from_bbox(bbox)
+    polygon.srid = 4326
+    if crs:
+        srid = crss.parseEPSGCode(
+            crs, (crss.fromShortCode, crss.fromURN, crss.fromURL)
+        )
+        if srid is None:
+            return None
+
+        polygon.srid = srid
+        if srid != 4326:
+            try:
+                polygon.transform(4326)
+            except (GEOSException, GDALException):
+                return None
+    return polygon
+
+
+def _get_outline_footprints(qs, resolution):
+    """ Get the footprints of the objects of the queryset, simplified to match
+        the resolution. Only the selected footprint level is fetched.
+    """
+    field = models.get_simplified_footprint_field(resolution)
+    if field == 'footprint':
+        return list(qs.values_list('footprint', flat=True))
+
+    # objects, where the simplification did not reduce the footprint, do not
+    # store the simplified variant
+    return list(qs.annotate(
+        outline=Coalesce(field, 'footprint')
+    ).values_list('outline', flat=True))
+
+
+def _get_browse_footprint(browse):
+    return browse.footprint
+
+
+def _get_browse_opaque_footprint(browse):
+    """ Get the area of a browse that hides everything rendered below it, or
+        ``None`` when the browse may be transparent.
+    """
+    if browse.mode == BROWSE_MODE_RGBA:
+        return None
+    return browse.footprint
+
+
+def _get_masked_browse_footprint(masked_browse):
+    return masked_browse.browse.footprint
+
+
+def _get_masked_browse_opaque_footprint(masked_browse):
+    """ Get the unmasked area of a masked browse. Masks that are only
+        available as files are not loaded, the browse is then treated as
+        transparent.
+    """
+    footprint = _get_browse_opaque_footprint(masked_browse.browse)
+    mask = masked_browse.mask
+    if footprint is None or mask is None:
+        return footprint
+
+    if mask.geometry is None:
+        return None if mask.filename else footprint
+
+    return mask.apply(footprint)
+
+
+def _cull_occluded(items, bbox, get_footprint, get_opaque_footprint):
+    """ Occlusion culling of the given items in render order, the top-most
+        item first. Items whose visible footprint is already covered by the
+        opaque footprints of the items above are dropped. Once the ``bbox`` is
+        covered entirely, all remaining items are dropped.
+    """
+    result = []
+    covered = None
+    for i, item in enumerate(items):
+        try:
+            footprint = get_footprint(item)
+            if footprint is not None:
+                visible = footprint.intersection(bbox)
+                if visible.empty or (
+                        covered is not None and covered.contains(visible)):
+                    continue
+
+            result.append(item)
+
+            opaque = get_opaque_footprint(item)
+            if opaque is None or opaque.empty:
+                continue
+
+            covered = opaque if covered is None else covered.union(opaque)
+            if covered.contains(bbox):
+                break
+
+        except GEOSException:
+            # invalid geometries: keep the current and all remaining items
+            if not result or result[-1] is not item:
+                result.append(item)
+            result.extend(items[i + 1:])
+            break
+
+    return result
@@ -80,7 +80,7 @@ class WMS10Encoder(XMLEncoder):
                     ),
                     E("FeatureInfo",
                         E("Format",
-                            # TODO
+                            E("MIME")
                         ),
                         E("DCPType",
                             E("HTTP",
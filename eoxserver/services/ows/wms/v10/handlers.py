@@ -26,7 +26,8 @@
 # ------------------------------------------------------------------------------
 
 from eoxserver.services.ows.wms.basehandlers import (
-    WMSBaseGetCapabilitiesHandler, WMSBaseGetMapHandler, WMSBaseGetMapDecoder
+    WMSBaseGetCapabilitiesHandler, WMSBaseGetMapHandler, WMSBaseGetMapDecoder,
+    WMSBaseGetFeatureInfoHandler, WMSBaseGetFeatureInfoDecoder
 )
 from eoxserver.services.ows.wms.v10.encoders import WMS10Encoder
 
@@ -48,3 +49,15 @@ class WMS10GetMapHandler(WMSBaseGetMapHandler):
 
 class WMS10GetMapDecoder(WMSBaseGetMapDecoder):
     pass
+
+
+class WMS10GetFeatureInfoHandler(WMSBaseGetFeatureInfoHandler):
+    service = ("WMS", None)
+    versions = ("1.0", "1.0.0")
+
+    def get_decoder(self, request):
+        return WMS10GetFeatureInfoDecoder(request.GET)
+
+
+class WMS10GetFeatureInfoDecoder(WMSBaseGetFeatureInfoDecoder):
+    pass
@@ -85,11 +85,12 @@ class WMS11Encoder(XMLEncoder):
                             self.encode_dcptype(ows_url)
                         ]
                     ),
-                    E("GetFeatureInfo",
-                        E("Format",
-                            # TODO
-                        ),
-                        self.encode_dcptype(ows_url)
+                    E("GetFeatureInfo", *[
+                            E("Format", info_format)
+                            for info_format in info_formats
+                        ] + [
+                            self.encode_dcptype(ows_url)
+                        ]
                     ),
                     # TODO: describe layer?
                 ),
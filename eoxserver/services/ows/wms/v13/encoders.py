@@ -92,11 +92,12 @@ class WMS13Encoder(XMLEncoder):
                             self.encode_dcptype(ows_url)
                         ]
                     ),
-                    WMS("GetFeatureInfo",
-                        WMS("Format",
-                            # TODO
-                        ),
-                        self.encode_dcptype(ows_url)
+                    WMS("GetFeatureInfo", *[
+                            WMS("Format", info_format)
+                            for info_format in info_formats
+                        ] + [
+                            self.encode_dcptype(ows_url)
+                        ]
                     ),
                     # TODO: describe layer?
                 ),
@@ -30,7 +30,8 @@ from eoxserver.resources.coverages import crss
 from eoxserver.services.ows.wms.util import parse_bbox
 from eoxserver.services.ows.wms.exceptions import InvalidCRS
 from eoxserver.services.ows.wms.basehandlers import (
-    WMSBaseGetCapabilitiesHandler, WMSBaseGetMapHandler, WMSBaseGetMapDecoder
+    WMSBaseGetCapabilitiesHandler, WMSBaseGetMapHandler, WMSBaseGetMapDecoder,
+    WMSBaseGetFeatureInfoHandler, WMSBaseGetFeatureInfoDecoder
 )
 from eoxserver.services.ows.wms.v13.encoders import WMS13Encoder
 
@@ -73,3 +74,20 @@ class WMS13GetMapDecoder(WMSBaseGetMapDecoder):
     crs = kvp.Parameter(num=1)
 
     srs = property(lambda self: self.crs)
+
+
+class WMS13GetFeatureInfoHandler(WMSBaseGetFeatureInfoHandler):
+    service = ("WMS", None)
+    versions = ("1.3.0", "1.3")
+
+    def get_decoder(self, request):
+        return WMS13GetFeatureInfoDecoder(request.GET)
+
+
+class WMS13GetFeatureInfoDecoder(WMS13GetMapDecoder,
+                                 WMSBaseGetFeatureInfoDecoder):
+    i = kvp.Parameter(type=int, num=1)
+    j = kvp.Parameter(type=int, num=1)
+
+    x = property(lambda self: self.i)
+    y = property(lambda self: self.j)
@@ -0,0 +1,165 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Definitions of the well-known tile matrix sets ``WebMercatorQuad`` and
+    ``WorldCRS84Quad`` of the OGC Two Dimensional Tile Matrix Set standard.
+"""
+
+import math
+
+
+# standardized rendering pixel size in meters
+PIXEL_SIZE = 0.00028
+
+WEB_MERCATOR_HALF_WIDTH = 20037508.3427892
+
+# meters per degree on the WGS84 equator
+METERS_PER_DEGREE = 6378137 * 2 * math.pi / 360
+
+
+class TileMatrixSet(object):
+    """ A quad-tree tile matrix set, where each tile matrix doubles the
+        number of tiles of the previous one in each direction.
+
+        :param identifier: the identifier of the tile matrix set
+        :param crs: the CRS used for rendering, as understood by the WMS
+        :param crs_uri: the CRS as URI used in capabilities
+        :param extent: the extent covered by the matrix set, as
+                       (min-x, min-y, max-x, max-y)
+        :param matrix_width: the number of tiles of the first tile matrix in
+                             x direction
+        :param matrix_height: the number of tiles of the first tile matrix in
+                              y direction
+        :param meters_per_unit: the meters per CRS unit
+        :param well_known_scale_set: the URI of the well-known scale set
+        :param tile_size: the width and height of each tile in pixels
+        :param max_zoom: the maximum zoom level (tile matrix) available
+    """
+
+    def __init__(self, identifier, crs, crs_uri, extent, matrix_width,
+                 matrix_height, meters_per_unit, well_known_scale_set,
+                 tile_size=256, max_zoom=18):
+        self.identifier = identifier
+        self.crs = crs
+        self.crs_uri = crs_uri
+        self.extent = extent
+        self.matrix_width = matrix_width
+        self.matrix_height = matrix_height
+        self.meters_per_unit = meters_per_unit
+        self.well_known_scale_set = well_known_scale_set
+        self.tile_size = tile_size
+        self.max_zoom = max_zoom
+
+    @property
+    def zoom_levels(self):
+        return range(self.max_zoom + 1)
+
+    def get_matrix_size(self, zoom):
+        """ Get the number of tiles (columns, rows) of the tile matrix.
+        """
+        return (self.matrix_width << zoom, self.matrix_height << zoom)
+
+    def get_resolution(self, zoom):
+        """ Get the size of a pixel in CRS units of the tile matrix.
+        """
+        return (
+            (self.extent[2] - self.extent[0])
+            / (self.get_matrix_size(zoom)[0] * self.tile_size)
+        )
+
+    def get_scale_denominator(self, zoom):
+        return self.get_resolution(zoom) * self.meters_per_unit / PIXEL_SIZE
+
+    def is_valid_tile(self, zoom, col, row):
+        if zoom not in self.zoom_levels:
+            return False
+        width, height = self.get_matrix_size(zoom)
+        return 0 <= col < width and 0 <= row < height
+
+    def get_tiles_bbox(self, zoom, min_col, min_row, max_col, max_row):
+        """ Get the bbox covered by the given (inclusive) range of tiles of
+            the tile matrix. Rows are counted from the top.
+        """
+        size = self.get_resolution(zoom) * self.tile_size
+        return (
+            self.extent[0] + min_col * size,
+            self.extent[3] - (max_row + 1) * size,
+            self.extent[0] + (max_col + 1) * size,
+            self.extent[3] - min_row * size,
+        )
+
+    def get_tile_bbox(self, zoom, col, row):
+        return self.get_tiles_bbox(zoom, col, row, col, row)
+
+    def get_tile_range(self, zoom, bbox):
+        """ Get the (inclusive) range of tiles of the tile matrix
+            intersecting the bbox as (min-col, min-row, max-col, max-row).
+        """
+        size = self.get_resolution(zoom) * self.tile_size
+        width, height = self.get_matrix_size(zoom)
+
+        def clamp(value, upper):
+            return max(0, min(int(math.floor(value)), upper - 1))
+
+        return (
+            clamp((bbox[0] - self.extent[0]) / size, width),
+            clamp((self.extent[3] - bbox[3]) / size, height),
+            clamp((bbox[2] - self.extent[0]) / size - 1e-9, width),
+            clamp((self.extent[3] - bbox[1]) / size - 1e-9, height),
+        )
+
+
+WEB_MERCATOR_QUAD = TileMatrixSet(
+    'WebMercatorQuad', 'EPSG:3857',
+    'http://www.opengis.net/def/crs/EPSG/0/3857',
+    (
+        -WEB_MERCATOR_HALF_WIDTH, -WEB_MERCATOR_HALF_WIDTH,
+        WEB_MERCATOR_HALF_WIDTH, WEB_MERCATOR_HALF_WIDTH
+    ),
+    1, 1, 1,
+    'http://www.opengis.net/def/wkss/OGC/1.0/GoogleMapsCompatible',
+)
+
+WORLD_CRS84_QUAD = TileMatrixSet(
+    'WorldCRS84Quad', 'EPSG:4326',
+    'http://www.opengis.net/def/crs/OGC/1.3/CRS84',
+    (-180, -90, 180, 90),
+    2, 1, METERS_PER_DEGREE,
+    'http://www.opengis.net/def/wkss/OGC/1.0/GoogleCRS84Quad',
+)
+
+TILE_MATRIX_SETS = dict(
+    (tile_matrix_set.identifier, tile_matrix_set)
+    for tile_matrix_set in (WEB_MERCATOR_QUAD, WORLD_CRS84_QUAD)
+)
+
+
+def get_tile_matrix_set(identifier):
+    """ Get the tile matrix set with the given identifier or ``None``.
+    """
+    return TILE_MATRIX_SETS.get(identifier)
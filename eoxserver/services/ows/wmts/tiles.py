@@ -0,0 +1,272 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Rendering of tiles through the map rendering pipeline of the WMS.
+
+    When a map cache is configured, tiles are rendered as metatiles of
+    ``metatile_size`` x ``metatile_size`` tiles, split into the single tiles
+    and stored in the cache, so that neighbouring tiles are served without
+    rendering.
+"""
+
+from uuid import uuid4
+
+from django.utils.timezone import utc, is_aware
+
+from eoxserver.contrib import gdal, vsi
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.decoders import config
+from eoxserver.core.util.timetools import isoformat
+from eoxserver.render.map.cache import get_map_cache
+from eoxserver.services.ows.wms.basehandlers import render_layers
+from eoxserver.services.ows.wms.layermapper import LayerMapper
+from eoxserver.services.singleflight import single_flight
+from eoxserver.services.ows.wmts.vectortiles import (
+    MVT_FORMAT, get_vector_tile
+)
+
+
+# the GDAL drivers to split metatiles of the given formats
+SPLIT_DRIVERS = {
+    'image/png': 'PNG',
+    'image/jpeg': 'JPEG',
+}
+
+class TileConfigReader(config.Reader):
+    section = "services.ows.wmts"
+    metatile_size = config.Option(type=int, default=4)
+
+
+def get_tile(layer_name, style, tile_matrix_set, zoom, col, row, format,
+             time=None):
+    """ Get the tile of the given layer as a tuple of its bytes and content
+        type, either from the map cache or by rendering it.
+    """
+    style = normalize_style(style)
+    map_cache = get_map_cache()
+    if map_cache is None:
+        tiles = single_flight([
+            'Tile', layer_name, style, tile_matrix_set.identifier, zoom,
+            col, row, format, serialize_time(time)
+        ], lambda: render_tiles(
+            layer_name, style, tile_matrix_set, zoom, (col, row, col, row),
+            format, time
+        ))
+        return tiles[(col, row)]
+
+    def get_key(col, row):
+        return get_tile_key(
+            map_cache, layer_name, style, tile_matrix_set, zoom, col, row,
+            format, time
+        )
+
+    key = get_key(col, row)
+    cached = map_cache.get(key)
+    if cached:
+        return cached
+
+    # the metatile is only rendered once for all concurrent requests of its
+    # tiles
+    tile_range = get_metatile_range(tile_matrix_set, zoom, col, row, format)
+    metatile_key = get_key(tile_range[0], tile_range[1])
+    tiles = single_flight(['Metatile', metatile_key], lambda: seed_tiles(
+        layer_name, style, tile_matrix_set, zoom, tile_range, format, time
+    ))
+    return tiles[(col, row)]
+
+
+def get_tile_key(map_cache, layer_name, style, tile_matrix_set, zoom, col,
+                 row, format, time=None):
+    """ Get the key of the tile in the map cache. The style and time are
+        normalized, so that tiles seeded by the ``tilecache`` command are
+        found for the equivalent requests.
+    """
+    base_name = LayerMapper(None, "__").split_layer_suffix_name(layer_name)[0]
+    return map_cache.get_key({
+        'service': 'WMTS',
+        'layer': layer_name,
+        'style': normalize_style(style),
+        'tile_matrix_set': tile_matrix_set.identifier,
+        'zoom': zoom,
+        'col': col,
+        'row': row,
+        'format': format,
+        'time': serialize_time(time),
+    }, [base_name])
+
+
+def normalize_style(style):
+    """ Normalize the requested style: both the empty and the "default"
+        style refer to the default style of the layer.
+    """
+    if style in ("", "default"):
+        return None
+    return style
+
+
+def serialize_time(time):
+    """ Serialize the parsed time (a list of one or two datetimes) for tile
+        keys. Datetimes are expressed in UTC and intervals with equal begin
+        and end are reduced to the instant.
+    """
+    if not time:
+        return None
+
+    values = [
+        isoformat(value.astimezone(utc) if is_aware(value) else value)
+        for value in time
+    ]
+    if len(values) == 2 and values[0] == values[1]:
+        values = values[:1]
+    return values
+
+
+def seed_tiles(layer_name, style, tile_matrix_set, zoom, tile_range, format,
+               time=None):
+    """ Render the given range of tiles and store them in the map cache.
+        Returns the rendered tiles as in :func:`render_tiles`.
+    """
+    style = normalize_style(style)
+    map_cache = get_map_cache()
+    tiles = render_tiles(
+        layer_name, style, tile_matrix_set, zoom, tile_range, format, time
+    )
+    for (col, row), tile in tiles.items():
+        map_cache.set(
+            get_tile_key(
+                map_cache, layer_name, style, tile_matrix_set, zoom, col, row,
+                format, time
+            ), tile
+        )
+    return tiles
+
+
+def get_metatile_range(tile_matrix_set, zoom, col, row, format):
+    """ Get the range of tiles (min-col, min-row, max-col, max-row) of the
+        metatile containing the given tile.
+    """
+    size = TileConfigReader(get_eoxserver_config()).metatile_size
+    if size <= 1 or format not in SPLIT_DRIVERS:
+        return (col, row, col, row)
+
+    width, height = tile_matrix_set.get_matrix_size(zoom)
+    min_col = col - col % size
+    min_row = row - row % size
+    return (
+        min_col, min_row,
+        min(min_col + size, width) - 1, min(min_row + size, height) - 1
+    )
+
+
+def iter_metatile_ranges(tile_matrix_set, zoom, tile_range, format):
+    """ Iterate over the ranges of the metatiles covering the given range of
+        tiles.
+    """
+    size = TileConfigReader(get_eoxserver_config()).metatile_size
+    if size <= 1 or format not in SPLIT_DRIVERS:
+        size = 1
+
+    min_col, min_row, max_col, max_row = tile_range
+    for row in range(min_row - min_row % size, max_row + 1, size):
+        for col in range(min_col - min_col % size, max_col + 1, size):
+            yield get_metatile_range(tile_matrix_set, zoom, col, row, format)
+
+
+def render_tiles(layer_name, style, tile_matrix_set, zoom, tile_range,
+                 format, time=None):
+    """ Render the given range of tiles in a single map and split it into
+        tiles. Returns a dict mapping (col, row) to the tuples of bytes and
+        content type of the tiles.
+    """
+    min_col, min_row, max_col, max_row = tile_range
+    tile_size = tile_matrix_set.tile_size
+    cols = max_col - min_col + 1
+    rows = max_row - min_row + 1
+
+    # vector tiles are never rendered as metatiles
+    if format == MVT_FORMAT.mimeType:
+        return {(min_col, min_row): (
+            get_vector_tile(
+                layer_name, tile_matrix_set, zoom, min_col, min_row, time
+            ), format
+        )}
+
+    result_bytes, content_type, _ = render_layers(
+        [layer_name], [style], tile_matrix_set.get_tiles_bbox(
+            zoom, min_col, min_row, max_col, max_row
+        ), tile_matrix_set.crs, cols * tile_size, rows * tile_size, format,
+        time=time, transparent=True, zoom=zoom,
+    )
+
+    if cols == 1 and rows == 1:
+        return {(min_col, min_row): (result_bytes, content_type)}
+
+    return dict(
+        ((min_col + x, min_row + y), (tile_bytes, content_type))
+        for (x, y), tile_bytes in split_image(
+            result_bytes, SPLIT_DRIVERS[format], tile_size, cols, rows
+        )
+    )
+
+
+def split_image(image_bytes, driver, tile_size, cols, rows):
+    """ Split the image into ``cols`` x ``rows`` tiles of ``tile_size``
+        pixels, encoded with the given GDAL driver. Yields the (x, y) offsets
+        in tiles and the encoded tiles.
+    """
+    in_path = '/vsimem/%s' % uuid4().hex
+    gdal.FileFromMemBuffer(in_path, image_bytes)
+    try:
+        in_ds = gdal.Open(in_path)
+        band_list = None
+        if driver == 'JPEG' and in_ds.RasterCount == 4:
+            # JPEG cannot encode an alpha band
+            band_list = [1, 2, 3]
+
+        for y in range(rows):
+            for x in range(cols):
+                out_path = '/vsimem/%s' % uuid4().hex
+                # prevent writing auxiliary .aux.xml files
+                with gdal.config_env({'GDAL_PAM_ENABLED': 'NO'}):
+                    out_ds = gdal.Translate(
+                        out_path, in_ds, format=driver, bandList=band_list,
+                        srcWin=[
+                            x * tile_size, y * tile_size, tile_size, tile_size
+                        ]
+                    )
+                    out_ds = None
+                try:
+                    with vsi.open(out_path) as f:
+                        tile_bytes = f.read()
+                finally:
+                    vsi.unlink(out_path)
+
+                yield (x, y), tile_bytes
+        in_ds = None
+    finally:
+        vsi.unlink(in_path)
@@ -0,0 +1,202 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+
+from lxml.builder import ElementMaker
+
+from eoxserver.core.util.xmltools import XMLEncoder, NameSpace, NameSpaceMap
+from eoxserver.services.ows.common.v11.encoders import ns_xlink, ns_ows
+
+ns_wmts = NameSpace(
+    "http://www.opengis.net/wmts/1.0", None,
+    "http://schemas.opengis.net/wmts/1.0/wmtsGetCapabilities_response.xsd"
+)
+nsmap = NameSpaceMap(ns_wmts, ns_ows, ns_xlink)
+
+WMTS = ElementMaker(namespace=ns_wmts.uri, nsmap=nsmap)
+OWS = ElementMaker(namespace=ns_ows.uri, nsmap=nsmap)
+
+
+class WMTS10Encoder(XMLEncoder):
+    def encode_capabilities(self, config, ows_url, tile_url_template,
+                            layers, tile_matrix_sets):
+        """ Encode the capabilities document. ``layers`` is a list of tuples
+            of the layer descriptions and the formats available for them.
+        """
+        return WMTS("Capabilities",
+            OWS("ServiceIdentification",
+                OWS("Title", config.title),
+                OWS("Abstract", config.abstract),
+                OWS("Keywords", *[
+                    OWS("Keyword", keyword) for keyword in config.keywords
+                ]),
+                OWS("ServiceType", "OGC WMTS"),
+                OWS("ServiceTypeVersion", "1.0.0"),
+                OWS("Fees", config.fees),
+                OWS("AccessConstraints", config.access_constraints),
+            ),
+            OWS("ServiceProvider",
+                OWS("ProviderName", config.provider_name),
+                OWS("ProviderSite", **{ns_xlink("href"): config.provider_site}),
+                OWS("ServiceContact",
+                    OWS("IndividualName", config.individual_name),
+                    OWS("PositionName", config.position_name),
+                ),
+            ),
+            OWS("OperationsMetadata", *[
+                self.encode_operation(name, ows_url)
+                for name in ("GetCapabilities", "GetTile")
+            ]),
+            WMTS("Contents", *[
+                self.encode_layer(
+                    layer_description, formats, tile_url_template,
+                    tile_matrix_sets
+                )
+                for layer_description, formats in layers
+            ] + [
+                self.encode_tile_matrix_set(tile_matrix_set)
+                for tile_matrix_set in tile_matrix_sets
+            ]),
+            version="1.0.0", updateSequence=config.update_sequence
+        )
+
+    def encode_operation(self, name, ows_url):
+        return OWS("Operation",
+            OWS("DCP",
+                OWS("HTTP",
+                    OWS("Get",
+                        OWS("Constraint",
+                            OWS("AllowedValues",
+                                OWS("Value", "KVP")
+                            ),
+                            name="GetEncoding"
+                        ),
+                        **{ns_xlink("href"): ows_url}
+                    )
+                )
+            ),
+            name=name
+        )
+
+    def encode_layer(self, layer_description, formats, tile_url_template,
+                     tile_matrix_sets):
+        elems = [
+            OWS("Title", layer_description.title),
+        ]
+
+        if layer_description.bbox:
+            minx, miny, maxx, maxy = layer_description.bbox
+            elems.append(
+                OWS("WGS84BoundingBox",
+                    OWS("LowerCorner", "%s %s" % (minx, miny)),
+                    OWS("UpperCorner", "%s %s" % (maxx, maxy)),
+                )
+            )
+
+        elems.append(OWS("Identifier", layer_description.name))
+
+        styles = layer_description.styles or ["default"]
+        elems.extend(
+            WMTS("Style",
+                OWS("Identifier", style),
+                **({"isDefault": "true"} if i == 0 else {})
+            )
+            for i, style in enumerate(styles)
+        )
+
+        elems.extend(
+            WMTS("Format", frmt.mimeType) for frmt in formats
+        )
+
+        for name, dimension in layer_description.dimensions.items():
+            if "min" in dimension and "max" in dimension:
+                value = "%s/%s" % (dimension["min"], dimension["max"])
+            else:
+                value = ",".join(dimension.get("values", []))
+
+            elems.append(
+                WMTS("Dimension",
+                    OWS("Identifier", name),
+                    OWS("UOM", dimension.get("units", "")),
+                    WMTS("Default", dimension.get("default", "")),
+                    WMTS("Value", value),
+                )
+            )
+
+        elems.extend(
+            WMTS("TileMatrixSetLink",
+                WMTS("TileMatrixSet", tile_matrix_set.identifier)
+            )
+            for tile_matrix_set in tile_matrix_sets
+        )
+
+        if tile_url_template:
+            elems.extend(
+                WMTS("ResourceURL",
+                    format=frmt.mimeType, resourceType="tile",
+                    template=tile_url_template.replace(
+                        "{Layer}", layer_description.name
+                    ).replace(
+                        "{Extension}", frmt.defaultExt.lstrip(".")
+                    )
+                )
+                for frmt in formats if frmt.defaultExt
+            )
+
+        return WMTS("Layer", *elems)
+
+    def encode_tile_matrix_set(self, tile_matrix_set):
+        tile_size = tile_matrix_set.tile_size
+        return WMTS("TileMatrixSet",
+            OWS("Identifier", tile_matrix_set.identifier),
+            OWS("SupportedCRS", tile_matrix_set.crs_uri),
+            WMTS("WellKnownScaleSet", tile_matrix_set.well_known_scale_set),
+            *[
+                WMTS("TileMatrix",
+                    OWS("Identifier", str(zoom)),
+                    WMTS("ScaleDenominator", repr(
+                        tile_matrix_set.get_scale_denominator(zoom)
+                    )),
+                    WMTS("TopLeftCorner", "%r %r" % (
+                        tile_matrix_set.extent[0], tile_matrix_set.extent[3]
+                    )),
+                    WMTS("TileWidth", str(tile_size)),
+                    WMTS("TileHeight", str(tile_size)),
+                    WMTS("MatrixWidth", str(
+                        tile_matrix_set.get_matrix_size(zoom)[0]
+                    )),
+                    WMTS("MatrixHeight", str(
+                        tile_matrix_set.get_matrix_size(zoom)[1]
+                    )),
+                )
+                for zoom in tile_matrix_set.zoom_levels
+            ]
+        )
+
+    def get_schema_locations(self):
+        return nsmap.schema_locations
@@ -0,0 +1,205 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.urls import reverse, NoReverseMatch
+from django.utils.six.moves.urllib.parse import unquote
+
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.decoders import kvp, InvalidParameterException
+from eoxserver.render.map.objects import LayerDescription
+from eoxserver.render.map.renderer import get_map_renderer
+from eoxserver.resources.coverages import models
+from eoxserver.services import views
+from eoxserver.services.ows.common.config import CapabilitiesConfigReader
+from eoxserver.services.ows.wms.exceptions import InvalidFormat
+from eoxserver.services.ows.wms.layermapper import LayerMapper
+from eoxserver.services.ows.wms.parsing import parse_time
+from eoxserver.services.ows.wmts.exceptions import (
+    TileOutOfRange, InvalidTileMatrixSet
+)
+from eoxserver.services.ows.wmts.tilematrixsets import (
+    TILE_MATRIX_SETS, get_tile_matrix_set
+)
+from eoxserver.services.ows.wmts.tiles import get_tile
+from eoxserver.services.ows.wmts.vectortiles import (
+    MVT_FORMAT, is_vector_layer, vector_tiles_supported
+)
+from eoxserver.services.ows.wmts.v10.encoders import WMTS10Encoder
+
+
+class WMTS10GetCapabilitiesHandler(object):
+    service = "WMTS"
+    versions = ("1.0.0",)
+    request = "GetCapabilities"
+    methods = ["GET"]
+
+    def handle(self, request):
+        # offer all WMS-visible collections and products as tiled layers
+        qs = models.EOObject.objects.filter(
+            Q(
+                product__isnull=False,
+                service_visibility__service='wms',
+                service_visibility__visibility=True
+            ) | Q(
+                collection__isnull=False
+            )
+        ).exclude(
+            collection__isnull=False,
+            service_visibility__service='wms',
+            service_visibility__visibility=False
+        ).select_subclasses()
+
+        map_renderer = get_map_renderer()
+        raster_styles = map_renderer.get_raster_styles()
+        geometry_styles = map_renderer.get_geometry_styles()
+        layer_mapper = LayerMapper(
+            map_renderer.get_supported_layer_types(), "__"
+        )
+
+        formats = map_renderer.get_supported_formats()
+        vector_formats = list(formats)
+        if vector_tiles_supported():
+            vector_formats.append(MVT_FORMAT)
+
+        layer_descriptions = []
+        for eo_object in qs:
+            layer_description = layer_mapper.get_layer_description(
+                eo_object, raster_styles, geometry_styles
+            )
+            layer_descriptions.append(layer_description)
+            # sub-layers inherit the extent and dimensions of their parent
+            layer_descriptions.extend(
+                LayerDescription(
+                    sub_layer.name, bbox=layer_description.bbox,
+                    dimensions=layer_description.dimensions,
+                    styles=sub_layer.styles, title=sub_layer.title
+                )
+                for sub_layer in layer_description.sub_layers
+            )
+
+        try:
+            tile_url_template = unquote(request.build_absolute_uri(reverse(
+                'tiles:tile', kwargs={
+                    'layer': '{Layer}', 'tile_matrix_set': '{TileMatrixSet}',
+                    'zoom': '{TileMatrix}', 'col': '{TileCol}',
+                    'row': '{TileRow}', 'extension': '{Extension}',
+                }
+            )))
+        except NoReverseMatch:
+            # the RESTful tile endpoint is not configured
+            tile_url_template = None
+
+        encoder = WMTS10Encoder()
+        conf = CapabilitiesConfigReader(get_eoxserver_config())
+        return encoder.serialize(
+            encoder.encode_capabilities(
+                conf, request.build_absolute_uri(reverse(views.ows)),
+                tile_url_template,
+                [
+                    (
+                        layer_description,
+                        vector_formats
+                        if is_vector_layer(layer_description.name)
+                        else formats
+                    )
+                    for layer_description in layer_descriptions
+                ],
+                list(TILE_MATRIX_SETS.values())
+            ),
+            pretty_print=settings.DEBUG
+        ), encoder.content_type
+
+
+class WMTS10GetTileHandler(object):
+    service = "WMTS"
+    versions = ("1.0.0",)
+    request = "GetTile"
+    methods = ["GET"]
+
+    def handle(self, request):
+        decoder = WMTS10GetTileDecoder(request.GET)
+        return handle_tile_request(
+            decoder.layer, decoder.style, decoder.tilematrixset,
+            decoder.tilematrix, decoder.tilecol, decoder.tilerow,
+            decoder.format, decoder.time
+        )
+
+
+def handle_tile_request(layer, style, tile_matrix_set_identifier, zoom, col,
+                        row, format, time=None):
+    """ Validate the tile request and respond with the tile.
+    """
+    tile_matrix_set = get_tile_matrix_set(tile_matrix_set_identifier)
+    if not tile_matrix_set:
+        raise InvalidTileMatrixSet(tile_matrix_set_identifier)
+
+    if zoom not in tile_matrix_set.zoom_levels:
+        raise TileOutOfRange("TileMatrix", zoom)
+
+    width, height = tile_matrix_set.get_matrix_size(zoom)
+    if not 0 <= col < width:
+        raise TileOutOfRange("TileCol", col)
+    if not 0 <= row < height:
+        raise TileOutOfRange("TileRow", row)
+
+    supported_formats = [
+        frmt.mimeType
+        for frmt in get_map_renderer().get_supported_formats()
+    ]
+    if is_vector_layer(layer) and vector_tiles_supported():
+        supported_formats.append(MVT_FORMAT.mimeType)
+    if format not in supported_formats:
+        raise InvalidFormat(format)
+
+    tile_bytes, content_type = get_tile(
+        layer, style, tile_matrix_set, zoom, col, row, format, time
+    )
+    return HttpResponse(tile_bytes, content_type=content_type)
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidParameterException(
+            "Invalid integer value '%s'" % value
+        )
+
+
+class WMTS10GetTileDecoder(kvp.Decoder):
+    layer = kvp.Parameter(num=1)
+    style = kvp.Parameter(num="?", default="")
+    format = kvp.Parameter(num=1)
+    tilematrixset = kvp.Parameter(num=1)
+    tilematrix = kvp.Parameter(type=parse_int, num=1)
+    tilerow = kvp.Parameter(type=parse_int, num=1)
+    tilecol = kvp.Parameter(type=parse_int, num=1)
+    time = kvp.Parameter(type=parse_time, num="?")
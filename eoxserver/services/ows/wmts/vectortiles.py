@@ -0,0 +1,191 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" Encoding of the outline layers as Mapbox Vector Tiles directly in the
+    database via PostGIS ``ST_AsMVT``.
+"""
+
+from django.contrib.gis.geos import Polygon
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.resources.coverages import models
+from eoxserver.resources.coverages.formats import Format
+from eoxserver.services import filters
+from eoxserver.services.ecql import get_field_mapping_for_model
+from eoxserver.services.ows.wms.layermapper import (
+    LayerMapper, LayerMapperConfigReader, NoSuchLayer
+)
+
+
+MVT_FORMAT = Format(
+    'application/vnd.mapbox-vector-tile', None, '.mvt', False
+)
+
+# the size of the MVT coordinate space and the buffer around each tile
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+MVT_SQL = """
+SELECT ST_AsMVT(tile, %s, %s, 'geom') FROM (
+    SELECT
+        q.identifier,
+        to_char(
+            q.begin_time AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+        ) AS begin_time,
+        to_char(
+            q.end_time AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+        ) AS end_time,
+        ST_AsMVTGeom(
+            ST_Transform(
+                ST_ClipByBox2D(
+                    {geometry}, ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+                ), %s
+            ),
+            ST_MakeEnvelope(%s, %s, %s, %s, %s), %s, %s, true
+        ) AS geom
+    FROM ({query}) q
+) tile WHERE tile.geom IS NOT NULL
+"""
+
+OUTLINE_GEOMETRY = "q.outline"
+
+MASKED_OUTLINE_GEOMETRY = """CASE
+    WHEN q.mask_geometry IS NULL THEN q.outline
+    WHEN q.mask_validity THEN ST_Intersection(q.outline, q.mask_geometry)
+    ELSE ST_Difference(q.outline, q.mask_geometry)
+END"""
+
+
+def is_vector_layer(layer_name):
+    """ Check whether the layer of the given name can be encoded as vector
+        tiles.
+    """
+    suffix = LayerMapper(None, "__").split_layer_suffix_name(layer_name)[1]
+    return (
+        suffix in ('outlines', 'outlined') or
+        suffix.startswith('outlines_masked_')
+    )
+
+
+def vector_tiles_supported():
+    """ Check whether the database supports the encoding of vector tiles.
+    """
+    return connections[models.Product.objects.db].vendor == 'postgresql'
+
+
+def get_vector_tile(layer_name, tile_matrix_set, zoom, col, row, time=None):
+    """ Encode the footprints of the products of the outline layer within the
+        tile as a Mapbox Vector Tile. Each feature carries the product
+        ``identifier``, ``begin_time`` and ``end_time``.
+
+        Masked outline layers are clipped by the masks stored as geometries,
+        masks only available as files are not applied.
+    """
+    layer_mapper = LayerMapper(None, "__")
+    name, suffix = layer_mapper.split_layer_suffix_name(layer_name)
+    if not is_vector_layer(layer_name):
+        raise NoSuchLayer('Layer %r has no vector tiles' % layer_name)
+
+    try:
+        eo_object = models.EOObject.objects.select_subclasses(
+            models.Collection, models.Product
+        ).get(identifier=name)
+    except models.EOObject.DoesNotExist:
+        raise NoSuchLayer('Layer %r does not exist' % name)
+
+    if not isinstance(eo_object, (models.Collection, models.Product)):
+        raise NoSuchLayer('Layer %r has no vector tiles' % layer_name)
+
+    bbox = tile_matrix_set.get_tile_bbox(zoom, col, row)
+    srid = int(tile_matrix_set.crs.split(':')[1])
+
+    # clip the footprints to the tile and its buffer before transforming, so
+    # that footprints reaching the poles can be projected
+    buffer_size = (bbox[2] - bbox[0]) * MVT_BUFFER / float(MVT_EXTENT)
+    clip_box = Polygon.from_bbox((
+        bbox[0] - buffer_size, bbox[1] - buffer_size,
+        bbox[2] + buffer_size, bbox[3] + buffer_size,
+    ))
+    clip_box.srid = srid
+    clip_box.transform(4326)
+    clip_bbox = clip_box.extent
+
+    field_mapping, _ = get_field_mapping_for_model(models.Product)
+    filter_expressions = filters.bbox(
+        filters.attribute('footprint', field_mapping),
+        bbox[0], bbox[1], bbox[2], bbox[3], tile_matrix_set.crs,
+        bboverlaps=False
+    )
+    if time:
+        filter_expressions &= filters.time_interval(time)
+
+    reader = LayerMapperConfigReader(get_eoxserver_config())
+    qs = layer_mapper.iter_products(
+        eo_object, filter_expressions,
+        limit=reader.limit_products if reader.limit_mode == 'hide' else None
+    )
+
+    # use the simplified footprints matching the coordinate precision
+    resolution = (clip_bbox[2] - clip_bbox[0]) / float(
+        MVT_EXTENT + 2 * MVT_BUFFER
+    )
+    qs = qs.annotate(outline=Coalesce(
+        models.get_simplified_footprint_field(resolution), 'footprint'
+    ))
+    fields = ['identifier', 'begin_time', 'end_time', 'outline']
+    geometry = OUTLINE_GEOMETRY
+
+    if suffix.startswith('outlines_masked_'):
+        masks = models.Mask.objects.filter(
+            product=OuterRef('pk'),
+            mask_type__name=suffix[len('outlines_masked_'):]
+        )
+        qs = qs.annotate(
+            mask_geometry=Subquery(masks.values('geometry')[:1]),
+            mask_validity=Subquery(masks.values('mask_type__validity')[:1]),
+        )
+        fields.extend(['mask_geometry', 'mask_validity'])
+        geometry = MASKED_OUTLINE_GEOMETRY
+
+    query, query_params = qs.values(*fields).query.sql_with_params()
+    sql = MVT_SQL.format(geometry=geometry, query=query)
+    params = (
+        [layer_name, MVT_EXTENT] +
+        list(clip_bbox) + [srid] +
+        list(bbox) + [srid, MVT_EXTENT, MVT_BUFFER] +
+        list(query_params)
+    )
+
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile else b''
@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+""" RESTful (XYZ) access to the tiles of the WMTS.
+"""
+
+import logging
+import traceback
+
+from django.http import HttpResponse
+
+from eoxserver.render.map.renderer import get_map_renderer
+from eoxserver.services.ows.wms.layermapper import NoSuchLayer
+from eoxserver.services.ows.wmts.exceptions import TileOutOfRange
+from eoxserver.services.ows.wmts.v10.exceptionhandler import (
+    WMTS10ExceptionHandler
+)
+from eoxserver.services.ows.wmts.v10.handlers import (
+    handle_tile_request, parse_int
+)
+from eoxserver.services.ows.wms.exceptions import InvalidFormat
+from eoxserver.services.ows.wms.parsing import parse_time
+from eoxserver.services.ows.wmts.vectortiles import MVT_FORMAT
+
+
+logger = logging.getLogger(__name__)
+
+
+def tile(request, layer, tile_matrix_set, zoom, col, row, extension):
+    """ Respond with the tile ``col``/``row`` of the tile matrix ``zoom`` of
+        the given tile matrix set. The format is determined by the file
+        extension, the style and time can be passed as query parameters.
+    """
+    try:
+        frmt = get_format_by_extension(extension)
+        time = request.GET.get('time')
+        return handle_tile_request(
+            layer, request.GET.get('style'), tile_matrix_set,
+            parse_int(zoom), parse_int(col), parse_int(row), frmt.mimeType,
+            parse_time(time) if time else None
+        )
+    except Exception as e:
+        logger.debug(traceback.format_exc())
+        content, content_type, status = \
+            WMTS10ExceptionHandler().handle_exception(request, e)
+        if isinstance(e, (TileOutOfRange, NoSuchLayer)):
+            status = 404
+        return HttpResponse(content, content_type=content_type, status=status)
+
+
+def get_format_by_extension(extension):
+    formats = list(get_map_renderer().get_supported_formats())
+    for frmt in formats + [MVT_FORMAT]:
+        if (frmt.defaultExt or '').lstrip('.') == extension:
+            return frmt
+    raise InvalidFormat(extension)
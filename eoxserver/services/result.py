@@ -32,6 +32,8 @@ try:
 except ImportError:
     from cStringIO import StringIO
 
+import shutil
+import tempfile
 from uuid import uuid4
 
 from django.http import HttpResponse
@@ -40,6 +42,10 @@ from django.utils.six import b
 from eoxserver.core.util import multiparttools as mp
 
 
+# the size of the chunks streamed result items are emitted in
+RESULT_CHUNK_SIZE = 256 * 1024
+
+
 class ResultItem(object):
     """ Base class (or interface) for result items of a result set.
 
@@ -215,7 +221,8 @@ def get_payload_size(result_set, boundary):
     return size
 
 
-def to_http_response(result_set, response_type=HttpResponse, boundary=None):
+def to_http_response(result_set, response_type=HttpResponse, boundary=None,
+                     chunk_size=None):
     """ Returns a response for a given result set. The ``response_type`` is the
         class to be used. It must be capable to work with iterators. This
         function is also responsible to delete any temporary files and buffers
@@ -230,6 +237,8 @@ def to_http_response(result_set, response_type=HttpResponse, boundary=None):
                               <django.http.StreamingHttpResponse>`
         :param boundary: the multipart boundary; if omitted a UUID hex string is
                          computed and used
+        :param chunk_size: when set, the items are emitted in chunks of at most
+                           this size, instead of reading them at once
         :returns: a response object of the desired type
     """
 
@@ -264,7 +273,11 @@ def to_http_response(result_set, response_type=HttpResponse, boundary=None):
                     b"%s: %s" % (key, value) 
                     for key, value in get_headers(item)
                     ) + mp.CRLFCRLF
-                yield item.data
+                if chunk_size:
+                    for chunk in item.chunked(chunk_size):
+                        yield chunk
+                else:
+                    yield item.data
             if boundary:
                 yield boundary_str_end
         finally:
@@ -326,3 +339,68 @@ def result_set_from_raw_data(data):
         for headers, d in mp.iterate(data)
         if not headers.get(b"Content-Type").startswith(b"multipart")
     ]
+
+
+def spooled_result_set_from_raw_data(data):
+    """ Create a result set from raw HTTP data, like
+        :func:`result_set_from_raw_data`, but write the parts to temporary
+        spool files, so that the raw data can be released and the parts can
+        be streamed.
+
+        :param data: the raw byte data
+        :returns: a result set: a list containing :class:`ResultFile`
+    """
+    result_set = []
+    try:
+        for headers, d in mp.iterate(data):
+            if headers.get(b"Content-Type").startswith(b"multipart"):
+                continue
+            result_set.append(
+                ResultFile(_spool(d), *parse_headers(headers))
+            )
+    except:
+        delete_result_set(result_set)
+        raise
+    return result_set
+
+
+def copy_result_set(result_set):
+    """ Create an independent copy of the result set, which can be consumed
+        and deleted separately. The spool files of :class:`ResultFile` items
+        are hard-linked, or copied where this is not possible, other items are
+        shared.
+    """
+    copied = []
+    for item in result_set:
+        if isinstance(item, ResultFile):
+            fd, path = tempfile.mkstemp(prefix='eoxs_spool_')
+            os.close(fd)
+            os.remove(path)
+            try:
+                os.link(item.path, path)
+            except (OSError, AttributeError):
+                shutil.copyfile(item.path, path)
+            item = ResultFile(
+                path, item.content_type, item.filename, item.identifier
+            )
+        copied.append(item)
+    return copied
+
+
+def delete_result_set(result_set):
+    """ Delete all items of the result set, ignoring any errors.
+    """
+    for item in result_set:
+        try:
+            item.delete()
+        except:
+            pass
+
+
+def _spool(data):
+    """ Write the data to a temporary file and return its path.
+    """
+    fd, path = tempfile.mkstemp(prefix='eoxs_spool_')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
@@ -0,0 +1,243 @@
+# ------------------------------------------------------------------------------
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+# ------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# ------------------------------------------------------------------------------
+
+
+
+""" Coalescing of identical concurrent requests.
+
+    Of all concurrent calls with the same key, only the first one is executed,
+    while the others wait for it and share its result (or exception). Within a
+    process, the calls are coordinated by threads. Across worker processes,
+    the calls can additionally be coordinated through one of the configured
+    Django ``CACHES``, via the ``EOXS_SINGLE_FLIGHT`` setting::
+
+        EOXS_SINGLE_FLIGHT = {
+            'alias': 'default',
+            'timeout': 60,
+            'result_timeout': 10,
+        }
+
+    The ``alias`` has to refer to a cache shared by all workers (e.g:
+    memcached or Redis), for which the ``add`` operation is atomic. Calls
+    waiting longer than ``timeout`` seconds are executed on their own.
+    Results are kept in the cache for ``result_timeout`` seconds only, to be
+    picked up by the waiting workers. Results that cannot be stored (e.g: as
+    they exceed the size limit of the cache) are rendered again by the
+    waiting workers. Set ``EOXS_SINGLE_FLIGHT = None`` to disable the
+    coalescing.
+"""
+
+import json
+import time
+import hashlib
+from uuid import uuid4
+from threading import Lock, Event
+
+from django.conf import settings
+from django.core.cache import caches
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EOXS_SINGLE_FLIGHT = {
+    'alias': None,
+    'timeout': 60,
+}
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.exception = None
+        self.waiters = 0
+        self.copies = []
+
+
+class SingleFlight(object):
+    """ Executes a function only once for all concurrent calls with the same
+        key.
+
+        :param alias: the Django cache to coordinate worker processes or
+                      ``None`` to only coordinate the threads of this process
+        :param timeout: the maximum time in seconds to wait for another call
+        :param result_timeout: the time in seconds results are kept in the
+                               cache for waiting workers
+        :param poll_interval: the interval in seconds to poll the cache for the
+                              result of another worker
+    """
+
+    def __init__(self, alias=None, timeout=60, result_timeout=10,
+                 poll_interval=0.05, key_prefix='eoxs_single_flight'):
+        self.alias = alias
+        self.timeout = timeout
+        self.result_timeout = result_timeout
+        self.poll_interval = poll_interval
+        self.key_prefix = key_prefix
+        self._calls = {}
+        self._lock = Lock()
+
+    def get_key(self, params):
+        """ Compute the key for the given JSON serializable parameters.
+        """
+        serialized = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def do(self, params, func, copy=None):
+        """ Call ``func`` for the request identified by ``params``, unless an
+            identical call is already in flight, whose result is then
+            returned instead.
+
+            Results that can only be consumed once (e.g: temporary files) can
+            be passed to each waiting call via an own copy, created by the
+            ``copy`` function. Such results are only shared within the
+            process and are never stored in the cache shared with other
+            workers, so that they are neither read into memory nor
+            serialized.
+        """
+        key = self.get_key(params)
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not is_leader:
+            return self._wait(key, call, func, copy)
+
+        try:
+            if copy is None:
+                call.result = self._do_shared(key, func)
+            else:
+                call.result = func()
+            return call.result
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            if copy is not None and call.exception is None:
+                try:
+                    call.copies = [
+                        copy(call.result) for _ in range(call.waiters)
+                    ]
+                except Exception:
+                    # the waiting calls will execute on their own
+                    logger.exception('Failed to copy result of %s' % key)
+            call.event.set()
+
+    def _wait(self, key, call, func, copy):
+        """ Wait for the leading call and return its result.
+        """
+        if not call.event.wait(self.timeout):
+            with self._lock:
+                timed_out = self._calls.get(key) is call
+                if timed_out:
+                    call.waiters -= 1
+            if timed_out:
+                logger.debug('Timed out waiting for call %s' % key)
+                return func()
+            # the leading call finished in between
+            call.event.wait()
+
+        if call.exception is not None:
+            raise call.exception
+        elif copy is None:
+            return call.result
+
+        with self._lock:
+            result = call.copies.pop() if call.copies else None
+        return result if result is not None else func()
+
+    def _do_shared(self, key, func):
+        """ Coordinate the call with the other worker processes.
+        """
+        if self.alias is None:
+            return func()
+
+        cache = caches[self.alias]
+        lock_key = '%s_lock:%s' % (self.key_prefix, key)
+        result_key = '%s_result:%s' % (self.key_prefix, key)
+        token = uuid4().hex
+        deadline = time.time() + self.timeout
+        waited = False
+
+        while not cache.add(lock_key, token, self.timeout):
+            waited = True
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            elif time.time() > deadline:
+                logger.debug('Timed out waiting for worker call %s' % key)
+                return func()
+            time.sleep(self.poll_interval)
+
+        try:
+            # the other worker may have finished in between the polls
+            result = cache.get(result_key) if waited else None
+            if result is None:
+                result = func()
+                cache.set(result_key, result, self.result_timeout)
+            return result
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+
+SINGLE_FLIGHT = None
+SINGLE_FLIGHT_CONFIGURED = False
+
+
+def get_single_flight():
+    """ Get the configured :class:`SingleFlight` or ``None`` if coalescing is
+        disabled.
+    """
+    global SINGLE_FLIGHT, SINGLE_FLIGHT_CONFIGURED
+    if not SINGLE_FLIGHT_CONFIGURED:
+        flight_config = getattr(
+            settings, 'EOXS_SINGLE_FLIGHT', DEFAULT_EOXS_SINGLE_FLIGHT
+        )
+        if flight_config is not None:
+            SINGLE_FLIGHT = SingleFlight(**flight_config)
+        SINGLE_FLIGHT_CONFIGURED = True
+
+    return SINGLE_FLIGHT
+
+
+def single_flight(params, func, copy=None):
+    """ Call ``func`` through the configured :class:`SingleFlight`, or
+        directly when coalescing is disabled.
+    """
+    flight = get_single_flight()
+    if flight is None:
+        return func()
+    return flight.do(params, func, copy)
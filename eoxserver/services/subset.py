@@ -26,6 +26,7 @@
 #-------------------------------------------------------------------------------
 
 
+from math import floor, ceil
 import logging
 import operator
 
@@ -33,6 +34,7 @@ from django.contrib.gis.geos import Polygon, LineString
 
 from eoxserver.core.config import get_eoxserver_config
 from eoxserver.core.decoders import config, enum
+from eoxserver.core.util.rect import Rect
 from eoxserver.contrib.osr import SpatialReference
 from eoxserver.resources.coverages import crss
 from eoxserver.services.exceptions import (
@@ -438,6 +440,65 @@ class Subsets(list):
 
         return bbox
 
+    def pixel_rect(self, size, geotransform, srid=None):
+        """ Returns the pixel window selected by the X and Y subsets on a grid
+            of the given size and geotransform. Subsets in another CRS than
+            the one of the grid are transformed first. Open bounds default to
+            the grid. The window is not clipped to the grid.
+
+        :param size: the size of the grid as a pair of integers
+        :param geotransform: the GDAL style geotransform of the grid
+        :param srid: the SRID of the CRS of the grid
+        :returns: the selected :class:`Rect <eoxserver.core.util.rect.Rect>`
+        """
+        size_x, size_y = size
+        minx, miny, maxx, maxy = self.xy_bbox
+        subset_srid = self.srid
+
+        # pixel subset
+        if subset_srid is None:
+            minx = int(minx) if minx is not None else 0
+            miny = int(miny) if miny is not None else 0
+            maxx = int(maxx) if maxx is not None else size_x - 1
+            maxy = int(maxy) if maxy is not None else size_y - 1
+
+            return Rect(minx, miny, maxx - minx + 1, maxy - miny + 1)
+
+        gt = geotransform
+        x_a, x_b = gt[0], gt[0] + gt[1] * size_x
+        y_a, y_b = gt[3], gt[3] + gt[5] * size_y
+        extent = (min(x_a, x_b), min(y_a, y_b), max(x_a, x_b), max(y_a, y_b))
+        reproject = srid is not None and srid != subset_srid
+
+        # fill open subset bounds with the grid extent
+        if reproject:
+            extent_polygon = Polygon.from_bbox(extent)
+            extent_polygon.srid = srid
+            extent = extent_polygon.transform(subset_srid, True).extent
+
+        bbox = [
+            value if value is not None else default
+            for value, default in zip((minx, miny, maxx, maxy), extent)
+        ]
+
+        if reproject:
+            polygon = Polygon.from_bbox(bbox)
+            polygon.srid = subset_srid
+            bbox = polygon.transform(srid, True).extent
+
+        x_a = (bbox[0] - gt[0]) / gt[1]
+        x_b = (bbox[2] - gt[0]) / gt[1]
+        y_a = (bbox[1] - gt[3]) / gt[5]
+        y_b = (bbox[3] - gt[3]) / gt[5]
+
+        offset_x = int(floor(min(x_a, x_b)))
+        offset_y = int(floor(min(y_a, y_b)))
+        return Rect(
+            offset_x, offset_y,
+            max(int(ceil(max(x_a, x_b))) - offset_x, 1),
+            max(int(ceil(max(y_a, y_b))) - offset_y, 1)
+        )
+
     def bounding_polygon(self, coverage):
         """ Returns a minimum bounding :class:`django.contrib.gis.geos.Polygon`
         for the given :class:`Coverage
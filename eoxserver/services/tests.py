@@ -26,16 +26,88 @@
 #-------------------------------------------------------------------------------
 
 from textwrap import dedent
+import _ast
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
 
+import numpy as np
+from django.db import connection
+from django.db.models import Q
 from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.gis.geos import Polygon, MultiPolygon
-from django.utils.six import assertCountEqual, b
+from django.utils.six import assertCountEqual, b, BytesIO
+from django.utils.six.moves.configparser import RawConfigParser
 
 from eoxserver.core.util import multiparttools as mp
 from eoxserver.core.util.timetools import parse_iso8601
 from eoxserver.core.config import get_eoxserver_config
+from eoxserver.core.util.rect import Rect
+from eoxserver.contrib import gdal, osr, vrt
+from eoxserver.render.coverage.objects import (
+    RangeType, Field, Coverage, Grid, Axis, Origin, EOMetadata,
+    ArraydataLocation
+)
+from eoxserver.render.browse.objects import (
+    Browse, Mask, GeneratedBrowse, MASK_GEOMETRY_CACHE,
+    BROWSE_MODE_RGB, BROWSE_MODE_RGBA, BROWSE_MODE_GRAYSCALE
+)
+from eoxserver.render.browse.generate import (
+    FilenameGenerator, parse_expression, compile_expressions,
+    get_expression_plan, function_map
+)
+from eoxserver.render.browse.util import (
+    _group_fields, _intersects, _get_bbox_footprint, get_overview_level
+)
+from eoxserver.render.map import cache as map_cache_module
+from eoxserver.render.mapserver.factories import _split_browse_mosaic_runs
+from eoxserver.render.map.cache import DiskMapCache
 from eoxserver.services.subset import Subsets, Trim, Slice
-from eoxserver.services.result import result_set_from_raw_data
+from eoxserver.services.result import (
+    result_set_from_raw_data, spooled_result_set_from_raw_data,
+    copy_result_set, delete_result_set, ResultBuffer
+)
+from eoxserver.services.singleflight import SingleFlight
+from eoxserver.services.exceptions import (
+    RenderException, ServiceUnavailableException
+)
+from eoxserver.services.ows.wcs.admission import (
+    estimate_output_size, ConcurrencyLimiter
+)
+from eoxserver.services.ows.wcs.v20.parameters import (
+    WCS20CoverageRenderParams
+)
+from eoxserver.services.ows.wcs.v20.packages.tar import TarPackageWriter
+from eoxserver.services.gdal.wcs.rectified_coverage_renderer import (
+    GDALRectifiedCoverageRenderer
+)
+from eoxserver.services.gdal.wcs.referenceable_dataset_renderer import (
+    _get_encoding_options
+)
+from eoxserver.services.ows.wcs.v20.encodings.geotiff import is_cog_format
+from eoxserver.services.ows.wcs.v20.util import (
+    ScaleSize, ScaleAxis, RangeSubset, get_scaled_size
+)
+from eoxserver.services.ows.wmts.tilematrixsets import (
+    WEB_MERCATOR_QUAD, WORLD_CRS84_QUAD
+)
+from eoxserver.services.ows.wmts import tiles as tiles_module
+from eoxserver.services.ows.wmts.tiles import iter_metatile_ranges
+from eoxserver.services.ows.wms.parsing import parse_time
+from eoxserver.resources.coverages.management.commands.mapcache import (
+    get_time_intervals
+)
+from eoxserver.services.ows.wms.featureinfo import encode_feature_info
+from eoxserver.services.ows.wms import capabilitiescache
+from eoxserver.services.ows.wmts.vectortiles import is_vector_layer
+from eoxserver.services.ows.wms.layermapper import (
+    NoSuchLayer, LayerMapper, _lookup_coverages_bulk, _cull_occluded,
+    _get_bbox_polygon, _get_browse_opaque_footprint
+)
 from eoxserver.resources.coverages import models
 
 
@@ -134,6 +206,25 @@ class ResultSetTestCase(TestCase):
         )
 
 
+    def test_spooled_result_set_from_raw(self):
+        result_set = spooled_result_set_from_raw_data(self.example_multipart)
+        copied = copy_result_set(result_set)
+        try:
+            self.assertEqual(len(result_set), 2)
+            self.assertEqual(
+                b"".join(result_set[0].chunked(8)),
+                b"This is the body of the message."
+            )
+            self.assertEqual(result_set[0].filename, b"message.msg")
+
+            delete_result_set(result_set)
+            self.assertFalse(os.path.exists(result_set[0].path))
+            self.assertEqual(
+                copied[0].data, b"This is the body of the message."
+            )
+        finally:
+            delete_result_set(result_set + copied)
+
 class TemporalSubsetsTestCase(TransactionTestCase):
     def setUp(self):
         """ Set up a couple of test datasets to be distributed along the time
@@ -738,3 +829,1293 @@ class TemporalSubsetsTestCase(TransactionTestCase):
         self.evaluate_subsets(
             self.make_subsets("2000-01-01T00:00:40Z"), "contains", ("H",)
         )
+
+
+class LayerMapperQueryCountTestCase(TestCase):
+    """ Test that the product iteration of the layer mapper resolves each
+        layer in a constant number of queries, regardless of the number of
+        products.
+    """
+
+    def setUp(self):
+        self.product_type = models.ProductType.objects.create(name="PT")
+        self.browse_type = models.BrowseType.objects.create(
+            product_type=self.product_type, name="TCI"
+        )
+        self.mask_type = models.MaskType.objects.create(
+            product_type=self.product_type, name="clouds"
+        )
+        self.collection = models.Collection.objects.create(identifier="C")
+        self.mapper = LayerMapper(None, "__")
+        self.product_count = 0
+
+    def add_products(self, count):
+        products = []
+        for _ in range(count):
+            self.product_count += 1
+            product = models.Product.objects.create(
+                identifier="P%d" % self.product_count,
+                product_type=self.product_type,
+                footprint=MultiPolygon(Polygon.from_bbox((0, 0, 5, 5))),
+                begin_time=parse_iso8601("2000-01-01T00:00:00Z"),
+                end_time=parse_iso8601("2000-01-01T00:00:05Z"),
+            )
+            product.collections.add(self.collection)
+            for browse_type in (None, self.browse_type):
+                models.Browse.objects.create(
+                    product=product, browse_type=browse_type,
+                    location="browse.tif", coordinate_reference_system="4326",
+                    min_x=0, min_y=0, max_x=5, max_y=5, width=100, height=100
+                )
+            models.Mask.objects.create(
+                product=product, mask_type=self.mask_type,
+                location="mask.shp"
+            )
+            products.append(product)
+        return products
+
+    def iterate(self, suffix):
+        """ Iterate the products like ``LayerMapper.lookup_layer`` does for
+            the given suffix and access all related objects.
+        """
+        args = (self.collection, Q(), None)
+        if suffix in ('', 'outlined'):
+            items = self.mapper.iter_products_browses(*args)
+        elif suffix.startswith('outlines_masked_'):
+            items = self.mapper.iter_products_browses_masks(
+                *args, name=suffix[len('outlines_masked_'):]
+            )
+        elif suffix.startswith('masked_'):
+            items = self.mapper.iter_products_browses_masks(
+                *args, name=suffix[len('masked_'):]
+            )
+        else:
+            items = self.mapper.iter_products_browses(*args, name=suffix)
+
+        for item in items:
+            for obj in item[1:]:
+                if isinstance(obj, (models.Browse, models.Mask)):
+                    obj.storage
+                    getattr(obj, 'browse_type', None)
+                    getattr(obj, 'mask_type', None)
+
+    def count_queries(self, suffix):
+        with CaptureQueriesContext(connection) as context:
+            self.iterate(suffix)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, suffix):
+        self.add_products(2)
+        few = self.count_queries(suffix)
+        self.add_products(20)
+        many = self.count_queries(suffix)
+        self.assertEqual(few, many)
+
+    def test_default(self):
+        self.assertConstantQueries('')
+
+    def test_outlined(self):
+        self.assertConstantQueries('outlined')
+
+    def test_browse_type(self):
+        self.assertConstantQueries('TCI')
+
+    def test_masked(self):
+        self.assertConstantQueries('masked_clouds')
+
+    def test_outlines_masked(self):
+        self.assertConstantQueries('outlines_masked_clouds')
+
+    def test_lookup_coverages_bulk(self):
+        grid = models.Grid.objects.create(
+            coordinate_reference_system='EPSG:4326',
+            axis_1_name='long', axis_2_name='lat',
+            axis_1_type=0, axis_2_type=0,
+            axis_1_offset=5/100, axis_2_offset=5/100,
+        )
+        coverage_types = []
+        for name, identifiers in (("A", ("B01", "B02")), ("B", ("B03",))):
+            coverage_type = models.CoverageType.objects.create(name=name)
+            for index, identifier in enumerate(identifiers):
+                models.FieldType.objects.create(
+                    coverage_type=coverage_type, index=index,
+                    identifier=identifier
+                )
+            coverage_types.append(coverage_type)
+
+        def lookup(products):
+            for product in products:
+                for coverage_type in coverage_types:
+                    models.Coverage.objects.create(
+                        identifier="%s_%s" % (
+                            product.identifier, coverage_type.name
+                        ),
+                        parent_product=product, coverage_type=coverage_type,
+                        grid=grid, axis_1_size=100, axis_2_size=100,
+                        axis_1_origin=0, axis_2_origin=0,
+                    )
+
+            with CaptureQueriesContext(connection) as context:
+                result = _lookup_coverages_bulk(products, ["B01", "B03"])
+            return result, len(context.captured_queries)
+
+        few_result, few = lookup(self.add_products(2))
+        many_result, many = lookup(self.add_products(20))
+        self.assertEqual(few, many)
+        self.assertEqual(len(many_result), 20)
+
+        for product_id, (coverages, fields_and_coverages) in \
+                many_result.items():
+            self.assertEqual(len(coverages), 2)
+            self.assertEqual(
+                [c.coverage_type.name for c in fields_and_coverages["B01"]],
+                ["A"]
+            )
+            self.assertEqual(
+                [c.coverage_type.name for c in fields_and_coverages["B03"]],
+                ["B"]
+            )
+
+
+class ProductDeduplicationTestCase(TestCase):
+    """ Test that only the most recent product per tile is kept.
+    """
+
+    def setUp(self):
+        self.collection = models.Collection.objects.create(identifier="C")
+        self.mapper = LayerMapper(None, "__")
+
+    def add_product(self, identifier, begin_time, track=None, frame=None):
+        product = models.Product.objects.create(
+            identifier=identifier,
+            footprint=MultiPolygon(Polygon.from_bbox((0, 0, 5, 5))),
+            begin_time=parse_iso8601(begin_time),
+            end_time=parse_iso8601(begin_time),
+        )
+        product.collections.add(self.collection)
+        if track or frame:
+            models.ProductMetadata.objects.create(
+                product=product,
+                track=models.Track.objects.get_or_create(value=track)[0],
+                frame=models.Frame.objects.get_or_create(value=frame)[0],
+            )
+
+    def test_dedup(self):
+        self.add_product("A1", "2000-01-01T00:00:00Z", "1", "A")
+        self.add_product("A2", "2000-01-03T00:00:00Z", "1", "A")
+        self.add_product("A3", "2000-01-02T00:00:00Z", "1", "A")
+        self.add_product("B1", "2000-01-01T00:00:00Z", "1", "B")
+        self.add_product("C1", "2000-01-01T00:00:00Z", "2", "A")
+        self.add_product("N1", "2000-01-04T00:00:00Z")
+        self.add_product("N2", "2000-01-05T00:00:00Z")
+
+        products = self.mapper.iter_products(
+            self.collection, Q(), dedup_fields=("track", "frame")
+        )
+        self.assertEqual(
+            [product.identifier for product in products],
+            ["N2", "N1", "A2", "B1", "C1"]
+        )
+
+
+class VectorTileTestCase(TestCase):
+    """ Test which layers are available as vector tiles.
+    """
+
+    def test_vector_layers(self):
+        self.assertTrue(is_vector_layer("C__outlines"))
+        self.assertTrue(is_vector_layer("C__outlined"))
+        self.assertTrue(is_vector_layer("C__outlines_masked_clouds"))
+        self.assertFalse(is_vector_layer("C"))
+        self.assertFalse(is_vector_layer("C__masked_clouds"))
+        self.assertFalse(is_vector_layer("C__density"))
+
+
+class FeatureInfoTestCase(TestCase):
+    """ Test the lookup and encoding of feature info results from the
+        database.
+    """
+
+    def test_feature_info(self):
+        collection = models.Collection.objects.create(identifier="C")
+        for identifier, bbox in (("A", (0, 0, 10, 10)), ("B", (5, 5, 15, 15))):
+            product = models.Product.objects.create(
+                identifier=identifier,
+                footprint=MultiPolygon(Polygon.from_bbox(bbox)),
+                begin_time=parse_iso8601("2000-01-01T00:00:00Z"),
+                end_time=parse_iso8601("2000-01-01T00:00:00Z"),
+            )
+            product.collections.add(collection)
+
+        mapper = LayerMapper(None, "__")
+        products = list(mapper.lookup_features(
+            "C", Q(footprint__intersects=Polygon.from_bbox((1, 1, 2, 2))),
+            limit=10
+        ))
+        self.assertEqual([p.identifier for p in products], ["A"])
+
+        result, content_type = encode_feature_info(
+            "application/json", [("C__outlines", products)]
+        )
+        self.assertEqual(content_type, "application/json")
+        features = json.loads(result.decode('utf-8'))["features"]
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]["id"], "A")
+        self.assertEqual(
+            features[0]["properties"]["begin_time"], "2000-01-01T00:00:00Z"
+        )
+
+    def test_suffix(self):
+        product_type = models.ProductType.objects.create(name="PT")
+        models.BrowseType.objects.create(name="", product_type=product_type)
+        models.BrowseType.objects.create(
+            name="TRUE", product_type=product_type
+        )
+        mask_type = models.MaskType.objects.create(
+            name="clouds", product_type=product_type
+        )
+        collection_type = models.CollectionType.objects.create(name="CT")
+        collection_type.allowed_product_types.add(product_type)
+        collection = models.Collection.objects.create(
+            identifier="C", collection_type=collection_type
+        )
+
+        footprint = MultiPolygon(Polygon.from_bbox((0, 0, 10, 10)))
+        # A can generate browses of its product type, but is masked out
+        product_a = models.Product.objects.create(
+            identifier="A", product_type=product_type, footprint=footprint
+        )
+        models.Mask.objects.create(
+            product=product_a, mask_type=mask_type, location="",
+            geometry=Polygon.from_bbox((0, 0, 10, 10))
+        )
+        # B has no product type, but a stored default browse
+        product_b = models.Product.objects.create(
+            identifier="B", footprint=footprint
+        )
+        models.Browse.objects.create(
+            product=product_b, location="b.tif",
+            coordinate_reference_system="EPSG:4326", width=10, height=10,
+            min_x=0, min_y=0, max_x=10, max_y=10
+        )
+        for product in (product_a, product_b):
+            product.collections.add(collection)
+
+        pixel = Polygon.from_bbox((1, 1, 2, 2))
+        pixel.srid = 4326
+        mapper = LayerMapper(None, "__")
+
+        def lookup(suffix):
+            return sorted(
+                product.identifier
+                for product in mapper.lookup_features(
+                    "C", Q(footprint__intersects=pixel), limit=10,
+                    suffix=suffix, pixel=pixel
+                )
+            )
+
+        self.assertEqual(lookup(""), ["A", "B"])
+        self.assertEqual(lookup("outlines"), ["A", "B"])
+        self.assertEqual(lookup("TRUE"), ["A"])
+        self.assertEqual(lookup("clouds"), ["A"])
+        self.assertEqual(lookup("masked_clouds"), ["B"])
+        self.assertEqual(lookup("outlines_masked_clouds"), ["B"])
+        with self.assertRaises(NoSuchLayer):
+            lookup("invalid")
+
+
+class DensityLayerTestCase(TestCase):
+    """ Test the binning of product footprints into density grid cells.
+    """
+
+    def test_density(self):
+        collection = models.Collection.objects.create(identifier="C")
+        for i, bbox in enumerate([
+                (10, 10, 11, 11), (10.5, 10.5, 11.5, 11.5),
+                (-100, -50, -99, -49)]):
+            product = models.Product.objects.create(
+                identifier="P%d" % i,
+                footprint=MultiPolygon(Polygon.from_bbox(bbox)),
+            )
+            product.collections.add(collection)
+
+        layer = LayerMapper(None, "__").make_density_layer(
+            "C__density", None, collection, Q(), (-180, -90, 180, 90),
+            "EPSG:4326", 45.0 / 4
+        )
+        self.assertEqual(layer.extent, (-180, -90, 180, 90))
+        self.assertEqual(layer.size, (8, 4))
+        self.assertEqual(layer.counts, {(4, 1): 2, (1, 3): 1})
+
+    def test_layer_description(self):
+        collection = models.Collection.objects.create(identifier="C")
+        product = models.Product.objects.create(identifier="P")
+        mapper = LayerMapper(None, "__")
+
+        def get_sub_layer_names(eo_object):
+            description = mapper.get_layer_description(eo_object, [], [])
+            return [sub_layer.name for sub_layer in description.sub_layers]
+
+        self.assertIn("C__density", get_sub_layer_names(collection))
+        self.assertNotIn("P__density", get_sub_layer_names(product))
+
+
+def evaluate_expression(expr, fields_and_data):
+    """ Straightforward recursive evaluation of a parsed band expression,
+        as previously used to generate browses.
+    """
+    if isinstance(expr, _ast.Name):
+        return fields_and_data[expr.id]
+    elif isinstance(expr, _ast.BinOp):
+        left = evaluate_expression(expr.left, fields_and_data)
+        right = evaluate_expression(expr.right, fields_and_data)
+        return {
+            _ast.Add: np.add,
+            _ast.Sub: np.subtract,
+            _ast.Mult: np.multiply,
+            _ast.Div: np.true_divide,
+        }[type(expr.op)](left, right)
+    elif isinstance(expr, _ast.UnaryOp):
+        return -evaluate_expression(expr.operand, fields_and_data)
+    elif isinstance(expr, _ast.Call):
+        return function_map[expr.func.id](
+            evaluate_expression(expr.args[0], fields_and_data)
+        )
+    elif hasattr(_ast, 'Num') and isinstance(expr, _ast.Num):
+        return expr.n
+    return expr.value
+
+
+class ExpressionPlanTestCase(TestCase):
+    """ Test that compiled expression plans yield the same results as the
+        recursive evaluation of the band expressions.
+    """
+
+    width = 7
+    height = 10
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.fields_and_data = {
+            'B1': random.uniform(1, 100, (self.height, self.width)).astype(
+                np.float32
+            ),
+            'B2': random.uniform(1, 100, (self.height, self.width)).astype(
+                np.float32
+            ),
+        }
+
+    def evaluate(self, band_expressions, block_rows=3):
+        plan = compile_expressions(band_expressions)
+        bands = [
+            np.zeros((self.height, self.width), dtype=np.float32)
+            for _ in band_expressions
+        ]
+
+        def write_block(band_index, y_offset, data):
+            bands[band_index][y_offset:y_offset + data.shape[0]] = data
+
+        plan.evaluate(
+            self.fields_and_data, self.width, self.height, write_block,
+            block_rows=block_rows
+        )
+        return plan, bands
+
+    def assertEvaluatesEqual(self, band_expressions):
+        _, bands = self.evaluate(band_expressions)
+        for band_expression, band in zip(band_expressions, bands):
+            expected = evaluate_expression(
+                parse_expression(band_expression), self.fields_and_data
+            )
+            np.testing.assert_allclose(
+                band, np.broadcast_to(expected, band.shape), rtol=1e-5
+            )
+
+    def test_fields_and_constants(self):
+        self.assertEvaluatesEqual([
+            'B1', '5', 'B1 * 2 + 1', '2 * 3 + B1', '10 / B2'
+        ])
+
+    def test_unary(self):
+        self.assertEvaluatesEqual(['-B1', '-(2 * 3)', '-(B1 - B2) * -B2'])
+
+    def test_function_calls(self):
+        self.assertEvaluatesEqual([
+            'log10(B1 + 1)', 'sin(B1) * cos(B2)', 'exp(-B2 / 100)',
+            'unwrap(B1 / 10)'
+        ])
+
+    def test_common_subexpressions(self):
+        band_expressions = [
+            '(B1 - B2) / (B1 + B2)',
+            '(B1 - B2) * 2',
+            '(B1 + B2) / (B1 - B2) + (B1 - B2) / (B1 + B2)',
+        ]
+        self.assertEvaluatesEqual(band_expressions)
+
+        # subtraction, addition, both divisions, multiplication and the sum
+        plan, _ = self.evaluate(band_expressions)
+        self.assertEqual(len(plan.steps), 6)
+        self.assertEqual(plan.field_names, ['B1', 'B2'])
+
+    def test_blocks(self):
+        band_expressions = ['(B1 - B2) / (B1 + B2)', 'log(B1) * B2']
+        _, full = self.evaluate(band_expressions, block_rows=self.height)
+        for block_rows in (1, 3, 4):
+            _, bands = self.evaluate(band_expressions, block_rows=block_rows)
+            for band, expected in zip(bands, full):
+                np.testing.assert_array_equal(band, expected)
+
+    def test_cache(self):
+        self.assertIs(
+            get_expression_plan(['B1 + B2']), get_expression_plan(['B1 + B2'])
+        )
+
+
+class ConcurrentBrowseGenerationTestCase(TestCase):
+    """ Test the facilities used when generating browses in threads.
+    """
+
+    def test_filename_generator(self):
+        generator = FilenameGenerator('/vsimem/{index}_{uuid}.vrt')
+
+        def generate():
+            for _ in range(100):
+                generator.generate()
+
+        threads = [threading.Thread(target=generate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        filenames = generator.filenames
+        self.assertEqual(len(filenames), 400)
+        self.assertEqual(
+            sorted(int(filename[8:].split('_')[0]) for filename in filenames),
+            list(range(400))
+        )
+
+    def test_config_env(self):
+        key = 'EOXS_TEST_OPTION'
+        # by default the options are visible to all threads
+        with gdal.config_env({key: 'global'}):
+            self.assertEqual(os.environ.get(key), 'global')
+            self.assertEqual(gdal.GetConfigOption(key), 'global')
+        self.assertIsNone(os.environ.get(key))
+
+    def test_config_env_thread_local(self):
+        if gdal.SetThreadLocalConfigOption is None:
+            self.skipTest('Thread-local options are not supported.')
+
+        key = 'EOXS_TEST_OPTION'
+        entered = threading.Event()
+        exited = threading.Event()
+        values = []
+
+        def other():
+            with gdal.config_env({key: 'other'}, thread_local=True):
+                entered.set()
+                exited.wait(5)
+                values.append(gdal.GetConfigOption(key))
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        entered.wait(5)
+        # the option of the other thread is neither visible nor reset here
+        self.assertIsNone(gdal.GetConfigOption(key))
+        with gdal.config_env({key: 'main'}, thread_local=True):
+            self.assertEqual(gdal.GetConfigOption(key), 'main')
+            self.assertIsNone(os.environ.get(key))
+        exited.set()
+        thread.join()
+
+        self.assertEqual(values, ['other'])
+        self.assertIsNone(gdal.GetConfigOption(key))
+
+
+class WarpFieldsTestCase(TestCase):
+    """ Test the footprint pruning, the grouping of fields by file and the
+        overview selection when warping fields for generated browses.
+    """
+
+    def setUp(self):
+        range_type = RangeType('range_type', [
+            Field(
+                index, 'band%d' % (index + 1), '', '', '', '', None, [], [],
+                data_type, None
+            )
+            for index, data_type in enumerate(
+                (gdal.GDT_Byte, gdal.GDT_Byte, gdal.GDT_UInt16)
+            )
+        ])
+
+        def create_coverage(identifier, bbox):
+            footprint = MultiPolygon(Polygon.from_bbox(bbox))
+            footprint.srid = 4326
+            return Coverage(
+                identifier, EOMetadata(None, None, footprint), range_type,
+                None, None, None, [
+                    ArraydataLocation(identifier + '_rg.tif', {}, None, 0, 1),
+                    ArraydataLocation(identifier + '_b.tif', {}, None, 2, 2),
+                ], []
+            )
+
+        self.inside = create_coverage('inside', (0, 0, 10, 10))
+        self.outside = create_coverage('outside', (20, 20, 30, 30))
+        self.bbox_polygon = _get_bbox_footprint((0, 0, 10, 10), 4326)
+
+    def test_intersects(self):
+        self.assertTrue(_intersects(self.inside, self.bbox_polygon))
+        self.assertFalse(_intersects(self.outside, self.bbox_polygon))
+        # without a polygon or footprint coverages are never pruned
+        self.assertTrue(_intersects(self.outside, None))
+
+    def test_group_fields(self):
+        coverages = [self.inside, self.outside]
+        groups = _group_fields(
+            dict((name, coverages) for name in ('band1', 'band2', 'band3')),
+            ['band1', 'band2', 'band3'], self.bbox_polygon
+        )
+
+        self.assertEqual(len(groups), 2)
+        field_names, sources, data_type = groups[0]
+        self.assertEqual(field_names, ['band1', 'band2'])
+        self.assertEqual(data_type, gdal.GDT_Byte)
+        self.assertEqual(
+            [
+                [(location.path, band_index)
+                 for location, band_index in field_sources]
+                for field_sources in sources
+            ],
+            [[('inside_rg.tif', 1)], [('inside_rg.tif', 2)]]
+        )
+
+        field_names, sources, data_type = groups[1]
+        self.assertEqual(field_names, ['band3'])
+        self.assertEqual(data_type, gdal.GDT_UInt16)
+        location, band_index = sources[0][0]
+        self.assertEqual((location.path, band_index), ('inside_b.tif', 1))
+
+    def test_get_overview_level(self):
+        ds = gdal.GetDriverByName('MEM').Create(
+            '', 1000, 1000, 1, gdal.GDT_Byte
+        )
+        ds.SetGeoTransform([0, 0.01, 0, 10, 0, -0.01])
+        ds.SetProjection(osr.SpatialReference(4326).wkt)
+        self.assertIsNone(get_overview_level(ds, (0, 0, 10, 10), 4326, 250))
+
+        ds.BuildOverviews('NEAREST', [2, 4, 8])
+        self.assertEqual(get_overview_level(ds, (0, 0, 10, 10), 4326, 250), 1)
+        self.assertIsNone(get_overview_level(ds, (0, 0, 10, 10), 4326, 2000))
+
+
+class RangeTypeCacheTestCase(TestCase):
+    """ Test that range types are built once per coverage type and invalidated
+        when the coverage type or its fields change.
+    """
+
+    def setUp(self):
+        self.coverage_type = models.CoverageType.objects.create(name="RGB")
+        for index, identifier in enumerate(("red", "green", "blue")):
+            models.FieldType.objects.create(
+                coverage_type=self.coverage_type, index=index,
+                identifier=identifier
+            )
+
+    def test_cached(self):
+        range_type = RangeType.from_coverage_type(self.coverage_type)
+        self.assertEqual(len(range_type), 3)
+        with self.assertNumQueries(0):
+            self.assertIs(
+                RangeType.from_coverage_type(self.coverage_type), range_type
+            )
+
+    def test_invalidation(self):
+        range_type = RangeType.from_coverage_type(self.coverage_type)
+        models.FieldType.objects.create(
+            coverage_type=self.coverage_type, index=3, identifier="alpha"
+        )
+        new_range_type = RangeType.from_coverage_type(self.coverage_type)
+        self.assertIsNot(new_range_type, range_type)
+        self.assertEqual(len(new_range_type), 4)
+
+
+class MaskTestCase(TestCase):
+    """ Test the application of masks to footprints.
+    """
+
+    def tearDown(self):
+        MASK_GEOMETRY_CACHE.clear()
+
+    def test_apply(self):
+        geometry = Polygon.from_bbox((0, 0, 10, 10))
+        mask = Mask(geometry=geometry, pk=1)
+        validity_mask = Mask(geometry=geometry, validity=True, pk=2)
+
+        inside = Polygon.from_bbox((1, 1, 2, 2))
+        outside = Polygon.from_bbox((11, 11, 12, 12))
+        overlapping = Polygon.from_bbox((5, 5, 15, 15))
+
+        self.assertIsNone(mask.apply(inside))
+        self.assertEqual(mask.apply(outside), outside)
+        self.assertEqual(mask.apply(overlapping).area, 75)
+        self.assertEqual(validity_mask.apply(inside), inside)
+        self.assertIsNone(validity_mask.apply(outside))
+        self.assertEqual(validity_mask.apply(overlapping).area, 25)
+
+        self.assertEqual(len(MASK_GEOMETRY_CACHE), 2)
+
+    def test_invalidation(self):
+        product_type = models.ProductType.objects.create(name='PT')
+        mask_type = models.MaskType.objects.create(
+            name='clouds', product_type=product_type
+        )
+        product = models.Product.objects.create(
+            identifier='P', product_type=product_type
+        )
+        mask_model = models.Mask.objects.create(
+            product=product, mask_type=mask_type, location='',
+            geometry=Polygon.from_bbox((0, 0, 10, 10))
+        )
+        self.assertEqual(
+            Mask.from_model(mask_model, None).get_geometry().area, 100
+        )
+
+        # change the geometry without sending signals, as another process
+        # would
+        models.Mask.objects.filter(pk=mask_model.pk).update(
+            geometry=Polygon.from_bbox((0, 0, 5, 5))
+        )
+        mask_model = models.Mask.objects.get(pk=mask_model.pk)
+        self.assertEqual(
+            Mask.from_model(mask_model, None).get_geometry().area, 25
+        )
+
+        mask_model.delete()
+        self.assertEqual(len(MASK_GEOMETRY_CACHE), 0)
+
+
+class OcclusionCullingTestCase(TestCase):
+    """ Test that browses hidden by browses rendered above them are culled.
+    """
+
+    def cull(self, footprints, bbox=(0, 0, 10, 10), opaque=lambda fp: fp):
+        items = [Polygon.from_bbox(footprint) for footprint in footprints]
+        return [
+            tuple(int(v) for v in item.extent)
+            for item in _cull_occluded(
+                items, Polygon.from_bbox(bbox), lambda fp: fp, opaque
+            )
+        ]
+
+    def test_covered_footprint_dropped(self):
+        self.assertEqual(
+            self.cull([(0, 0, 6, 6), (1, 1, 5, 5), (4, 4, 8, 8)]),
+            [(0, 0, 6, 6), (4, 4, 8, 8)]
+        )
+
+    def test_covered_bbox(self):
+        self.assertEqual(
+            self.cull([(0, 0, 10, 5), (0, 5, 10, 10), (-5, -5, 15, 15)]),
+            [(0, 0, 10, 5), (0, 5, 10, 10)]
+        )
+
+    def test_outside_bbox_dropped(self):
+        self.assertEqual(
+            self.cull([(0, 0, 6, 6), (-5, -5, 12, 0.5), (20, 20, 25, 25)]),
+            [(0, 0, 6, 6), (-5, -5, 12, 0)]
+        )
+
+    def test_transparent(self):
+        self.assertEqual(
+            self.cull(
+                [(0, 0, 10, 10), (1, 1, 5, 5)], opaque=lambda fp: None
+            ),
+            [(0, 0, 10, 10), (1, 1, 5, 5)]
+        )
+
+    def test_generated_browse_alpha(self):
+        footprint = Polygon.from_bbox((0, 0, 10, 10))
+        rgb = GeneratedBrowse('rgb', ['B1', 'B2', 'B3'], [], {}, [], footprint)
+        rgba = GeneratedBrowse(
+            'rgba', ['B1', 'B2', 'B3', 'B4'], [], {}, [], footprint
+        )
+        self.assertEqual(_get_browse_opaque_footprint(rgb), footprint)
+        self.assertIsNone(_get_browse_opaque_footprint(rgba))
+
+    def test_bbox_polygon(self):
+        polygon = _get_bbox_polygon(
+            (0, 0, 1113194.9, 1118890.0), 'EPSG:3857'
+        )
+        self.assertEqual(polygon.srid, 4326)
+        self.assertEqual(
+            tuple(round(v) for v in polygon.extent), (0, 0, 10, 10)
+        )
+        self.assertIsNone(_get_bbox_polygon((0, 0, 1, 1), 'ESRI:54009'))
+
+
+class BrowseMosaicTestCase(TestCase):
+    """ Test the combination of browses into mosaic VRTs.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def browse(self, name, mode=BROWSE_MODE_RGB, env=None,
+               extent=(0, 0, 10, 10)):
+        return Browse(
+            name, '/vsimem/%s.tif' % name, env or {}, (10, 10), extent,
+            'EPSG:4326', mode, Polygon.from_bbox(extent)
+        )
+
+    def split(self, browses, min_count=2):
+        return [
+            (mosaic, [browse.name for browse in run_browses])
+            for mosaic, run_browses in _split_browse_mosaic_runs(
+                browses, min_count
+            )
+        ]
+
+    def create_file(self, name, band_count, extent):
+        filename = os.path.join(self.path, name)
+        ds = gdal.GetDriverByName('GTiff').Create(
+            filename, 10, 10, band_count, gdal.GDT_Byte
+        )
+        ds.SetGeoTransform(
+            [extent[0], (extent[2] - extent[0]) / 10.0, 0,
+             extent[3], 0, -(extent[3] - extent[1]) / 10.0]
+        )
+        ds.SetProjection(osr.SpatialReference(4326).wkt)
+        del ds
+        return filename
+
+    def test_split_runs(self):
+        self.assertEqual(
+            self.split([
+                self.browse('a'), self.browse('b'), self.browse('c'),
+                self.browse('d', BROWSE_MODE_RGBA),
+                self.browse('e', BROWSE_MODE_GRAYSCALE),
+                self.browse('f', BROWSE_MODE_GRAYSCALE),
+            ]), [
+                (True, ['a', 'b', 'c']),
+                (False, ['d']),
+                (True, ['e', 'f']),
+            ]
+        )
+
+    def test_split_runs_min_count(self):
+        self.assertEqual(
+            self.split([
+                self.browse('a'), self.browse('b'),
+                self.browse('c', BROWSE_MODE_GRAYSCALE),
+                self.browse('d', BROWSE_MODE_RGBA),
+            ], min_count=3), [
+                (False, ['a', 'b', 'c', 'd']),
+            ]
+        )
+
+    def test_split_runs_dateline(self):
+        self.assertEqual(
+            self.split([
+                self.browse('a'),
+                self.browse('b', extent=(170, 0, 190, 10)),
+                self.browse('c'), self.browse('d'),
+            ]), [
+                (False, ['a', 'b']),
+                (True, ['c', 'd']),
+            ]
+        )
+
+    def test_split_runs_env(self):
+        env_a = {'AWS_S3_ENDPOINT': 'a.example.com'}
+        env_b = {'AWS_S3_ENDPOINT': 'b.example.com'}
+        self.assertEqual(
+            self.split([
+                self.browse('a', env=env_a), self.browse('b', env=env_a),
+                self.browse('c', env=env_b), self.browse('d', env=env_b),
+                self.browse('e', env=dict(env_b)),
+            ]), [
+                (True, ['a', 'b']),
+                (True, ['c', 'd', 'e']),
+            ]
+        )
+
+    def test_build_mosaic(self):
+        first = self.create_file('first.tif', 3, (0, 0, 10, 10))
+        second = self.create_file('second.tif', 3, (5, 5, 15, 15))
+        save = os.path.join(self.path, 'mosaic.vrt')
+
+        out_ds, included = vrt.build_mosaic([first, second], {}, save)
+        self.assertEqual(included, [first, second])
+        self.assertEqual(out_ds.RasterCount, 3)
+        self.assertEqual(
+            (out_ds.RasterXSize, out_ds.RasterYSize), (15, 15)
+        )
+
+    def test_build_mosaic_skipped(self):
+        first = self.create_file('first.tif', 3, (0, 0, 10, 10))
+        second = self.create_file('second.tif', 1, (5, 5, 15, 15))
+        save = os.path.join(self.path, 'mosaic.vrt')
+
+        out_ds, included = vrt.build_mosaic([first, second], {}, save)
+        self.assertEqual(included, [first])
+
+
+class DiskMapCacheTestCase(TestCase):
+    """ Test the eviction and the invalidation of cached maps.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = DiskMapCache(self.path, max_size=10000)
+        map_cache_module.MAP_CACHE = self.cache
+        map_cache_module.MAP_CACHE_CONFIGURED = True
+
+    def tearDown(self):
+        map_cache_module.MAP_CACHE = None
+        map_cache_module.MAP_CACHE_CONFIGURED = False
+        shutil.rmtree(self.path)
+
+    def test_eviction(self):
+        for i in range(20):
+            key = '%08d' % i
+            self.cache.set(key, b'x' * 1000)
+            # enforce distinct access times
+            os.utime(self.cache._get_entry_path(key), (i, i))
+
+        self.assertIsNone(self.cache.get('%08d' % 0))
+        self.assertEqual(self.cache.get('%08d' % 19), b'x' * 1000)
+
+    def test_overwrite(self):
+        self.cache.set('%08d' % 0, b'x' * 1000)
+        size = self.cache._size
+        for _ in range(20):
+            self.cache.set('%08d' % 0, b'x' * 1000)
+
+        self.assertEqual(self.cache._size, size)
+        self.assertEqual(self.cache.get('%08d' % 0), b'x' * 1000)
+
+    def test_invalidation(self):
+        collection = models.Collection.objects.create(identifier="C")
+        key = self.cache.get_key({'layers': ['C']}, ['C'])
+        self.cache.set(key, b'map')
+        self.assertEqual(
+            self.cache.get(self.cache.get_key({'layers': ['C']}, ['C'])),
+            b'map'
+        )
+
+        product = models.Product.objects.create(identifier="P")
+        product.collections.add(collection)
+        self.assertNotEqual(
+            self.cache.get_key({'layers': ['C']}, ['C']), key
+        )
+
+    def test_seeded_tile(self):
+        collection = models.Collection.objects.create(identifier="C")
+        product = models.Product.objects.create(
+            identifier="P",
+            begin_time=parse_iso8601("2020-01-01T00:00:00Z"),
+            end_time=parse_iso8601("2020-01-02T00:00:00Z"),
+            footprint=MultiPolygon(Polygon.from_bbox((0, 0, 10, 10))),
+        )
+        product.collections.add(collection)
+
+        render_tiles = tiles_module.render_tiles
+        try:
+            # seed as the tilecache command does, with the default style and
+            # the product times from the database
+            tiles_module.render_tiles = lambda *args: {
+                (2, 0): (b'tile', 'image/png')
+            }
+            interval = list(get_time_intervals(collection))[0]
+            tiles_module.seed_tiles(
+                "C", "", WORLD_CRS84_QUAD, 1, (2, 0, 2, 0), 'image/png',
+                list(interval[:2])
+            )
+
+            def fail(*args):
+                self.fail("The seeded tile was rendered again.")
+
+            tiles_module.render_tiles = fail
+            self.assertEqual(
+                tiles_module.get_tile(
+                    "C", None, WORLD_CRS84_QUAD, 1, 2, 0, 'image/png',
+                    parse_time("2020-01-01T01:00:00+01:00/2020-01-02")
+                ),
+                (b'tile', 'image/png')
+            )
+        finally:
+            tiles_module.render_tiles = render_tiles
+
+
+class CapabilitiesCacheTestCase(TestCase):
+    """ Test the incremental re-computation of cached layer descriptions and
+        the invalidation of cached capabilities documents.
+    """
+
+    def setUp(self):
+        self.cache = capabilitiescache.CapabilitiesCache(
+            key_prefix='test_capabilities_%s' % id(self)
+        )
+        capabilitiescache.CAPABILITIES_CACHE = self.cache
+        capabilitiescache.CAPABILITIES_CACHE_CONFIGURED = True
+
+    def tearDown(self):
+        capabilitiescache.CAPABILITIES_CACHE = None
+        capabilitiescache.CAPABILITIES_CACHE_CONFIGURED = False
+
+    def get_layer_descriptions(self):
+        computed = []
+
+        def get_layer_description(eo_object):
+            computed.append(eo_object.identifier)
+            return eo_object.identifier
+
+        descriptions = self.cache.get_layer_descriptions(
+            models.EOObject.objects.order_by('identifier'),
+            get_layer_description, ['style']
+        )
+        return descriptions, computed
+
+    def test_layer_descriptions(self):
+        models.Collection.objects.create(identifier="A")
+        b = models.Collection.objects.create(identifier="B")
+
+        self.assertEqual(self.get_layer_descriptions(), (["A", "B"], ["A", "B"]))
+        self.assertEqual(self.get_layer_descriptions(), (["A", "B"], []))
+
+        b.begin_time = parse_iso8601("2000-01-01T00:00:00Z")
+        b.save()
+        self.assertEqual(self.get_layer_descriptions(), (["A", "B"], ["B"]))
+
+        models.ProductType.objects.create(name="PT")
+        self.assertEqual(self.get_layer_descriptions(), (["A", "B"], ["A", "B"]))
+
+    def test_document_invalidation(self):
+        params = {'version': '1.3', 'cql': None}
+        key = self.cache.get_document_key(params)
+        self.cache.set_document(key, b'<x/>', 'text/xml', '"etag"')
+        self.assertEqual(
+            self.cache.get_document(self.cache.get_document_key(params)),
+            (b'<x/>', 'text/xml', '"etag"')
+        )
+
+        models.Product.objects.create(identifier="P")
+        self.assertNotEqual(self.cache.get_document_key(params), key)
+
+    def test_config_digest(self):
+        config = RawConfigParser()
+        config.add_section('services.ows')
+        config.set('services.ows', 'title', 'Service')
+        digest = capabilitiescache.get_config_digest(config)
+
+        config.set('services.ows', 'title', 'Other service')
+        self.assertNotEqual(
+            capabilitiescache.get_config_digest(config), digest
+        )
+        config.set('services.ows', 'title', 'Service')
+        self.assertEqual(capabilitiescache.get_config_digest(config), digest)
+
+
+class SingleFlightTestCase(TestCase):
+    """ Test the coalescing of concurrent calls within a process.
+    """
+
+    def run_concurrently(self, flight, func, count=5, copy=None):
+        results = []
+
+        def call():
+            try:
+                results.append(flight.do(['key'], func, copy))
+            except ValueError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_coalescing(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b'result'
+
+        leader, results = self.run_concurrently(flight, func, 1)
+        started.wait(5)
+        followers, follower_results = self.run_concurrently(flight, func)
+        release.set()
+        for thread in leader + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results + follower_results, [b'result'] * 6)
+
+        # later calls are executed again
+        self.assertEqual(flight.do(['key'], lambda: b'other'), b'other')
+
+    def test_exception(self):
+        flight = SingleFlight()
+
+        def func():
+            raise ValueError('failed')
+
+        threads, results = self.run_concurrently(flight, func)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+    def test_copy(self):
+        # results that are copied must neither be shared through the
+        # worker cache nor be handed out to more than one call
+        flight = SingleFlight(alias='default')
+
+        def do_shared(key, func):
+            raise AssertionError('copied results must not be cached')
+
+        flight._do_shared = do_shared
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return ['result']
+
+        leader, results = self.run_concurrently(flight, func, 1, list)
+        started.wait(5)
+        followers, follower_results = self.run_concurrently(
+            flight, func, copy=list
+        )
+        release.set()
+        for thread in leader + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        all_results = results + follower_results
+        self.assertEqual(all_results, [['result']] * 6)
+        self.assertEqual(len(set(id(result) for result in all_results)), 6)
+
+
+class GDALRectifiedCoverageRendererTestCase(TestCase):
+    """ Test the mapping of WCS subsets and scales to GDAL parameters.
+    """
+
+    def setUp(self):
+        self.renderer = GDALRectifiedCoverageRenderer()
+        self.ds = gdal.GetDriverByName('MEM').Create('', 100, 50, 1)
+        self.ds.SetGeoTransform([10, 0.1, 0, 50, 0, -0.1])
+        self.coverage = Coverage(
+            'coverage', None, None, Grid(
+                'http://www.opengis.net/def/crs/EPSG/0/4326', [
+                    Axis('long', 'spatial', 0.1),
+                    Axis('lat', 'spatial', -0.1),
+                ]
+            ), [10, 50], [100, 50], [], []
+        )
+
+    def get_source_rect(self, subsets, crs):
+        return self.renderer.get_source_rect(
+            self.ds, self.coverage, Subsets(subsets, crs=crs)
+        )
+
+    def test_source_rect(self):
+        crs = 'http://www.opengis.net/def/crs/EPSG/0/4326'
+        self.assertEqual(self.get_source_rect([], crs), Rect(0, 0, 100, 50))
+        self.assertEqual(
+            self.get_source_rect([Trim('x', 10, 19), Trim('y', 5, 9)], None),
+            Rect(10, 5, 10, 5)
+        )
+        self.assertEqual(
+            self.get_source_rect(
+                [Trim('long', 11, 12), Trim('lat', 48, 49)], crs
+            ),
+            Rect(10, 10, 10, 10)
+        )
+        # clipped to the image
+        self.assertEqual(
+            self.get_source_rect([Trim('long', 19, 30)], crs),
+            Rect(90, 0, 10, 50)
+        )
+        with self.assertRaises(RenderException):
+            self.get_source_rect([Trim('long', 30, 40)], crs)
+
+    def test_scaled_size(self):
+        self.assertEqual(get_scaled_size(100, 50), (100, 50))
+        self.assertEqual(get_scaled_size(100, 50, 2), (50, 25))
+        self.assertEqual(
+            get_scaled_size(100, 50, None, [
+                ScaleSize('x', 10), ScaleAxis('y', 0.5)
+            ]),
+            (10, 100)
+        )
+
+
+class GeoTIFFEncodingTestCase(TestCase):
+    """ Test the GDAL driver and creation options for GeoTIFF encodings.
+    """
+
+    def test_is_cog_format(self):
+        self.assertFalse(is_cog_format(None))
+        self.assertFalse(is_cog_format('image/tiff'))
+        self.assertTrue(is_cog_format('image/tiff;profile=COG'))
+        self.assertTrue(is_cog_format(
+            'image/tiff; application=geotiff; profile=cloud-optimized'
+        ))
+
+    def test_encoding_options(self):
+        self.assertEqual(
+            _get_encoding_options({
+                'compression': 'LZW', 'predictor': 'Horizontal', 'cog': False,
+                'overview_resampling': None, 'blocksize': None,
+            }),
+            ('GTiff', ['COMPRESS=LZW', 'PREDICTOR=2'])
+        )
+        self.assertEqual(
+            _get_encoding_options({
+                'compression': 'Deflate', 'predictor': 'Horizontal',
+                'tiling': False, 'cog': True,
+                'overview_resampling': 'Average', 'blocksize': 256,
+            }),
+            ('COG', [
+                'COMPRESS=DEFLATE', 'PREDICTOR=STANDARD',
+                'OVERVIEW_RESAMPLING=AVERAGE', 'BLOCKSIZE=256'
+            ])
+        )
+
+
+class WCSAdmissionTestCase(TestCase):
+    """ Test the output size estimation and the concurrency limit of heavy
+        coverage requests.
+    """
+
+    def setUp(self):
+        fields = [
+            Field(
+                index, 'band%d' % index, '', '', '', '', None, [], [],
+                data_type, None
+            )
+            for index, data_type in enumerate(
+                (gdal.GDT_Byte, gdal.GDT_UInt16, gdal.GDT_Float32)
+            )
+        ]
+        self.coverage = Coverage(
+            'coverage', None, RangeType('range_type', fields), Grid(
+                'http://www.opengis.net/def/crs/EPSG/0/4326', [
+                    Axis('long', 'spatial', 0.1),
+                    Axis('lat', 'spatial', -0.1),
+                ]
+            ), Origin([10, 50]), [100, 50], [], []
+        )
+
+    def estimate(self, subsets=(), crs=None, **kwargs):
+        return estimate_output_size(WCS20CoverageRenderParams(
+            self.coverage, Subsets(subsets, crs=crs), **kwargs
+        ))
+
+    def test_estimate_output_size(self):
+        self.assertEqual(self.estimate(), (100, 50, 3, 100 * 50 * 7))
+        self.assertEqual(
+            self.estimate(
+                [Trim('long', 11, 12), Trim('lat', 48, 49)],
+                'http://www.opengis.net/def/crs/EPSG/0/4326'
+            ),
+            (10, 10, 3, 10 * 10 * 7)
+        )
+        self.assertEqual(
+            self.estimate(
+                [Trim('x', 0, 9)], rangesubset=RangeSubset(['band2']),
+                scales=[ScaleSize('y', 25)]
+            ),
+            (10, 25, 1, 10 * 25 * 4)
+        )
+
+    def test_limit(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, timeout=0)
+        self.assertTrue(limiter.is_heavy(0))
+        with limiter.limit():
+            with self.assertRaises(ServiceUnavailableException):
+                with limiter.limit():
+                    pass
+
+        # the slot is released again
+        with limiter.limit():
+            pass
+
+
+class TarPackageWriterTestCase(TestCase):
+    """ Test that the streamed tar packages are valid archives.
+    """
+
+    def test_iter_package(self):
+        writer = TarPackageWriter()
+        items = [
+            ('a/coverage.tif', ResultBuffer(b'a' * 1000)),
+            ('b/coverage.tif', ResultBuffer(b'b' * 10)),
+        ]
+        for format in ('application/x-tar', 'application/gzip'):
+            data = b''.join(writer.iter_package(iter(items), format, {}))
+            archive = tarfile.open(fileobj=BytesIO(data))
+            self.assertEqual(
+                [(info.name, info.size) for info in archive],
+                [('a/coverage.tif', 1000), ('b/coverage.tif', 10)]
+            )
+            self.assertEqual(
+                archive.extractfile('b/coverage.tif').read(), b'b' * 10
+            )
+
+
+class TileMatrixSetTestCase(TestCase):
+    """ Test the tile computations of the well-known tile matrix sets.
+    """
+
+    def test_scale_denominators(self):
+        self.assertAlmostEqual(
+            WEB_MERCATOR_QUAD.get_scale_denominator(0), 559082264.029, 2
+        )
+        self.assertAlmostEqual(
+            WORLD_CRS84_QUAD.get_scale_denominator(0), 279541132.014, 2
+        )
+
+    def test_tile_bbox(self):
+        self.assertEqual(WORLD_CRS84_QUAD.get_matrix_size(0), (2, 1))
+        self.assertEqual(
+            WORLD_CRS84_QUAD.get_tile_bbox(0, 1, 0), (0, -90, 180, 90)
+        )
+        self.assertEqual(
+            WORLD_CRS84_QUAD.get_tiles_bbox(1, 0, 0, 1, 1), (-180, -90, 0, 90)
+        )
+
+    def test_tile_range(self):
+        self.assertEqual(
+            WORLD_CRS84_QUAD.get_tile_range(2, (0, 0, 45, 45)), (4, 1, 4, 1)
+        )
+
+    def test_metatile_ranges(self):
+        self.assertEqual(
+            list(iter_metatile_ranges(
+                WEB_MERCATOR_QUAD, 3, (1, 1, 5, 2), 'image/png'
+            )),
+            [(0, 0, 3, 3), (4, 0, 7, 3)]
+        )
+        self.assertEqual(
+            list(iter_metatile_ranges(
+                WEB_MERCATOR_QUAD, 1, (0, 0, 1, 1), 'image/png'
+            )),
+            [(0, 0, 1, 1)]
+        )
@@ -96,7 +96,7 @@ setup(
         'django<3',
         'python-dateutil',
         'django-model-utils<4.0.0',
-        'zipstream',
+        'zipstream>=1.1.4',
         'psycopg2',
         'lxml',
         'pycql',
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+#
+# Micro-benchmark comparing the compiled, block-wise band expression
+# evaluation against the previous recursive evaluator.
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+#-------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#-------------------------------------------------------------------------------
+
+""" Usage: benchmark_band_expressions.py [size] [repetitions]
+
+Evaluates typical NDVI and false colour band expressions on random
+``size`` x ``size`` UInt16 fields and reports the best run time and the peak
+memory allocated by both evaluators.
+"""
+
+import sys
+import time
+import tracemalloc
+import _ast
+import operator
+
+import numpy as np
+
+from eoxserver.render.browse.generate import (
+    parse_expression, compile_expressions, function_map
+)
+
+
+EXPRESSIONS = {
+    'ndvi': ['(B08 - B04) / (B08 + B04)'],
+    'false colour': [
+        'B08 / 10000',
+        '(B08 - B04) / (B08 + B04)',
+        '(B08 + B04) / 20000',
+    ],
+    'enhanced natural colour': [
+        'log10(B04 + 1) * 2.5 + (B08 - B04) / (B08 + B04) * 0.1',
+        'log10(B03 + 1) * 2.5 + (B08 - B04) / (B08 + B04) * 0.1',
+        'log10(B02 + 1) * 2.5 + (B08 - B04) / (B08 + B04) * 0.1',
+    ],
+}
+
+
+LEGACY_OPERATORS = {
+    _ast.Add: operator.add,
+    _ast.Sub: operator.sub,
+    _ast.Div: operator.truediv,
+    _ast.Mult: operator.mul,
+}
+
+
+def legacy_evaluate(expr, fields_and_data):
+    """ The previous, recursive evaluator materializing every
+        subexpression for every band.
+    """
+    if isinstance(expr, _ast.Name):
+        return fields_and_data[expr.id]
+    elif isinstance(expr, _ast.BinOp):
+        return LEGACY_OPERATORS[type(expr.op)](
+            legacy_evaluate(expr.left, fields_and_data),
+            legacy_evaluate(expr.right, fields_and_data),
+        )
+    elif isinstance(expr, _ast.Call):
+        return function_map[expr.func.id](
+            legacy_evaluate(expr.args[0], fields_and_data)
+        )
+    elif hasattr(_ast, 'Num') and isinstance(expr, _ast.Num):
+        return expr.n
+    return expr.value
+
+
+def run_legacy(expressions, fields_and_data, size):
+    out = np.empty((len(expressions), size, size), dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, expression in enumerate(expressions):
+            out[i] = legacy_evaluate(
+                parse_expression(expression), fields_and_data
+            )
+    return out
+
+
+def run_compiled(expressions, fields_and_data, size):
+    out = np.empty((len(expressions), size, size), dtype=np.float32)
+
+    def write_block(band_index, y_offset, data):
+        out[band_index, y_offset:y_offset + data.shape[0]] = data
+
+    compile_expressions(expressions).evaluate(
+        fields_and_data, size, size, write_block
+    )
+    return out
+
+
+def measure(func, repetitions, *args):
+    best = None
+    for _ in range(repetitions):
+        start = time.time()
+        func(*args)
+        duration = time.time() - start
+        best = duration if best is None else min(best, duration)
+
+    # the peak includes the output array, which is the same for both
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(size=4096, repetitions=3):
+    fields_and_data = {
+        name: np.random.randint(0, 10000, (size, size)).astype(np.uint16)
+        for name in ('B02', 'B03', 'B04', 'B08')
+    }
+
+    print('%-25s %12s %12s %14s %14s' % (
+        'expressions', 'legacy [s]', 'compiled [s]',
+        'legacy [MiB]', 'compiled [MiB]'
+    ))
+    for name, expressions in EXPRESSIONS.items():
+        legacy_time, legacy_peak = measure(
+            run_legacy, repetitions, expressions, fields_and_data, size
+        )
+        compiled_time, compiled_peak = measure(
+            run_compiled, repetitions, expressions, fields_and_data, size
+        )
+        print('%-25s %12.3f %12.3f %14.1f %14.1f' % (
+            name, legacy_time, compiled_time,
+            legacy_peak / 2.0 ** 20, compiled_peak / 2.0 ** 20
+        ))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
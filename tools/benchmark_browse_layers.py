@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+#
+# Benchmark comparing the rendering of browse layers with one MapServer layer
+# per browse against rendering them as a single mosaic layer.
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+#-------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#-------------------------------------------------------------------------------
+
+""" Usage: DJANGO_SETTINGS_MODULE=<instance>.settings \
+           benchmark_browse_layers.py [counts] [repetitions]
+
+Creates ``counts`` (comma separated, default: 10,100,1000) overlapping
+synthetic RGB browses, renders a GetMap covering all of them with one
+MapServer layer per browse and as a single mosaic layer and reports the best
+run time of both modes.
+"""
+
+import sys
+import time
+import random
+import shutil
+import tempfile
+from os.path import join
+
+import django
+
+django.setup()
+
+from eoxserver.contrib import gdal
+from eoxserver.core.config import get_eoxserver_config
+from eoxserver.render.browse.objects import Browse, BROWSE_MODE_RGB
+from eoxserver.render.map.objects import Map, BrowseLayer
+from eoxserver.render.mapserver.map_renderer import MapserverMapRenderer
+
+
+BBOX = (0, 0, 20, 20)
+BROWSE_SIZE = 256
+
+
+def create_browses(directory, count):
+    """ Create ``count`` randomly placed RGB browses within ``BBOX``.
+    """
+    driver = gdal.GetDriverByName('GTiff')
+    random.seed(count)
+    browses = []
+    for i in range(count):
+        min_x = random.uniform(BBOX[0], BBOX[2] - 5)
+        min_y = random.uniform(BBOX[1], BBOX[3] - 5)
+        extent = (min_x, min_y, min_x + 5, min_y + 5)
+
+        filename = join(directory, 'browse_%d.tif' % i)
+        ds = driver.Create(
+            filename, BROWSE_SIZE, BROWSE_SIZE, 3, gdal.GDT_Byte,
+            ['TILED=YES']
+        )
+        ds.SetProjection('EPSG:4326')
+        ds.SetGeoTransform([
+            extent[0], 5. / BROWSE_SIZE, 0,
+            extent[3], 0, -5. / BROWSE_SIZE
+        ])
+        for index in range(1, 4):
+            ds.GetRasterBand(index).Fill(random.randint(1, 255))
+        ds.BuildOverviews('AVERAGE', [2, 4, 8])
+        ds = None
+
+        browses.append(Browse(
+            'browse_%d' % i, filename, {}, (BROWSE_SIZE, BROWSE_SIZE),
+            extent, 'EPSG:4326', BROWSE_MODE_RGB, None
+        ))
+    return browses
+
+
+def render(browses, mosaic):
+    config = get_eoxserver_config()
+    config.set(
+        'services.ows.wms', 'browse_mosaic', 'true' if mosaic else 'false'
+    )
+    map_ = Map(
+        layers=[BrowseLayer('browses', None, browses)],
+        width=512, height=512, format='image/png', bbox=BBOX,
+        crs='EPSG:4326'
+    )
+    return MapserverMapRenderer().render_map(map_)
+
+
+def best_time(func, repetitions):
+    times = []
+    for _ in range(repetitions):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(args):
+    counts = [int(v) for v in (args[0] if args else '10,100,1000').split(',')]
+    repetitions = int(args[1]) if len(args) > 1 else 3
+
+    config = get_eoxserver_config()
+    if not config.has_section('services.ows.wms'):
+        config.add_section('services.ows.wms')
+
+    directory = tempfile.mkdtemp()
+    try:
+        print('%8s %12s %12s %8s' % ('browses', 'layers [s]', 'mosaic [s]',
+                                    'speedup'))
+        for count in counts:
+            browses = create_browses(directory, count)
+            layers = best_time(lambda: render(browses, False), repetitions)
+            mosaic = best_time(lambda: render(browses, True), repetitions)
+            print('%8d %12.3f %12.3f %7.1fx' % (
+                count, layers, mosaic, layers / mosaic
+            ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
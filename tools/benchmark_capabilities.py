@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+#
+# Benchmark of the WMS GetCapabilities generation with and without the
+# capabilities cache.
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+#-------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#-------------------------------------------------------------------------------
+
+""" Usage: DJANGO_SETTINGS_MODULE=<instance>.settings \
+           benchmark_capabilities.py [count] [repetitions]
+
+Registers ``count`` (default: 10000) synthetic WMS-visible products with two
+browse types and one mask type in a collection and reports the best run time
+of a WMS 1.3 GetCapabilities request:
+
+ * without the capabilities cache
+ * with an empty capabilities cache
+ * with a cached document
+ * with cached layer descriptions, after one product was changed
+ * with a matching ``If-None-Match`` header
+
+All registered objects are removed afterwards.
+"""
+
+import sys
+import time
+
+import django
+
+django.setup()
+
+from django.db import transaction
+from django.test import RequestFactory
+from django.contrib.gis.geos import Polygon
+from django.utils.timezone import now
+
+from eoxserver.resources.coverages import models
+from eoxserver.services.models import ServiceVisibility
+from eoxserver.services.ows.wms import capabilitiescache
+from eoxserver.services.ows.wms.v13.handlers import WMS13GetCapabilitiesHandler
+
+
+class Rollback(Exception):
+    pass
+
+
+def register_products(count):
+    """ Register ``count`` products in a collection.
+    """
+    product_type = models.ProductType.objects.create(name='benchmark_pt')
+    models.BrowseType.objects.create(
+        product_type=product_type, name='TRUE_COLOR',
+        red_or_grey_expression='B1', green_expression='B2',
+        blue_expression='B3'
+    )
+    models.BrowseType.objects.create(
+        product_type=product_type, name='GRAY', red_or_grey_expression='B1'
+    )
+    models.MaskType.objects.create(product_type=product_type, name='clouds')
+    collection_type = models.CollectionType.objects.create(
+        name='benchmark_ct'
+    )
+    collection_type.allowed_product_types.add(product_type)
+    collection = models.Collection.objects.create(
+        identifier='benchmark_collection', collection_type=collection_type
+    )
+
+    products = []
+    for i in range(count):
+        x, y = i % 360 - 180, (i // 360) % 180 - 90
+        products.append(models.Product.objects.create(
+            identifier='benchmark_product_%d' % i,
+            product_type=product_type,
+            footprint=Polygon.from_bbox((x, y, x + 1, y + 1)),
+            begin_time=now(), end_time=now(),
+        ))
+
+    collection.products.add(*products)
+    ServiceVisibility.objects.bulk_create([
+        ServiceVisibility(eo_object=product, service='wms', visibility=True)
+        for product in products
+    ])
+    return products
+
+
+def get_capabilities(if_none_match=None):
+    headers = {}
+    if if_none_match:
+        headers['HTTP_IF_NONE_MATCH'] = if_none_match
+    request = RequestFactory().get(
+        '/ows', {'service': 'WMS', 'request': 'GetCapabilities'}, **headers
+    )
+    return WMS13GetCapabilitiesHandler().handle(request)
+
+
+def set_capabilities_cache(capabilities_cache):
+    capabilitiescache.CAPABILITIES_CACHE = capabilities_cache
+    capabilitiescache.CAPABILITIES_CACHE_CONFIGURED = True
+
+
+def best_time(func, repetitions, setup=None):
+    times = []
+    for _ in range(repetitions):
+        if setup:
+            setup()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(args):
+    count = int(args[0]) if args else 10000
+    repetitions = int(args[1]) if len(args) > 1 else 3
+
+    try:
+        with transaction.atomic():
+            products = register_products(count)
+            results = []
+
+            set_capabilities_cache(None)
+            results.append(('uncached', best_time(
+                get_capabilities, repetitions
+            )))
+
+            capabilities_cache = capabilitiescache.CapabilitiesCache(
+                key_prefix='benchmark_capabilities'
+            )
+            set_capabilities_cache(capabilities_cache)
+
+            def clear():
+                capabilities_cache.invalidate('types')
+                capabilities_cache.invalidate('documents')
+
+            results.append(('empty cache', best_time(
+                get_capabilities, repetitions, clear
+            )))
+
+            results.append(('cached document', best_time(
+                get_capabilities, repetitions
+            )))
+
+            def change_product():
+                products[0].end_time = now()
+                products[0].save()
+
+            results.append(('one product changed', best_time(
+                get_capabilities, repetitions, change_product
+            )))
+
+            etag = get_capabilities()['ETag']
+            results.append(('not modified', best_time(
+                lambda: get_capabilities(etag), repetitions
+            )))
+
+            print('%d products' % count)
+            for name, duration in results:
+                print('%-20s %10.3f s' % (name, duration))
+
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
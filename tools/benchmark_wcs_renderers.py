@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#-------------------------------------------------------------------------------
+#
+# Side-by-side benchmark of the MapServer and the GDAL based rectified WCS
+# GetCoverage renderers.
+#
+# Project: EOxServer <http://eoxserver.org>
+# Authors: Fabian Schindler <fabian.schindler@eox.at>
+#
+#-------------------------------------------------------------------------------
+# Copyright (C) 2020 EOX IT Services GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies of this Software or works derived from this Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#-------------------------------------------------------------------------------
+
+""" Usage: DJANGO_SETTINGS_MODULE=<instance>.settings \
+           benchmark_wcs_renderers.py [size] [repetitions]
+
+Creates a synthetic four band GeoTIFF coverage of ``size`` x ``size`` pixels
+(default: 4096), renders a set of typical WCS 2.0 GetCoverage requests with
+both the MapServer and the GDAL rectified coverage renderer and reports the
+best run time of both.
+"""
+
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime
+from os.path import join
+
+import django
+
+django.setup()
+
+from django.contrib.gis.geos import Polygon
+
+from eoxserver.contrib import gdal
+from eoxserver.render.coverage import objects
+from eoxserver.services.subset import Subsets, Trim
+from eoxserver.services.result import delete_result_set
+from eoxserver.services.ows.wcs.v20.util import RangeSubset, ScaleSize
+from eoxserver.services.ows.wcs.v20.parameters import (
+    WCS20CoverageRenderParams
+)
+from eoxserver.services.mapserver.wcs.coverage_renderer import (
+    RectifiedCoverageMapServerRenderer
+)
+from eoxserver.services.gdal.wcs.rectified_coverage_renderer import (
+    GDALRectifiedCoverageRenderer
+)
+
+
+EXTENT = (10, 40, 20, 50)
+CRS = 'http://www.opengis.net/def/crs/EPSG/0/4326'
+
+
+def create_coverage(directory, size):
+    """ Create a tiled four band GeoTIFF covering ``EXTENT`` and return the
+        coverage object for it.
+    """
+    filename = join(directory, 'coverage.tif')
+    res_x = (EXTENT[2] - EXTENT[0]) / float(size)
+    res_y = (EXTENT[1] - EXTENT[3]) / float(size)
+
+    ds = gdal.GetDriverByName('GTiff').Create(
+        filename, size, size, 4, gdal.GDT_UInt16, ['TILED=YES']
+    )
+    ds.SetProjection('EPSG:4326')
+    ds.SetGeoTransform([EXTENT[0], res_x, 0, EXTENT[3], 0, res_y])
+    for index in range(1, 5):
+        ds.GetRasterBand(index).Fill(index * 1000)
+    range_type = objects.RangeType.from_gdal_dataset(ds, 'coverage')
+    ds = None
+
+    return objects.Coverage(
+        identifier='coverage',
+        eo_metadata=objects.EOMetadata(
+            datetime(2020, 1, 1), datetime(2020, 1, 1),
+            Polygon.from_bbox(EXTENT)
+        ),
+        range_type=range_type,
+        grid=objects.Grid(CRS, [
+            objects.Axis('long', 'spatial', res_x),
+            objects.Axis('lat', 'spatial', res_y),
+        ]),
+        origin=objects.Origin([EXTENT[0], EXTENT[3]]),
+        size=[size, size],
+        arraydata_locations=[
+            objects.ArraydataLocation(filename, {}, 'image/tiff', 0, 3)
+        ],
+        metadata_locations=[]
+    )
+
+
+def get_requests(coverage):
+    """ Yields a name and the render parameters of each benchmarked request.
+    """
+    def params(subsets=(), **kwargs):
+        return WCS20CoverageRenderParams(
+            coverage, Subsets(subsets, crs=CRS), format='image/tiff', **kwargs
+        )
+
+    size = coverage.size[0]
+    trims = [Trim('long', 12, 14), Trim('lat', 44, 46)]
+
+    yield 'full', params()
+    yield 'subset', params(trims)
+    yield 'subset+bands', params(
+        trims, rangesubset=RangeSubset(['coverage_0', 'coverage_2'])
+    )
+    yield 'scaled', params(scales=[
+        ScaleSize('long', size // 4), ScaleSize('lat', size // 4)
+    ])
+    yield 'subset+3857', params(trims, outputcrs='EPSG:3857')
+
+
+def render(renderer, params):
+    result_set = renderer.render(params)
+    delete_result_set(result_set)
+
+
+def best_time(func, repetitions):
+    times = []
+    for _ in range(repetitions):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main(args):
+    size = int(args[0]) if args else 4096
+    repetitions = int(args[1]) if len(args) > 1 else 3
+
+    mapserver_renderer = RectifiedCoverageMapServerRenderer()
+    gdal_renderer = GDALRectifiedCoverageRenderer()
+
+    directory = tempfile.mkdtemp()
+    try:
+        coverage = create_coverage(directory, size)
+        print('%14s %14s %12s %8s' % (
+            'request', 'mapserver [s]', 'gdal [s]', 'speedup'
+        ))
+        for name, params in get_requests(coverage):
+            mapserver = best_time(
+                lambda: render(mapserver_renderer, params), repetitions
+            )
+            native = best_time(
+                lambda: render(gdal_renderer, params), repetitions
+            )
+            print('%14s %14.3f %12.3f %7.1fx' % (
+                name, mapserver, native, mapserver / native
+            ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])